@@ -0,0 +1,82 @@
+import asyncio
+import signal
+import time
+from utils import check_temperature, logger
+
+# Abstand der Temperaturprüfung in Sekunden (wie der Monitor-Thread)
+MONITOR_INTERVAL = 60
+
+
+class AsyncBotRunner:
+    """Betreibt den Bot und die Systemüberwachung auf einer asyncio-Eventloop.
+
+    Ersetzt im Modus EXECUTION_MODE=asyncio die blockierende Hauptschleife und den
+    Monitor-Thread. Netzwerkzugriffe (requests), Parsing und Git bleiben synchron und
+    laufen in Executoren; die Eventloop wartet auf sie, ohne selbst zu blockieren.
+    SIGINT/SIGTERM beenden alle Aufgaben sauber, ein laufendes Speichern des
+    Zustands wird noch abgeschlossen.
+    """
+
+    def __init__(self, bot, notifier, monitor_interval=MONITOR_INTERVAL):
+        self.bot = bot
+        self.notifier = notifier
+        self.monitor_interval = monitor_interval
+        self._stop = None
+
+    def stop(self):
+        """Beendet run() (auch aus Signal-Handlern)."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _poll_loop(self):
+        logger.info("Bot gestartet (asyncio).")
+        await asyncio.to_thread(self.bot.discord.send_warning, "🤖 Bot wurde neu gestartet.")
+
+        while True:
+            # --- 1. Abrufzyklus (Schüler und Lehrer) ---
+            cycle_start = time.monotonic()
+            updated = await self.bot.run_cycle_async()
+            cycle_duration = time.monotonic() - cycle_start
+
+            # --- 2. Warte laut Abrufplan bis zum nächsten Zyklus ---
+            time_to_wait = self.bot.next_delay(cycle_duration, updated)
+            logger.debug(f"Nächster Abrufzyklus in {time_to_wait:.0f}s.")
+            await asyncio.sleep(time_to_wait)
+
+    async def _monitor_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(check_temperature, self.notifier)
+            except Exception as e:
+                logger.error(f"Fehler bei der Systemüberwachung: {e}", exc_info=True)
+            await asyncio.sleep(self.monitor_interval)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Z.B. Windows oder nicht im Haupt-Thread: dann nur per stop()
+                pass
+
+        tasks = [
+            asyncio.create_task(self._poll_loop(), name="poll"),
+            asyncio.create_task(self._monitor_loop(), name="monitor"),
+        ]
+        stop_task = asyncio.create_task(self._stop.wait(), name="stop")
+
+        try:
+            done, _ = await asyncio.wait(tasks + [stop_task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks + [stop_task]:
+                task.cancel()
+            await asyncio.gather(*tasks, stop_task, return_exceptions=True)
+            await asyncio.to_thread(self.bot.shutdown)
+
+        # Ein abgestürzter Task beendet den Bot mit seinem Fehler
+        for task in done:
+            if task is not stop_task and not task.cancelled() and task.exception():
+                raise task.exception()
+        logger.info("Beende Bot (Signal empfangen)...")
@@ -0,0 +1,105 @@
+"""Vergleicht Streaming-Extraktor und BeautifulSoup beim Lesen von Titel und Tabelle.
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python benchmarks/bench_extractor.py [DATEI_ODER_ORDNER ...] [--repeat N]
+
+Ohne Pfadangabe werden alle Pläne aus dsb-database/plans verwendet (fehlt das
+Archiv, die Fixtures aus benchmarks/fixtures/). Pro Datei
+werden CPU-Zeit und Speicher-Peak beider Varianten gemessen und die Ergebnisse
+auf Gleichheit geprüft.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from plan_document import ParsedPlan
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _read_plans(paths):
+    files = []
+    for path in paths:
+        if not os.path.exists(path):
+            raise SystemExit(f"Pfad nicht gefunden: {path}")
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith((".htm", ".html"))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def _extract(html, streaming):
+    Config.STREAMING_EXTRACTOR = streaming
+    plan = ParsedPlan(html)
+    return plan.title, plan.table_rows
+
+
+def _measure(html, streaming, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = _extract(html, streaming)
+    cpu_ms = (time.process_time() - start) * 1000 / repeat
+
+    tracemalloc.start()
+    _extract(html, streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cpu_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = args.paths
+    if not paths:
+        paths = [Config.PLANS_DIR if os.path.isdir(Config.PLANS_DIR) else FIXTURES_DIR]
+        print(f"Pläne aus {paths[0]}")
+    files = _read_plans(paths)
+    if not files:
+        print("Keine Plan-Dateien gefunden.")
+        return 1
+
+    print(f"{'Datei':<32} {'Soup ms':>9} {'Stream ms':>10} {'Soup KiB':>9} {'Stream KiB':>11}  Gleich")
+    totals = [0.0, 0.0, 0.0, 0.0]
+    mismatches = 0
+    for path in files:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+
+        soup_result, soup_ms, soup_kib = _measure(html, False, args.repeat)
+        stream_result, stream_ms, stream_kib = _measure(html, True, args.repeat)
+        equal = soup_result == stream_result
+        mismatches += not equal
+
+        for i, value in enumerate((soup_ms, stream_ms, soup_kib, stream_kib)):
+            totals[i] += value
+        print(
+            f"{os.path.basename(path)[:32]:<32} {soup_ms:>9.2f} {stream_ms:>10.2f} "
+            f"{soup_kib:>9.0f} {stream_kib:>11.0f}  {'ja' if equal else 'NEIN'}"
+        )
+
+    n = len(files)
+    print(
+        f"{'Mittelwert':<32} {totals[0] / n:>9.2f} {totals[1] / n:>10.2f} "
+        f"{totals[2] / n:>9.0f} {totals[3] / n:>11.0f}"
+    )
+    if totals[1]:
+        print(f"CPU-Speedup: {totals[0] / totals[1]:.1f}x, Abweichungen: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Misst die Verarbeitungskette offline gegen Fixtures und vergleicht mit einer Baseline.
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python benchmarks/bench_pipeline.py [--repeat N] [--only NAME ...]
+    python benchmarks/bench_pipeline.py --save-baseline
+    python benchmarks/bench_pipeline.py --threshold 0.2
+
+Die Fixtures in benchmarks/fixtures/ sind anonymisiert: GetData-Antworten im
+Originalformat (gzip + Base64) für einen Schüler- und einen Lehrer-Account sowie ein
+Lehrer- und ein Schülerplan als HTML. Eigene Aufzeichnungen können unter denselben
+Dateinamen abgelegt werden. Netzwerk, Git und Discord werden nicht angesprochen; der
+DSB-Server und die Plan-Downloads kommen aus einem lokalen Stub.
+
+Pro Benchmark werden Median/Minimum der CPU-Zeit (alle Threads) und der Speicher-Peak
+(tracemalloc) gemessen. Mit --save-baseline werden die Ergebnisse gespeichert; spätere
+Läufe vergleichen das Minimum (robuster gegen Störungen als der Median) und den
+Speicher-Peak und markieren Abweichungen über --threshold (Standard 15 %) als
+Regression; der Lauf endet dann mit Exit-Code 1. Baselines sind rechnerabhängig und gehören nicht ins Repo.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_logic import SubstitutionBot
+from dsb_client import DSBClient
+from plan_cache import ConditionalCache
+from plan_document import ParsedPlan
+from plan_store import PlanStore
+from teacher_to_student_converter import (
+    ConvertTeacherToStudent,
+    _get_template,
+    _restructure_mon_list_table,
+)
+from tenants import Tenant
+from utils import logger
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+# Mindestdauer einer Messung in ms (kürzere Benchmarks laufen pro Messung mehrfach)
+MIN_SAMPLE_MS = 20
+
+# Welche Plan-Fixture hinter welchem Link aus den GetData-Antworten liegt
+PLAN_FIXTURES = {
+    "subst_001.htm": "student_plan.html",
+    "subst_002.htm": "student_plan.html",
+    "subst_003.htm": "teacher_plan.html",
+    "subst_004.htm": "teacher_plan.html",
+}
+
+
+def _read_fixture(name, mode="r"):
+    with open(os.path.join(FIXTURES_DIR, name), mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+        return f.read()
+
+
+class _StubResponse:
+    def __init__(self, content: bytes, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+        self.encoding = "utf-8"
+        self.apparent_encoding = "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def raise_for_status(self):
+        pass
+
+
+class _StubTransport:
+    """Lokaler Ersatz für HttpTransport: GetData-Antwort per POST, Pläne per GET."""
+
+    def __init__(self, getdata: bytes):
+        self.getdata = getdata
+        self.plans = {name: _read_fixture(fixture, "rb") for name, fixture in PLAN_FIXTURES.items()}
+
+    def post(self, url, **kwargs):
+        return _StubResponse(self.getdata)
+
+    def get(self, url, **kwargs):
+        return _StubResponse(self.plans[url.rsplit("/", 1)[-1]])
+
+
+def _make_bot(work_dir, transport, fetch_pool):
+    """SubstitutionBot ohne Git/Discord/Zustandsdatenbank, Dateien landen in work_dir."""
+    bot = SubstitutionBot.__new__(SubstitutionBot)
+    bot.http = transport
+    bot.fetch_pool = fetch_pool
+    bot.tenant = Tenant("", "bench", "bench", "", "", "", repo_dir=work_dir, state_dir=work_dir)
+    bot._shared = None
+    bot.plan_cache = ConditionalCache(bot.tenant.http_cache_file)
+    os.makedirs(bot.tenant.plans_dir)
+    bot.plan_store = PlanStore(bot.tenant.plans_dir)
+    bot.search_index = None
+    # Fixtures haben ein festes Datum: alle konvertierten Pläne gelten als relevant
+    bot._get_n_working_days_from_now = lambda n: datetime(2000, 1, 1)
+    return bot
+
+
+def _benchmarks(work_root, fetch_pool):
+    """{Name: Setup}. Ein Setup bereitet einen Durchlauf vor (nicht gemessen) und gibt
+    die zu messende Funktion zurück."""
+    student_html = _read_fixture("student_plan.html")
+    teacher_html = _read_fixture("teacher_plan.html")
+    getdata = {
+        "Schüler": _read_fixture("getdata_student.json", "rb"),
+        "Lehrer": _read_fixture("getdata_teacher.json", "rb"),
+    }
+    first_body = re.search(r"<body.*?>(.*?)</body>", teacher_html, re.IGNORECASE | re.DOTALL).group(1)
+    template = _get_template()
+    date_bot = SubstitutionBot.__new__(SubstitutionBot)
+    runs = iter(range(1_000_000))
+
+    def dsb_decode():
+        # Neuer Client je Durchlauf, sonst greift der Antwort-Fingerprint
+        client = DSBClient("bench", "bench", _StubTransport(getdata["Schüler"]))
+        return client.fetch_menu_links
+
+    def extract_plan_date():
+        return lambda: date_bot._extract_plan_date(student_html)
+
+    def convert_teacher_to_student():
+        return lambda: ConvertTeacherToStudent(teacher_html)
+
+    def restructure_mon_list_table():
+        plan = ParsedPlan(template.wrap(first_body.strip()))
+        return lambda: _restructure_mon_list_table(plan)
+
+    def client_cycle(client_name):
+        def setup():
+            work_dir = os.path.join(work_root, f"run{next(runs)}")
+            transport = _StubTransport(getdata[client_name])
+            bot = _make_bot(work_dir, transport, fetch_pool)
+            client = DSBClient("bench", "bench", transport)
+            # Leerer Zustand: alle Pläne werden geladen, geparst, konvertiert und gespeichert
+            # (inkl. Übernahme der Dateien wie am Zyklusende)
+            def run():
+                bot._process_client_cycle(client, {}, client_name)
+                bot.plan_store.flush()
+
+            return run
+        return setup
+
+    return {
+        "dsb_decode": dsb_decode,
+        "extract_plan_date": extract_plan_date,
+        "convert_teacher_to_student": convert_teacher_to_student,
+        "restructure_mon_list_table": restructure_mon_list_table,
+        "client_cycle_student": client_cycle("Schüler"),
+        "client_cycle_teacher": client_cycle("Lehrer"),
+    }
+
+
+def _measure(setup, repeat):
+    # Aufwärmen (Imports, Vorlage, Caches); sehr kurze Läufe werden pro Messung
+    # mehrfach ausgeführt, damit die Messung nicht im Rauschen untergeht
+    run = setup()
+    start = time.process_time()
+    run()
+    warm_ms = (time.process_time() - start) * 1000
+    inner = max(1, min(1000, int(MIN_SAMPLE_MS / max(warm_ms, 0.001))))
+
+    # Ohne GC während der Messung: Sammelläufe fallen sonst zufällig in einzelne Messungen
+    times = []
+    for _ in range(repeat):
+        runs = [setup() for _ in range(inner)]
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.process_time()
+            for run in runs:
+                run()
+            times.append((time.process_time() - start) * 1000 / inner)
+        finally:
+            gc.enable()
+
+    run = setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "peak_kib": peak / 1024,
+    }
+
+
+def _load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _change(value, base):
+    return (value - base) / base if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="Nur diese Benchmarks ausführen")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Erlaubte Verschlechterung (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)
+    baseline = None if args.save_baseline else _load_baseline(args.baseline)
+    if baseline and baseline.get("python") != platform.python_version():
+        print(f"Hinweis: Baseline mit Python {baseline.get('python')} erstellt, jetzt {platform.python_version()}.")
+
+    results = {}
+    regressions = []
+    print(f"{'Benchmark':<28} {'Median ms':>10} {'Min ms':>9} {'Peak KiB':>9} {'Δ Zeit':>8} {'Δ Speicher':>10}")
+    with tempfile.TemporaryDirectory(prefix="dsb-bench-") as work_root, \
+            ThreadPoolExecutor(max_workers=4, thread_name_prefix="plan-fetch") as fetch_pool:
+        for name, setup in _benchmarks(work_root, fetch_pool).items():
+            if args.only and name not in args.only:
+                continue
+            result = results[name] = _measure(setup, args.repeat)
+
+            base = (baseline or {}).get("results", {}).get(name)
+            delta_time = delta_mem = ""
+            flag = ""
+            if base:
+                time_change = _change(result["min_ms"], base["min_ms"])
+                mem_change = _change(result["peak_kib"], base["peak_kib"])
+                delta_time = f"{time_change:+.0%}"
+                delta_mem = f"{mem_change:+.0%}"
+                if time_change > args.threshold or mem_change > args.threshold:
+                    flag = "  REGRESSION"
+                    regressions.append(name)
+            print(
+                f"{name:<28} {result['median_ms']:>10.2f} {result['min_ms']:>9.2f} "
+                f"{result['peak_kib']:>9.0f} {delta_time:>8} {delta_mem:>10}{flag}"
+            )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline gespeichert: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"Keine Baseline unter {args.baseline} (mit --save-baseline anlegen).")
+    elif regressions:
+        print(f"Regressionen über {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
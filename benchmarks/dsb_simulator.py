@@ -0,0 +1,354 @@
+"""Lokaler Ersatz für den DSB-Server: GetData-Endpunkt und Plan-Seiten.
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python benchmarks/dsb_simulator.py [SZENARIO] [--port 8765] [--latency S] [--error-rate P]
+
+Der Simulator spricht dasselbe Protokoll wie app.dsbcontrol.de (POST
+/JsonHandler.ashx/GetData, Anfrage und Antwort gzip + Base64) und liefert die Pläne
+unter /data/<name> aus (mit ETag/Last-Modified, 304 bei If-None-Match); nach einem
+erneuten Upload wie beim echten DSB unter /data/<GUID>/<name>. Mit einem
+Szenario (siehe replay_day.py) werden Accounts und Pläne zum Startzeitpunkt geladen.
+Den Bot dagegen laufen lassen:
+
+    DSB_DATA_URL=http://127.0.0.1:8765/JsonHandler.ashx/GetData python main.py
+
+Zur Laufzeit lassen sich Inhalte und Störungen per HTTP ändern:
+    PUT  /data/<name>    neuer Planinhalt (Menü-Zeitstempel wird aktualisiert)
+    POST /_sim/faults    JSON, z.B. {"latency": 0.5, "jitter": 0.2, "error_rate": 0.1, "api_error": false}
+    GET  /_sim/stats     Anzahl der Anfragen, 304-Antworten und injizierten Fehler
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GETDATA_PATH = "/JsonHandler.ashx/GetData"
+PLAN_PREFIX = "/data/"
+# Zeitstempel-Format der Menü-Einträge ("20.10.2026 14:32")
+MENU_DATE_FORMAT = "%d.%m.%Y %H:%M"
+
+
+def _encode(data) -> str:
+    return base64.b64encode(gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))).decode()
+
+
+def _decode(payload: str):
+    return json.loads(gzip.decompress(base64.b64decode(payload)))
+
+
+class Faults:
+    """Injizierte Störungen: Verzögerung (Sekunden + zufälliger Anteil), HTTP-500-Quote,
+    API-Fehler (Resultcode 1) für GetData."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, api_error=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.api_error = api_error
+
+    def update(self, values: dict):
+        for name, value in values.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unbekannte Störung: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+
+class DSBSimulator:
+    """DSB-Server im Prozess (eigener Thread). Inhalte und Störungen sind jederzeit änderbar.
+
+    `clock` liefert die (ggf. beschleunigte) Uhrzeit für Menü-Zeitstempel und
+    Last-Modified; Standard ist die Systemzeit.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, clock=datetime.now, seed=None):
+        self.clock = clock
+        self.faults = Faults()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # {Benutzer: {"password": ..., "entries": [{"title", "plan", "date"}]}}
+        self._accounts = {}
+        # {Name: {"content": bytes, "etag": ..., "modified": datetime, "upload": GUID oder None}}
+        self._plans = {}
+        self._uploads = 0
+        self.stats = {"getdata": 0, "plans": 0, "not_modified": 0, "errors": 0}
+
+        self._server = ThreadingHTTPServer((host, port), _SimulatorHandler)
+        self._server.daemon_threads = True
+        self._server.simulator = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def data_url(self) -> str:
+        return self.base_url + GETDATA_PATH
+
+    def plan_url(self, name) -> str:
+        with self._lock:
+            upload = self._plans.get(name, {}).get("upload")
+        return self.base_url + PLAN_PREFIX + (f"{upload}/{name}" if upload else name)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="dsb-simulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- Inhalte ---
+
+    def add_account(self, username, password=""):
+        with self._lock:
+            self._accounts.setdefault(username, {"password": password, "entries": []})
+
+    def set_plan(self, name, content, account=None, title=None, at=None, reupload=False):
+        """Setzt den Inhalt eines Plans. Mit `account`/`title` wird er (falls noch nicht
+        vorhanden) ins Menü des Accounts aufgenommen. Der Menü-Zeitstempel aller Einträge,
+        die auf den Plan zeigen, springt wie beim echten DSB auf `at` (Standard: jetzt).
+        `reupload` legt den Plan wie ein neuer Upload in einen neuen Ordner (neue URL)."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        at = at or self.clock()
+        with self._lock:
+            upload = self._plans.get(name, {}).get("upload")
+            if reupload:
+                self._uploads += 1
+                upload = str(uuid.uuid5(uuid.NAMESPACE_URL, f"upload/{self._uploads}/{name}"))
+            self._plans[name] = {
+                "content": content,
+                "etag": '"' + hashlib.sha1(content).hexdigest() + '"',
+                "modified": at,
+                "upload": upload,
+            }
+            if account is not None:
+                entries = self._accounts[account]["entries"]
+                if not any(entry["plan"] == name for entry in entries):
+                    entries.append({"title": title or name, "plan": name, "date": at})
+            self._touch(name, at)
+
+    def touch_plan(self, name, at=None):
+        """Nur den Menü-Zeitstempel erneuern (Inhalt bleibt gleich)."""
+        with self._lock:
+            self._touch(name, at or self.clock())
+
+    def _touch(self, name, at):
+        for account in self._accounts.values():
+            for entry in account["entries"]:
+                if entry["plan"] == name:
+                    entry["date"] = at
+
+    def remove_plan(self, name):
+        with self._lock:
+            self._plans.pop(name, None)
+            for account in self._accounts.values():
+                account["entries"] = [e for e in account["entries"] if e["plan"] != name]
+
+    def plan_content(self, name) -> bytes:
+        with self._lock:
+            return self._plans[name]["content"]
+
+    def set_faults(self, **values):
+        with self._lock:
+            self.faults.update(values)
+
+    # --- Antworten ---
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _inject(self) -> bool:
+        """Verzögert die Anfrage; True, wenn stattdessen ein HTTP-500 gesendet werden soll."""
+        with self._lock:
+            delay = self.faults.latency + self._rng.uniform(0, self.faults.jitter)
+            fail = self._rng.random() < self.faults.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            self._count("errors")
+        return fail
+
+    def menu_response(self, request: dict) -> dict:
+        params = _decode(request["req"]["Data"])
+        with self._lock:
+            account = self._accounts.get(params.get("UserId"))
+            if self.faults.api_error or account is None or account["password"] != params.get("UserPw"):
+                return {"Resultcode": 1, "ResultStatusInfo": "Login fehlgeschlagen", "ResultMenuItems": []}
+            entries = [dict(entry) for entry in account["entries"]]
+
+        childs = []
+        for index, entry in enumerate(entries):
+            stamp = entry["date"].strftime(MENU_DATE_FORMAT)
+            childs.append({
+                "Id": str(uuid.uuid5(uuid.NAMESPACE_URL, entry["plan"])),
+                "Date": stamp,
+                "Title": entry["title"],
+                "Detail": "",
+                "ConType": 1,
+                "Index": index,
+                "Childs": [{
+                    "Id": str(uuid.uuid5(uuid.NAMESPACE_URL, "detail/" + entry["plan"])),
+                    "Date": stamp,
+                    "Title": entry["plan"],
+                    "Detail": self.plan_url(entry["plan"]),
+                    "ConType": 4,
+                    "Index": 0,
+                    "Childs": [],
+                }],
+            })
+        return {
+            "Resultcode": 0,
+            "ResultStatusInfo": "",
+            "StartIndex": 0,
+            "ResultMenuItems": [{
+                "Index": 0,
+                "Title": "Inhalte",
+                "Childs": [{
+                    "Index": 0,
+                    "Title": "Pläne",
+                    "Action": "contentplans",
+                    "Root": {"Id": "", "Title": "", "Childs": childs},
+                    "Childs": [],
+                }],
+            }],
+        }
+
+
+class _SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-Alive wie beim echten Server
+    # Header und Body werden getrennt geschrieben; ohne TCP_NODELAY bremst Nagle + Delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def simulator(self) -> DSBSimulator:
+        return self.server.simulator
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send(self, status, body=b"", content_type="text/plain; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json; charset=utf-8")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+        if path == "/_sim/faults":
+            try:
+                self.simulator.set_faults(**json.loads(body or b"{}"))
+            except (ValueError, TypeError) as e:
+                self._send(400, str(e).encode("utf-8"))
+                return
+            self._send_json(vars(self.simulator.faults))
+            return
+        if path != GETDATA_PATH:
+            self._send(404)
+            return
+
+        self.simulator._count("getdata")
+        if self.simulator._inject():
+            self._send(500, b"Simulierter Serverfehler")
+            return
+        try:
+            data = self.simulator.menu_response(json.loads(body))
+        except (ValueError, KeyError, OSError) as e:
+            self._send(400, f"Ungültige Anfrage: {e}".encode("utf-8"))
+            return
+        self._send_json({"d": _encode(data)})
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/_sim/stats":
+            with self.simulator._lock:
+                self._send_json(dict(self.simulator.stats))
+            return
+        if not path.startswith(PLAN_PREFIX):
+            self._send(404)
+            return
+
+        upload, _, name = path[len(PLAN_PREFIX):].rpartition("/")
+        self.simulator._count("plans")
+        if self.simulator._inject():
+            self._send(500, b"Simulierter Serverfehler")
+            return
+        with self.simulator._lock:
+            plan = self.simulator._plans.get(name)
+        # Alte Upload-Ordner gibt es nach einem neuen Upload nicht mehr
+        if plan is None or (plan["upload"] or "") != upload:
+            self._send(404)
+            return
+
+        headers = {"ETag": plan["etag"], "Last-Modified": format_datetime(plan["modified"].astimezone(timezone.utc), usegmt=True)}
+        if self.headers.get("If-None-Match") == plan["etag"]:
+            self.simulator._count("not_modified")
+            self._send(304, headers=headers)
+            return
+        self._send(200, plan["content"], "text/html", headers)
+
+    def do_PUT(self):
+        path = self.path.split("?", 1)[0]
+        if not path.startswith(PLAN_PREFIX):
+            self._send(404)
+            return
+        self.simulator.set_plan(path[len(PLAN_PREFIX):].rpartition("/")[2], self._read_body())
+        self._send(204)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    from replay_day import Scenario
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", nargs="?", help="Szenario-Datei (JSON), lädt den Stand zum Startzeitpunkt")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Verzögerung pro Anfrage (Sekunden)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Zusätzliche zufällige Verzögerung (Sekunden)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 500")
+    args = parser.parse_args()
+
+    simulator = DSBSimulator(args.host, args.port)
+    simulator.set_faults(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    if args.scenario:
+        scenario = Scenario(args.scenario)
+        for username, password in scenario.accounts.values():
+            simulator.add_account(username, password)
+        for event in scenario.events:
+            if event.at > scenario.start:
+                break
+            scenario.apply(event, simulator, at=datetime.now())
+
+    simulator.start()
+    print(f"DSB-Simulator läuft: DSB_DATA_URL={simulator.data_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Spielt einen aufgezeichneten Schultag im Zeitraffer gegen den DSB-Simulator ab.
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python benchmarks/replay_day.py [SZENARIO] [--speed N] [--latency S] [--error-rate P] [--json DATEI]
+
+Der Bot läuft mit echtem `SubstitutionBot.run_cycle` (DSB-Abruf, parallele Downloads,
+Konvertierung, Zustand, Dateien) gegen dsb_simulator.py; Git und Discord werden nicht
+angesprochen, Benachrichtigungen werden nur mit Zeitpunkt aufgezeichnet. Die Wartezeit
+zwischen den Zyklen kommt aus dem konfigurierten Abrufplan (POLL_*), läuft aber
+virtuell: --speed 0 (Standard) springt direkt zum nächsten Zyklus, --speed 60 lässt
+eine Minute pro Sekunde vergehen. Ein Zyklus selbst läuft in Echtzeit.
+
+Ausgewertet werden die Zyklusdauer (Echtzeit) und der Meldeverzug jeder Änderung:
+Zeit vom Ereignis im Szenario bis zur Übergabe der Benachrichtigung (virtuelle Zeit,
+also Abrufintervall + Zyklusdauer). MENU_FINGERPRINT_MAX_AGE läuft in Echtzeit und
+greift im Zeitraffer daher praktisch nicht.
+
+Szenario (JSON, Dateipfade relativ zur Szenario-Datei):
+    {
+      "date": "2026-10-19", "start": "06:00", "end": "16:00",
+      "accounts": {"Schüler": {"user": "schueler", "password": "sim"}},
+      "events": [
+        {"at": "06:00", "account": "Schüler", "title": "Schüler heute",
+         "plan": "subst_001.htm", "file": "student_plan.html"},
+        {"at": "07:12", "plan": "subst_001.htm", "replace": [["R230", "R231"]]},
+        {"at": "07:40", "plan": "subst_001.htm", "touch": true, "notify": false},
+        {"at": "08:30", "plan": "subst_001.htm", "reupload": true, "notify": false},
+        {"at": "09:00", "faults": {"latency": 0.3, "error_rate": 0.2}},
+        {"at": "11:00", "remove": "subst_001.htm"}
+      ]
+    }
+
+Ein Ereignis mit "file" setzt den Planinhalt (ggf. mit "replace" angepasst), ohne
+"file" wird "replace" auf den aktuellen Inhalt angewendet. "reupload": true legt den
+Plan wie ein neuer DSB-Upload unter eine neue URL (data/<GUID>/). "notify": false markiert
+Änderungen, die keine Benachrichtigung auslösen dürfen (z.B. nur der Stand-Zeitstempel).
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_logic import SubstitutionBot
+from config import Config
+from dsb_client import DSBClient
+from dsb_simulator import DSBSimulator
+from http_transport import HttpTransport
+from metrics import REGISTRY
+from plan_cache import ConditionalCache
+from plan_store import PlanStore
+from scheduler import create_scheduler
+from search_index import PlanSearchIndex
+from state_store import PlanStateStore
+from tenants import Tenant
+from utils import logger
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENARIO = os.path.join(BENCH_DIR, "fixtures", "replay_day.json")
+
+
+class ScenarioEvent:
+    def __init__(self, at: datetime, data: dict):
+        self.at = at
+        self.data = data
+        self.plan = data.get("plan")
+        # Darf/muss dieses Ereignis eine Benachrichtigung auslösen?
+        self.notify = data.get("notify", self.plan is not None and "remove" not in data)
+
+
+class Scenario:
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        day = datetime.strptime(data["date"], "%Y-%m-%d")
+        self.start = self._at(day, data.get("start", "00:00"))
+        self.end = self._at(day, data.get("end", "24:00"))
+        # {Client-Name: (Benutzer, Passwort)}, Reihenfolge wie im Bot (Schüler zuerst)
+        self.accounts = {
+            name: (account["user"], account.get("password", ""))
+            for name, account in data["accounts"].items()
+        }
+        self.events = sorted(
+            (ScenarioEvent(self._at(day, event["at"]), event) for event in data["events"]),
+            key=lambda event: event.at,
+        )
+
+    @staticmethod
+    def _at(day: datetime, value: str) -> datetime:
+        hours, minutes, *seconds = (int(part) for part in value.split(":"))
+        return day + timedelta(hours=hours, minutes=minutes, seconds=seconds[0] if seconds else 0)
+
+    def apply(self, event: ScenarioEvent, simulator: DSBSimulator, at=None):
+        """Überträgt ein Ereignis auf den Simulator (Menü-Zeitstempel = `at` bzw. Ereigniszeit)."""
+        data = event.data
+        at = at or event.at
+        if "faults" in data:
+            simulator.set_faults(**data["faults"])
+        if "remove" in data:
+            simulator.remove_plan(data["remove"])
+        if event.plan is None:
+            return
+
+        if data.get("touch"):
+            simulator.touch_plan(event.plan, at=at)
+            return
+        if "file" in data:
+            with open(os.path.join(self.base_dir, data["file"]), "r", encoding="utf-8") as f:
+                content = f.read()
+        else:
+            content = simulator.plan_content(event.plan).decode("utf-8")
+        for old, new in data.get("replace", []):
+            if old not in content:
+                raise ValueError(f"Ersetzung '{old}' nicht in {event.plan} gefunden ({data['at']})")
+            content = content.replace(old, new, 1)
+
+        account = data.get("account")
+        username = self.accounts[account][0] if account else None
+        simulator.set_plan(
+            event.plan, content, account=username, title=data.get("title"), at=at,
+            reupload=data.get("reupload", False),
+        )
+
+
+class VirtualClock:
+    """Uhr, die zwischen den Zyklen springt und während eines Zyklus in Echtzeit läuft."""
+
+    def __init__(self, start: datetime):
+        self._anchor = (start, time.monotonic())
+
+    def now(self) -> datetime:
+        virtual, real = self._anchor
+        return virtual + timedelta(seconds=time.monotonic() - real)
+
+    def set(self, moment: datetime):
+        self._anchor = (moment, time.monotonic())
+
+
+class _RecordingNotifier:
+    """Ersatz für DiscordNotifier: merkt sich, wann welche Pläne gemeldet wurden."""
+
+    outbox = None
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.updates = []
+        self.warnings = []
+
+    def send_plan_update(self, plans, new_keys, diffs=None):
+        # Konvertierte Pläne gehören zur URL des Lehrerplans
+        urls = {plans.get(key, {}).get("original_url", key) for key in new_keys}
+        self.updates.append((self.clock.now(), urls))
+
+    def send_warning(self, message, coalesce_key=None):
+        self.warnings.append(message)
+
+    def close(self):
+        pass
+
+
+class _NoGit:
+    def push_changes(self, message="Automated update"):
+        pass
+
+
+def _make_bot(work_dir, simulator, scenario, clock, seed):
+    """SubstitutionBot wie in __init__, aber gegen den Simulator und ohne Git/Discord/Metrik-Port."""
+    bot = SubstitutionBot.__new__(SubstitutionBot)
+    bot.tenant = Tenant("", "", "", "", "", "", repo_dir=work_dir, state_dir=work_dir)
+    bot._shared = None
+    bot.leases = None
+    bot.http = HttpTransport(
+        pool_connections=Config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+        read_timeout=Config.HTTP_READ_TIMEOUT,
+    )
+    bot.plan_cache = ConditionalCache(bot.tenant.http_cache_file)
+    bot.fetch_pool = ThreadPoolExecutor(max_workers=Config.FETCH_WORKERS, thread_name_prefix="plan-fetch")
+    bot.state_store = PlanStateStore(bot.tenant.plan_state_db)
+    bot.clients = [
+        {"client": DSBClient(user, password, bot.http, simulator.data_url), "state": {}, "name": name}
+        for name, (user, password) in scenario.accounts.items()
+    ]
+    bot.last_plans_student = {}
+    bot.last_plans_teacher = {}
+    bot.client_pool = ThreadPoolExecutor(max_workers=len(bot.clients), thread_name_prefix="dsb-client")
+    bot.scheduler = create_scheduler()
+    if hasattr(bot.scheduler, "_rng"):
+        bot.scheduler._rng = random.Random(seed)
+    bot._cycle_lock = threading.Lock()
+    bot.discord = _RecordingNotifier(clock)
+    bot.git = _NoGit()
+    bot.committer = None
+    os.makedirs(bot.tenant.plans_dir)
+    bot.plan_store = PlanStore(bot.tenant.plans_dir)
+    bot.search_index = PlanSearchIndex(bot.tenant.search_index_db)
+    bot.metrics_server = None
+    # "Übermorgen" für die Lehrerplan-Konvertierung bezieht sich auf den Szenario-Tag
+    bot._get_n_working_days_from_now = (
+        lambda n: SubstitutionBot._get_n_working_days_from_now(bot, n, clock.now().date())
+    )
+    return bot
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summary(values) -> dict:
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "median": statistics.median(values),
+        "p95": _percentile(values, 0.95),
+        "max": max(values),
+    }
+
+
+def _stage_summary() -> dict:
+    """Mittlere Dauer pro Verarbeitungsschritt (ms) aus der Metrik dsb_stage_duration_seconds."""
+    stages = {}
+    for entry in REGISTRY.to_dict().get("dsb_stage_duration_seconds", {}).get("values", []):
+        value = entry["value"]
+        if value["count"]:
+            stages[entry["labels"]["stage"]] = {
+                "count": value["count"],
+                "mean_ms": value["sum"] / value["count"] * 1000,
+            }
+    return stages
+
+
+def replay(scenario, speed=0.0, seed=1, faults=None):
+    clock = VirtualClock(scenario.start)
+    simulator = DSBSimulator(clock=clock.now, seed=seed).start()
+    if faults:
+        simulator.set_faults(**faults)
+    for username, password in scenario.accounts.values():
+        simulator.add_account(username, password)
+
+    cycle_ms = []
+    cycles = updated_cycles = 0
+    lags = []
+    unexpected = []
+    # {Plan-URL: [Ereignisse, die noch auf ihre Benachrichtigung warten]}
+    pending = {}
+    events = list(scenario.events)
+
+    with tempfile.TemporaryDirectory(prefix="dsb-replay-") as work_dir:
+        bot = _make_bot(work_dir, simulator, scenario, clock, seed)
+        try:
+            while clock.now() < scenario.end:
+                while events and events[0].at <= clock.now():
+                    event = events.pop(0)
+                    scenario.apply(event, simulator)
+                    if event.plan is not None and "remove" not in event.data:
+                        waiting = pending.setdefault(simulator.plan_url(event.plan), [])
+                        # Eine stille Änderung ist nur bis zur nächsten Änderung desselben
+                        # Plans zuzuordnen; danach gehört eine Meldung zu dieser
+                        waiting[:] = [e for e in waiting if e.notify]
+                        waiting.append(event)
+
+                started = time.perf_counter()
+                updated = bot.run_cycle()
+                duration = time.perf_counter() - started
+                cycles += 1
+                updated_cycles += updated
+                cycle_ms.append(duration * 1000)
+
+                for notified_at, urls in bot.discord.updates:
+                    for url in urls:
+                        waiting = pending.pop(url, [])
+                        expected = [event for event in waiting if event.notify]
+                        # Nur stille Änderungen offen: diese Meldung hätte es nicht geben dürfen
+                        unexpected.extend(waiting if not expected else [])
+                        lags.extend((notified_at - event.at).total_seconds() for event in expected)
+                bot.discord.updates.clear()
+
+                delay = bot.scheduler.next_delay(clock.now(), duration, updated)
+                next_cycle = clock.now() + timedelta(seconds=delay)
+                if speed > 0:
+                    time.sleep(delay / speed)
+                clock.set(next_cycle)
+        finally:
+            bot.shutdown()
+            simulator.close()
+
+    missed = [event for waiting in pending.values() for event in waiting if event.notify]
+    return {
+        "cycles": cycles,
+        "updated_cycles": updated_cycles,
+        "cycle_ms": _summary(cycle_ms),
+        "notification_lag_s": _summary(lags),
+        "missed": [f"{event.at:%H:%M} {event.plan}" for event in missed],
+        "unexpected": [f"{event.at:%H:%M} {event.plan}" for event in unexpected],
+        "warnings": len(bot.discord.warnings),
+        "simulator": dict(simulator.stats),
+        "stages": _stage_summary(),
+    }
+
+
+def _print_report(result):
+    print(f"Zyklen: {result['cycles']} (davon mit Änderungen: {result['updated_cycles']})")
+    cycle = result["cycle_ms"]
+    if cycle:
+        print(f"Zyklusdauer (ms): Median {cycle['median']:.1f}, p95 {cycle['p95']:.1f}, max {cycle['max']:.1f}")
+    lag = result["notification_lag_s"]
+    if lag:
+        print(
+            f"Meldeverzug (s, {lag['count']} Änderungen): Median {lag['median']:.1f}, "
+            f"p95 {lag['p95']:.1f}, max {lag['max']:.1f}"
+        )
+    if result["missed"]:
+        print(f"Ohne Benachrichtigung: {', '.join(result['missed'])}")
+    if result["unexpected"]:
+        print(f"Unerwartete Benachrichtigung: {', '.join(result['unexpected'])}")
+    stats = result["simulator"]
+    print(
+        f"Simulator: {stats['getdata']} GetData, {stats['plans']} Plan-Abrufe "
+        f"({stats['not_modified']}× 304), {stats['errors']} injizierte Fehler"
+    )
+    for stage, values in sorted(result["stages"].items()):
+        print(f"  {stage:<16} {values['count']:>5}×  {values['mean_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", nargs="?", default=DEFAULT_SCENARIO)
+    parser.add_argument("--speed", type=float, default=0.0, help="Virtuelle Sekunden pro Sekunde (0 = ohne Warten)")
+    parser.add_argument("--seed", type=int, default=1, help="Zufallswert für Abrufplan und Störungen")
+    parser.add_argument("--latency", type=float, help="Verzögerung pro Anfrage (Sekunden)")
+    parser.add_argument("--error-rate", type=float, help="Anteil der Anfragen mit HTTP 500")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    parser.add_argument("--log-level", default="CRITICAL", help="Log-Level des Bots (z.B. INFO)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(levelname)s - %(threadName)s - %(message)s")
+    logger.setLevel(getattr(logging, args.log_level.upper()))
+    faults = {}
+    if args.latency is not None:
+        faults["latency"] = args.latency
+    if args.error_rate is not None:
+        faults["error_rate"] = args.error_rate
+
+    scenario = Scenario(args.scenario)
+    result = replay(scenario, speed=args.speed, seed=args.seed, faults=faults)
+    _print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 1 if result["missed"] or result["unexpected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,93 @@
+import asyncio
 import os
+import threading
 import time
-import re
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
 from utils import logger
 from teacher_to_student_converter import ConvertTeacherToStudent
+from plan_document import ParsedPlan
+from plan_diff import PlanDiff, diff_plan
 
 from config import Config
 from dsb_client import DSBClient
 from git_manager import GitManager
+from commit_scheduler import CommitScheduler
 from discord_notifier import DiscordNotifier
+from http_transport import get_transport
+from plan_cache import ConditionalCache
+from plan_store import PlanStore
+from search_index import PlanSearchIndex
+from state_store import PlanStateStore
+from scheduler import create_scheduler
+from leases import create_lease_coordinator
+from tenants import Tenant
+from metrics import (
+    BYTES_DOWNLOADED,
+    CLIENT_CYCLE_SECONDS,
+    CYCLE_SECONDS,
+    CYCLES,
+    DISCORD_PENDING,
+    GIT_PENDING,
+    MENU_UNCHANGED,
+    PLAN_DOWNLOADS,
+    PLANS_CHANGED,
+    record_error,
+    start_metrics_server,
+    track_stage,
+)
 
 
 class SubstitutionBot:
-    def __init__(self):
-        try:
-            Config.validate()
-        except EnvironmentError as e:
-            logger.critical(f"FATAL: Konfigurationsfehler: {e}")
-            raise
+    def __init__(self, tenant: Tenant | None = None, shared=None):
+        """`tenant`: Schule mit Zugangsdaten und Pfaden (Standard: Einzelbetrieb aus der .env).
+        `shared`: im Mehrschulbetrieb die gemeinsamen Ressourcen (tenant_runner.SharedResources);
+        HTTP-Session, Worker-Pools, Git-Worker und Metrik-Endpunkt gehören dann dem Runner.
+        """
+        if tenant is None:
+            try:
+                Config.validate()
+            except EnvironmentError as e:
+                logger.critical(f"FATAL: Konfigurationsfehler: {e}")
+                raise
+            tenant = Tenant.from_config()
+        self.tenant = tenant
+        self._shared = shared
+
+        # Gemeinsame HTTP-Session (Keep-Alive) für DSB, Plan-Downloads und Discord
+        self.http = shared.http if shared else get_transport()
+        # ETag/Last-Modified der Plan-URLs für bedingte Downloads (übersteht Neustarts)
+        self.plan_cache = ConditionalCache(tenant.http_cache_file)
+        # Begrenzter Worker-Pool für parallele Plan-Downloads innerhalb eines Zyklus
+        self.fetch_pool = shared.fetch_pool if shared else ThreadPoolExecutor(
+            max_workers=Config.FETCH_WORKERS, thread_name_prefix="plan-fetch"
+        )
+        # Mehrere Instanzen: nur wer die Lease der Schule hält, ruft ab, meldet und committet
+        self.lease_key = tenant.name or "default"
+        self.leases = shared.leases if shared else create_lease_coordinator()
+        self._lease_epoch = None
+        # Persistenter Plan-Zustand pro Client, damit ein Neustart keine "alles neu"-Welle auslöst;
+        # mit Leases in der gemeinsamen Datei, damit eine übernehmende Instanz ihn kennt
+        if self.leases is not None:
+            self.state_store = PlanStateStore(Config.LEASE_DB, namespace=self.lease_key, wal=False)
+        else:
+            self.state_store = PlanStateStore(tenant.plan_state_db)
 
         # --- Client-Initialisierung (Schüler ist Pflicht, Lehrer ist optional) ---
 
         # 1. Schüler-Account (Standard)
-        self.dsb_student = DSBClient(Config.DSB_USER, Config.DSB_PASS)
+        self.dsb_student = DSBClient(tenant.dsb_user, tenant.dsb_pass, self.http)
         # Zustandsspeicher für Schüler-Pläne (Standard & Konvertiert)
-        self.last_plans_student = {}
+        self.last_plans_student = self.state_store.load("Schüler")
 
         # 2. Lehrer-Account (Optional)
         self.dsb_teacher = None
         self.last_plans_teacher = {}
-        if Config.DSB_TEACHER_USER and Config.DSB_TEACHER_PASS:
+        if tenant.dsb_teacher_user and tenant.dsb_teacher_pass:
             self.dsb_teacher = DSBClient(
-                Config.DSB_TEACHER_USER, Config.DSB_TEACHER_PASS
+                tenant.dsb_teacher_user, tenant.dsb_teacher_pass, self.http
             )
+            self.last_plans_teacher = self.state_store.load("Lehrer")
             logger.info("Lehrer-Account wurde erfolgreich initialisiert.")
 
         # Liste aller zu verarbeitenden Clients
@@ -54,63 +107,122 @@ class SubstitutionBot:
                 }
             )
 
+        # Die Client-Zyklen laufen parallel, jeder Client in einem eigenen Worker
+        self.client_pool = shared.client_pool if shared else ThreadPoolExecutor(
+            max_workers=len(self.clients), thread_name_prefix="dsb-client"
+        )
+
         # --- Sonstige Initialisierung ---
 
+        # Abrufplan (Zeitfenster, Zufallsversatz, Backoff); Zyklen dürfen sich nie überlappen
+        try:
+            self.scheduler = create_scheduler(tenant.poll_timetable, tenant.poll_holidays)
+        except ValueError as e:
+            logger.critical(f"FATAL: Ungültiger Abrufplan: {e}")
+            raise
+        self._cycle_lock = threading.Lock()
+
         self.discord = DiscordNotifier(
-            Config.WEBHOOK_WARN, Config.WEBHOOK_PLANS, Config.DISCORD_PING_ROLE_ID
+            tenant.webhook_warn,
+            tenant.webhook_plans,
+            tenant.discord_ping_role_id,
+            self.http,
+            name=tenant.name,
         )
 
         self.git = GitManager(
-            Config.GIT_USER, Config.GIT_TOKEN, Config.GIT_REPO, Config.REPO_DIR
+            tenant.git_user,
+            tenant.git_token,
+            tenant.git_repo,
+            tenant.repo_dir,
+            clone_depth=Config.GIT_CLONE_DEPTH,
+            clone_filter=Config.GIT_CLONE_FILTER,
+            sparse_months=Config.GIT_SPARSE_MONTHS,
+        )
+
+        # Versionierte Ablage: inhaltsadressiert, atomar, unveränderte Pläne werden weder
+        # geschrieben noch committet
+        self.plan_store = PlanStore(tenant.plans_dir)
+        # Mit Leases erst beim ersten Erwerb (siehe _prepare_lease): eine wartende Instanz
+        # darf Arbeitsverzeichnis und Temp-Dateien der aktiven Instanz nicht anfassen
+        self._archive_ready = False
+        if self.leases is None:
+            self._init_archive()
+        # Durchsuchbare Vertretungszeilen, nach jedem übernommenen Plan aktualisiert
+        self.search_index = PlanSearchIndex(tenant.search_index_db) if Config.SEARCH_INDEX else None
+
+        # Commits werden gebündelt und im Hintergrund gepusht; der Zyklus wartet nicht auf GitHub
+        self.committer = None
+        collect_paths = (
+            self.plan_store.take_written if Config.GIT_COMMIT_MODE == "fast-import" else None
         )
+        guard = (lambda: self.leases.remaining(self.lease_key)) if self.leases is not None else None
+        if shared is not None:
+            # Mehrschulbetrieb: gemeinsame Git-Worker, eine Queue pro Archiv
+            if shared.committer is not None:
+                self.committer = shared.committer.add_repo(self.git, collect_paths, guard)
+        elif Config.GIT_COMMIT_BATCHING:
+            self.committer = CommitScheduler(
+                self.git,
+                window=Config.GIT_COMMIT_WINDOW,
+                max_changes=Config.GIT_COMMIT_MAX_CHANGES,
+                max_backoff=Config.GIT_PUSH_MAX_BACKOFF,
+                push_timeout=Config.GIT_PUSH_TIMEOUT,
+                collect_paths=collect_paths,
+                maintenance_interval=Config.GIT_MAINTENANCE_INTERVAL,
+                guard=guard,
+            )
 
+        # Metriken (Prometheus-Text/JSON) auf einem lokalen Port; im Mehrschulbetrieb
+        # startet der Runner den Endpunkt für alle Schulen
+        self.metrics_server = None
+        if shared is None:
+            if self.committer is not None:
+                GIT_PENDING.set_function(self.committer.pending)
+            if self.discord.outbox is not None:
+                DISCORD_PENDING.set_function(self.discord.outbox.pending)
+            self.metrics_server = start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
+
+        if self.leases is not None:
+            self.leases.register(self.lease_key, self._can_release_lease)
+            # Im Mehrschulbetrieb startet der Runner den Koordinator nach allen Schulen
+            if shared is None:
+                self.leases.start()
+
+    def _init_archive(self):
+        """Gleicht das Git-Archiv ab (Clone bzw. Pull) und entfernt Reste eines abgebrochenen Laufs."""
         try:
             self.git.initialize_repo()
         except Exception as e:
             self.discord.send_warning(f"⚠️ Kritischer Git-Fehler beim Start: {e}")
             logger.critical(f"Kritischer Git-Fehler beim Start: {e}")
+        os.makedirs(self.tenant.plans_dir, exist_ok=True)
+        self.plan_store.remove_stale_tmp()
+        self._archive_ready = True
 
-        os.makedirs(Config.PLANS_DIR, exist_ok=True)
-
-    def _extract_plan_date(self, html_content: str) -> datetime | None:
+    def _extract_plan_date(self, plan: ParsedPlan | str) -> datetime | None:
         """Extrahiert das Datum (als datetime-Objekt) aus dem HTML-Inhalt des Plans.
 
-        Sucht im 'mon_title' Div nach dem Muster DD.MM.YYYY.
+        Sucht im 'mon_title' Div nach dem Muster DD.MM.YYYY. Bei einem ParsedPlan
+        wird das bereits geparste Dokument wiederverwendet.
         """
         try:
-            soup = BeautifulSoup(html_content, "html.parser")
-            mon_title_div = soup.find("div", class_="mon_title")
-            date_str_to_parse = None
-
-            if mon_title_div:
-                full_title_text = mon_title_div.text.strip()
-                # Regex sucht nach DD.MM.YYYY oder D.M.YYYY
-                match = re.search(r"(\d{1,2}\.\d{1,2}\.\d{4})", full_title_text)
-
-                if match:
-                    date_str_to_parse = match.group(1)
-
-            if date_str_to_parse:
-                # Versucht, das Datum zu parsen
-                # Die Zeitkomponenten werden auf 0 gesetzt, um nur das Datum zu vergleichen
-                dt_obj = datetime.strptime(date_str_to_parse, "%d.%m.%Y")
-                return dt_obj.replace(hour=0, minute=0, second=0, microsecond=0)
-
-            return None
+            return ParsedPlan.of(plan).date
         except Exception as e:
             logger.warning(f"Fehler beim Extrahieren des Datums aus dem Plan: {e}")
             return None
 
-    def _get_n_working_days_from_now(self, n: int) -> datetime:
+    def _get_n_working_days_from_now(self, n: int, today: date | None = None) -> datetime:
         """Berechnet das Datum, das n Arbeitstage (Mo-Fr) in der Zukunft liegt.
 
         Args:
             n: Die Anzahl der Arbeitstage, die addiert werden sollen.
+            today: Ausgangsdatum (Standard: heute).
 
         Returns:
             Ein datetime-Objekt, das den Start des berechneten Tages darstellt.
         """
-        target_date = datetime.now().date()
+        target_date = today or datetime.now().date()
         days_added = 0
 
         # Gehe Tag für Tag vor, bis n Arbeitstage hinzugefügt wurden
@@ -126,22 +238,24 @@ class SubstitutionBot:
     def _fetch_title(self, url):
         """Ruft den Titel (Datum und Tag) eines Vertretungsplans ab, indem die HTML-Seite geparsed wird."""
         try:
-            res = requests.get(url, timeout=10)
+            res = self.http.get(url)
             res.encoding = res.apparent_encoding
-            soup = BeautifulSoup(res.text, "html.parser")
-            div = soup.find("div", class_="mon_title")
-            return div.text.strip() if div else "Unbekannter Plan"
+            return ParsedPlan(res.text).title or "Unbekannter Plan"
         except Exception:
             logger.warning(f"Konnte Titel für URL {url} nicht abrufen.", exc_info=True)
             return "Unbekannter Plan"
 
     def _save_content_by_date(
-        self, html_content: str, title: str, identifier: str
-    ) -> bool:
-        """Speichert den HTML-Inhalt im plans/ Ordner, extrahiert Datum und benennt die Datei."""
+        self, plan: ParsedPlan, title: str, identifier: str
+    ) -> bool | None:
+        """Legt den Plan als neue Version für sein Datum im plans/ Ordner ab (HTML und
+        Vertretungszeilen als JSON, siehe PlanStore). Übernommen wird am Zyklusende.
+
+        Gibt None zurück, wenn der Inhalt für diesen Tag bereits aktuell vorliegt.
+        """
         try:
             # 1. Datum aus dem HTML-Inhalt extrahieren (Kernlogik)
-            dt_obj = self._extract_plan_date(html_content)
+            dt_obj = self._extract_plan_date(plan)
 
             # 2. Dateinamen bestimmen
             if dt_obj:
@@ -154,16 +268,21 @@ class SubstitutionBot:
                 # Fallback auf das aktuelle Datum
                 date_str = datetime.now().strftime("%Y-%m-%d")
 
-            # 3. Dateinamen-Logik: YYYY-MM-DD.html
-            filename = f"{date_str}.html"
+            # 3. Maschinenlesbare Zeilen als JSON neben dem HTML (Fehler nur protokollieren)
+            try:
+                rows_json = plan.to_json()
+            except Exception as e:
+                logger.warning(f"JSON-Zeilen für '{identifier}' konnten nicht erzeugt werden: {e}")
+                rows_json = None
 
-            full_path = os.path.join(Config.PLANS_DIR, filename)
+            # 4. Neue Version anlegen (entfällt bei identischem Inhalt für diesen Tag)
+            saved = self.plan_store.save_plan(date_str, identifier, title, plan.html, rows_json)
 
-            # 4. HTML-Inhalt speichern
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
+            if saved is None:
+                logger.debug(f"Plan unverändert, nicht neu geschrieben ({title}): {date_str}")
+                return None
 
-            logger.info(f"Plan gespeichert ({title}): {full_path}")
+            logger.info(f"Plan gespeichert ({title}): {self.plan_store.view_path(date_str, identifier)}")
             return True
         except Exception as e:
             logger.error(
@@ -171,42 +290,169 @@ class SubstitutionBot:
             )
             return False
 
-    def _save_html_from_url(self, url: str, title: str) -> bool:
-        """Wrapper, der HTML von einer URL abruft und _save_content_by_date aufruft."""
-        try:
-            # Planinhalt abrufen
-            res = requests.get(url, timeout=10)
-            res.encoding = res.apparent_encoding
-            html_content = res.text
+    def _index_flushed(self):
+        """Übernimmt die Zeilen der übernommenen Versionen in den Suchindex (Fehler nur protokollieren)."""
+        for saved in self.plan_store.take_flushed():
+            if self.search_index is None:
+                continue
+            try:
+                self.search_index.index_version(
+                    self.tenant.plans_dir, saved["date"], saved["source"], saved["title"], saved["version"]
+                )
+            except Exception as e:
+                logger.warning(f"Suchindex für '{saved['title']}' konnte nicht aktualisiert werden: {e}")
+
+    def _download_plan(self, url: str):
+        """Lädt einen Plan per bedingtem GET (If-None-Match/If-Modified-Since).
+
+        Gibt die Response zurück oder None, wenn der Server mit 304 (unverändert) antwortet.
+        """
+        with track_stage("plan_download"):
+            res = self.http.get(url, headers=self.plan_cache.conditional_headers(url))
+        PLAN_DOWNLOADS.inc(status=res.status_code)
+        if res.status_code == 304:
+            logger.debug(f"Plan unverändert (304): {url}")
+            return None
+        # Fehlerseiten (z.B. 500) nie als Plan ohne Zeilen verarbeiten
+        res.raise_for_status()
+
+        BYTES_DOWNLOADED.inc(len(res.content), source="plan")
+        res.encoding = res.apparent_encoding
+        return res
+
+    def _save_if_rows_changed(
+        self, plan: ParsedPlan, title: str, identifier: str, previous: dict | None
+    ) -> tuple[bool | None, PlanDiff]:
+        """Vergleicht die Zeilen des Plans mit seiner Vorversion und speichert nur bei Änderungen.
 
+        Gibt (Ergebnis von _save_content_by_date bzw. None, Diff) zurück.
+        """
+        diff = diff_plan(previous, plan)
+        if not diff.has_changes:
+            logger.debug(f"Zeilen unverändert, Plan wird nicht gespeichert ({title}).")
+            return None, diff
+
+        if not diff.is_new:
+            logger.info(f"Zeilenänderungen in {title}: {diff.summary()}")
+        return self._save_content_by_date(plan, title, identifier), diff
+
+    @staticmethod
+    def _rows_state(plan: ParsedPlan) -> dict:
+        """Zeilen und Titel eines Plans für den Zustand (Vergleichsbasis im nächsten Zyklus)."""
+        return {"rows": [row.to_dict() for row in plan.rows], "plan_title": plan.title}
+
+    def _save_html_from_url(
+        self, url: str, title: str, source: str, download=None, previous: dict | None = None
+    ) -> tuple[bool | None, ParsedPlan | None, PlanDiff | None]:
+        """Wrapper, der HTML von einer URL abruft und _save_if_rows_changed aufruft.
+
+        `source` ist die Quelle im Archiv (PlanStore.plan_source), `download` optional ein
+        bereits im Fetch-Pool gestarteter Download (Future),
+        `previous` der Zustandseintrag der Vorversion. Gibt (Ergebnis, Plan, Diff) zurück;
+        das Ergebnis ist None, wenn der Plan unverändert ist (304, gleiche Zeilen oder
+        identischer Inhalt).
+        """
+        try:
+            # Planinhalt abrufen (bzw. auf den parallel gestarteten Download warten)
+            res = download.result() if download else self._download_plan(url)
+            if res is None:
+                return None, None, None
             # Kernlogik auslagern
-            return self._save_content_by_date(html_content, title, url)
+            plan = ParsedPlan(res.text)
+            saved, diff = self._save_if_rows_changed(plan, title, source, previous)
+            if saved is not False:
+                self.plan_cache.store(url, res)
+            return saved, plan, diff
 
         except Exception as e:
             logger.error(
                 f"Konnte HTML nicht von URL ({url}) abrufen: {e}", exc_info=True
             )
-            return False
+            return False, None, None
+
+    @staticmethod
+    def _find_previous_converted(
+        last_plans: dict, original_url: str, date_tag: str, unique_key: str
+    ) -> dict | None:
+        """Sucht die Vorversion eines konvertierten Plans (gleicher Lehrerplan, gleiches Datum).
+
+        Der Zähler im Key kann sich verschieben, daher zählt das Plandatum.
+        """
+        for data in last_plans.values():
+            if data.get("original_url") == original_url and data.get("plan_date") == date_tag:
+                return data
+        return last_plans.get(unique_key)
+
+    @staticmethod
+    def _keep_converted(last_plans: dict, current_plans: dict, original_url: str):
+        """Übernimmt die bisherigen konvertierten Pläne eines Lehrerplans in den neuen Zustand
+        (bereits neu verarbeitete Einträge bleiben unverändert)."""
+        for key, data in last_plans.items():
+            if data.get("original_url") == original_url:
+                current_plans.setdefault(key, data)
+
+    def _is_plan_changed(self, plan_data: dict, last_plans: dict) -> bool:
+        """Prüft anhand der Menü-Metadaten (Titel, Zeitstempel), ob ein Standardplan neu/geändert ist."""
+        url = plan_data["detail"]
+        last_data = last_plans.get(url)
+
+        is_new = url not in last_plans
+        is_updated = last_data and (
+            # Prüfen auf Änderung von Titel oder Zeitstempel (date)
+            last_data.get("title") != plan_data["title"]
+            or last_data.get("date") != plan_data.get("date")
+        )
+        return bool(is_new or is_updated)
+
+    def _start_downloads(self, plan_objects: list, last_plans: dict) -> dict:
+        """Startet alle in diesem Zyklus benötigten Plan-Downloads parallel im Fetch-Pool.
+
+        Gibt {url: Future} zurück. Die Verarbeitung der Ergebnisse erfolgt danach
+        weiterhin sequenziell in Menü-Reihenfolge, damit Zustand und Dateien deterministisch bleiben.
+        """
+        downloads = {}
+        for plan_data in plan_objects:
+            url = plan_data["detail"]
+            title = plan_data["title"]
+
+            if title == "Lehrerzimmer heute" or url in downloads:
+                continue
+            if title == "Lehrerzimmer morgen" or self._is_plan_changed(plan_data, last_plans):
+                downloads[url] = self.fetch_pool.submit(self._download_plan, url)
+
+        if downloads:
+            logger.debug(f"{len(downloads)} Plan-Downloads parallel gestartet.")
+        return downloads
 
     def _process_client_cycle(
         self, client: DSBClient, last_plans: dict, client_name: str
-    ) -> tuple[dict, dict, set]:
+    ) -> tuple[dict, set, dict]:
         """Führt einen Abrufzyklus für einen bestimmten DSBClient durch.
 
-        Gibt den aktualisierten Zustand (current_plans), den aktualisierten Zustand
-        der konvertierten Pläne und die neuen/geänderten Keys zurück.
+        Gibt den aktualisierten Zustand (current_plans), die neuen/geänderten Keys
+        und die Zeilen-Diffs dieser Keys zurück.
         """
         logger.debug(f"Starte Abrufzyklus für {client_name}-Account.")
         plan_objects = client.fetch_menu_links()
 
         if not plan_objects:
             logger.warning(f"Keine Plan-Objekte vom {client_name}-Account abgerufen.")
-            return {}, set()
+            # Zustand beibehalten, sonst gelten nach einem Abruffehler alle Pläne als neu
+            return dict(last_plans), set(), {}
+
+        # Unverändertes Menü (gleicher Fingerprint): nichts zu tun
+        if not client.has_changed():
+            logger.debug(f"DSB-Menü von {client_name} unverändert, Zyklus übersprungen.")
+            MENU_UNCHANGED.inc(client=self.tenant.label(client_name))
+            return dict(last_plans), set(), {}
 
         # current_plans enthält alle Standardpläne (Key=URL) und neu konvertierte Pläne (Key=converted_...)
         current_plans = {}
         new_keys = set()
+        diffs = {}
         converted_counter = 0
+        # Nur ein fehlerfrei verarbeitetes Menü darf künftig übersprungen werden
+        cycle_ok = True
 
         # Berechne den Mindest-Werktag (zwei Arbeitstage von heute, also übermorgen oder später)
         min_working_day = self._get_n_working_days_from_now(2)
@@ -214,6 +460,8 @@ class SubstitutionBot:
             f"Konvertierung von Lehrerplänen nur für Pläne ab: {min_working_day.strftime('%d.%m.%Y')}"
         )
 
+        downloads = self._start_downloads(plan_objects, last_plans)
+
         for plan_data in plan_objects:
             url = plan_data["detail"]
             title = plan_data["title"]
@@ -234,23 +482,28 @@ class SubstitutionBot:
                 )
 
                 try:
-                    # 1. HTML-Inhalt des Lehrerplans abrufen
-                    res = requests.get(url, timeout=10)
-                    res.encoding = res.apparent_encoding
+                    # 1. HTML-Inhalt des Lehrerplans abrufen (bedingt, 304 = unverändert)
+                    res = downloads[url].result()
+                    if res is None:
+                        # Bereits konvertierte Pläne aus diesem Lehrerplan unverändert übernehmen
+                        self._keep_converted(last_plans, current_plans, url)
+                        continue
                     teacher_html = res.text
+                    all_saved = True
 
-                    # 2. Inhalt konvertieren (Liste von HTML-Strings für Schülerpläne)
-                    converted_html_plans = ConvertTeacherToStudent(teacher_html)
+                    # 2. Inhalt konvertieren (Liste von geparsten Schülerplänen)
+                    with track_stage("convert"):
+                        converted_plans = ConvertTeacherToStudent(teacher_html)
 
-                    if not converted_html_plans:
+                    if not converted_plans:
                         logger.warning(
                             f"Konvertierung des Lehrerplans von {client_name} lieferte keine Ergebnisse."
                         )
                         continue
 
                     # 3. Verarbeite und filtere jeden konvertierten HTML-Plan
-                    for html_content in converted_html_plans:
-                        plan_dt_obj = self._extract_plan_date(html_content)
+                    for converted_plan in converted_plans:
+                        plan_dt_obj = self._extract_plan_date(converted_plan)
 
                         # Prüfe, ob der Plan frühstens vom übernächsten Werktag ist
                         if plan_dt_obj is None or plan_dt_obj < min_working_day:
@@ -267,10 +520,6 @@ class SubstitutionBot:
                         # Der Plan ist gültig und wird verarbeitet
                         converted_counter += 1
 
-                        # Temporäre Titel/Datumsextraktion nur für Zustand/Logs
-                        soup = BeautifulSoup(html_content, "html.parser")
-                        mon_title_div = soup.find("div", class_="mon_title")
-
                         # Generiere einen eindeutigen Schlüssel (beinhaltet Client-Name und Datum)
                         date_tag = plan_dt_obj.strftime("%Y%m%d")
                         unique_key = (
@@ -278,39 +527,63 @@ class SubstitutionBot:
                         )
 
                         new_title = (
-                            mon_title_div.text.strip()
-                            if mon_title_div
-                            else f"Konvertierter Plan {converted_counter} ({client_name})"
+                            converted_plan.title
+                            or f"Konvertierter Plan {converted_counter} ({client_name})"
                         )
 
-                        # 4. Speichern des HTML-Inhalts
-                        if self._save_content_by_date(
-                            html_content, new_title, unique_key
-                        ):
+                        # 4. Speichern des HTML-Inhalts (nur wenn sich Zeilen geändert haben)
+                        previous = self._find_previous_converted(
+                            last_plans, url, date_tag, unique_key
+                        )
+                        saved, diff = self._save_if_rows_changed(
+                            converted_plan, new_title, unique_key, previous
+                        )
+                        if saved is not False:
                             new_plan_data = {
                                 "detail": unique_key,  # Interner Schlüssel für das Tracking
                                 "title": new_title,
-                                "date": datetime.now().isoformat(),
+                                # Zeitstempel der Vorversion behalten, solange sich nichts ändert
+                                "date": previous["date"]
+                                if previous and saved is None
+                                else datetime.now().isoformat(),
                                 "original_url": url,
+                                "plan_date": date_tag,
+                                **self._rows_state(converted_plan),
                             }
 
-                            # Zum Zustand hinzufügen. Es ist ein Update, wenn der Key neu ist.
+                            # Zum Zustand hinzufügen. Es ist ein Update, wenn sich die Zeilen
+                            # geändert haben und der gespeicherte Inhalt tatsächlich neu ist.
                             current_plans[unique_key] = new_plan_data
-                            if unique_key not in last_plans:
+                            if saved is None:
+                                logger.debug(
+                                    f"Konvertierter Plan {new_title} inhaltlich unverändert."
+                                )
+                            else:
                                 new_keys.add(unique_key)
+                                diffs[unique_key] = diff
                                 logger.info(
                                     f"Konvertierungsziel als Neu markiert: {new_title} (Key: {unique_key})"
                                 )
-                            else:
-                                logger.debug(
-                                    f"Konvertierter Plan {new_title} existierte bereits im Zustand."
-                                )
                         else:
+                            all_saved = False
+                            cycle_ok = False
+                            # Vorversion als Vergleichsbasis für den nächsten Versuch behalten
+                            if previous:
+                                current_plans.setdefault(previous["detail"], previous)
                             logger.error(
                                 f"Speichern des konvertierten Plans {new_title} fehlgeschlagen."
                             )
 
+                    # Validatoren erst übernehmen, wenn alle Pläne gespeichert wurden
+                    if all_saved:
+                        self.plan_cache.store(url, res)
+
                 except Exception as e:
+                    cycle_ok = False
+                    # Wie bei Standardplänen: Download oder Konvertierung fehlgeschlagen, die
+                    # bisherigen konvertierten Pläne bleiben im Zustand und der nächste Zyklus
+                    # vergleicht mit ihnen, statt sie als komplett neu zu melden
+                    self._keep_converted(last_plans, current_plans, url)
                     logger.error(
                         f"Fehler bei Konvertierung des Lehrerplans {url} für {client_name}: {e}",
                         exc_info=True,
@@ -323,56 +596,260 @@ class SubstitutionBot:
             # Teil 2: Standard-Pläne (DSB App SuS, etc.)
             # **********************************************
 
-            # Verwende die URL als Schlüssel für Standardpläne
-            current_plans[url] = plan_data
-            date = plan_data.get("date")  # Zeitstempel aus Metadaten
-
-            last_data = last_plans.get(url)
+            # Verwende die URL als Schlüssel für Standardpläne. Zeilen der Vorversion
+            # bleiben als Vergleichsbasis erhalten, bis eine neue Version geladen wird.
+            previous = last_plans.get(url)
+            current_plans[url] = dict(plan_data)
+            if previous and "rows" in previous:
+                current_plans[url].update(
+                    rows=previous["rows"], plan_title=previous.get("plan_title")
+                )
 
-            is_new = url not in last_plans
-            is_updated = last_data and (
-                # Prüfen auf Änderung von Titel oder Zeitstempel (date)
-                last_data.get("title") != title
-                or last_data.get("date") != date
-            )
+            if url in downloads:
+                # Verwende die Wrapper-Methode, die den (parallel) abgerufenen Inhalt speichert
+                saved, plan, diff = self._save_html_from_url(
+                    url, title, PlanStore.plan_source(client_name, url), downloads[url], previous
+                )
+                if saved is not False and plan is not None:
+                    current_plans[url].update(self._rows_state(plan))
 
-            if is_new or is_updated:
-                # Verwende die Wrapper-Methode, die den Inhalt von der URL abruft und speichert
-                if self._save_html_from_url(url, title):
+                if saved is None:
+                    logger.debug(
+                        f"Standardplan unverändert: {title} (Client: {client_name})"
+                    )
+                elif saved:
                     new_keys.add(url)
+                    diffs[url] = diff
                     logger.info(
                         f"Standardplan als Neu/Update markiert: {title} (Client: {client_name})"
                     )
                 else:
-                    # Wenn das Speichern fehlschlägt, entfernen wir es aus current_plans
-                    current_plans.pop(url)
+                    # Wenn Download oder Speichern fehlschlagen, bleibt die Vorversion im
+                    # Zustand: der nächste Zyklus lädt erneut und vergleicht mit ihr, statt
+                    # den Plan als komplett neu zu melden
+                    if previous:
+                        current_plans[url] = previous
+                    else:
+                        current_plans.pop(url)
+                    cycle_ok = False
+
+        if cycle_ok:
+            client.mark_processed()
+
+        # Gib alle neuen/aktualisierten Pläne, die Keys und deren Diffs zurück.
+        return current_plans, new_keys, diffs
+
+    def _timed_client_cycle(
+        self, client: DSBClient, last_plans: dict, client_name: str
+    ) -> tuple[dict, set, dict]:
+        """_process_client_cycle mit Metriken (Dauer, Fehler, geänderte Pläne) pro Client."""
+        try:
+            with CLIENT_CYCLE_SECONDS.time(client=self.tenant.label(client_name)):
+                result = self._process_client_cycle(client, last_plans, client_name)
+        except Exception:
+            record_error("client_cycle")
+            raise
+        PLANS_CHANGED.inc(len(result[1]), client=self.tenant.label(client_name))
+        return result
 
-        # Gib alle neuen/aktualisierten Pläne und die Keys zurück.
-        return current_plans, new_keys
+    def has_lease(self) -> bool:
+        """Ob diese Instanz die Schule gerade abrufen darf (ohne LEASE_DB immer)."""
+        return self.leases is None or self.leases.remaining(self.lease_key) > 0
 
-    def run_cycle(self):
-        """Führt den Abrufzyklus für alle konfigurierten DSBClients (Schüler & Lehrer) aus."""
+    def _can_release_lease(self) -> bool:
+        # Abgeben (an eine weitere Instanz) nur ohne laufenden Zyklus und offene Commits/Pushes
+        if self._cycle_lock.locked():
+            return False
+        return self.committer is None or self.committer.idle()
 
-        all_current_plans = {}
-        all_new_keys = set()
+    def _prepare_lease(self) -> bool:
+        """Prüft vor einem Zyklus die Lease; nach einer Übernahme von einer anderen
+        Instanz werden zuerst Archiv und Zustand abgeglichen. False = nicht abrufen."""
+        if self.leases is None:
+            return True
+        lease = self.leases.lease(self.lease_key)
+        if lease is None:
+            return False
+        epoch, taken_over = lease
+        if epoch != self._lease_epoch:
+            if not self._archive_ready:
+                self._init_archive()
+            if taken_over and not self._resync_after_takeover():
+                return False
+            self._lease_epoch = epoch
+        return True
+
+    def _resync_after_takeover(self) -> bool:
+        """Übernimmt den Stand der vorherigen Instanz: Git-Archiv von origin/main, Plan-Zustand
+        aus der gemeinsamen Datei. Eigene, nicht gepushte Commits und Caches sind veraltet."""
+        logger.info(f"Lease für '{self.lease_key}' von einer anderen Instanz übernommen, gleiche ab...")
+        if self.committer is not None:
+            self.committer.discard()
+        if not self.git.sync_to_remote(timeout=Config.GIT_PUSH_TIMEOUT):
+            return False
+        self.plan_store.reset_index()
+        self.plan_cache.clear()
+        if self.search_index is not None:
+            # Pläne der vorherigen Instanz nachtragen (nur geänderte Tage)
+            try:
+                self.search_index.backfill(self.tenant.plans_dir)
+            except Exception as e:
+                logger.warning(f"Suchindex konnte nicht nachgetragen werden: {e}")
 
-        # Iteriere über alle konfigurierten Clients
         for client_data in self.clients:
-            client_instance = client_data["client"]
             client_name = client_data["name"]
+            state = self.state_store.load(client_name)
+            # Ein noch laufender Zyklus der alten Amtszeit wird verworfen
+            client_data["pending"] = None
+            client_data["state"] = state
+            client_data["client"].forget_processed()
+            if client_name == "Schüler":
+                self.last_plans_student = state
+            elif client_name == "Lehrer":
+                self.last_plans_teacher = state
+        return True
+
+    def next_delay(self, cycle_duration: float, updated: bool) -> float:
+        """Sekunden bis zum nächsten Zyklus laut Abrufplan; ohne Lease nur bis zur nächsten
+        Lease-Prüfung (der Abrufplan zählt diese Zeit nicht als unveränderte Zyklen)."""
+        if not self.has_lease():
+            return self.leases.check_interval
+        return self.scheduler.next_delay(datetime.now(), cycle_duration, updated)
+
+    def run_cycle(self) -> bool:
+        """Führt den Abrufzyklus für alle konfigurierten DSBClients (Schüler & Lehrer) aus.
+
+        Gibt True zurück, wenn neue/geänderte Pläne gefunden wurden. Läuft bereits ein
+        Zyklus oder hält eine andere Instanz die Lease, wird dieser Aufruf übersprungen (False).
+        """
+        if not self._cycle_lock.acquire(blocking=False):
+            logger.warning("Vorheriger Abrufzyklus läuft noch, Zyklus wird übersprungen.")
+            CYCLES.inc(result="skipped")
+            return False
+        try:
+            if not self._prepare_lease():
+                CYCLES.inc(result="standby")
+                return False
+            with CYCLE_SECONDS.time():
+                return self._run_cycle()
+        finally:
+            self._cycle_lock.release()
+
+    def _run_cycle(self) -> bool:
+        futures = self._submit_client_cycles()
+        wait(futures, timeout=Config.CLIENT_CYCLE_TIMEOUT)
+        return self._finish_cycle(futures)
+
+    async def run_cycle_async(self) -> bool:
+        """Wie run_cycle, aber auf der asyncio-Eventloop.
+
+        Die Client-Zyklen laufen weiterhin im Client-Pool; gewartet wird ohne
+        blockierten Thread. Zusammenführen, Zustand, Discord und Git laufen in einem
+        Executor und werden bei einem Abbruch noch zu Ende geführt.
+        """
+        if not self._cycle_lock.acquire(blocking=False):
+            logger.warning("Vorheriger Abrufzyklus läuft noch, Zyklus wird übersprungen.")
+            CYCLES.inc(result="skipped")
+            return False
+        cycle_start = time.perf_counter()
+        try:
+            if not await asyncio.to_thread(self._prepare_lease):
+                CYCLES.inc(result="standby")
+                return False
+            futures = self._submit_client_cycles()
+            await asyncio.wait(
+                [asyncio.wrap_future(future) for future in futures],
+                timeout=Config.CLIENT_CYCLE_TIMEOUT,
+            )
 
-            # Hole den Zustand für diesen Client
-            # Da `self.clients` eine Liste von Dictionaries mit einem 'state'-Schlüssel ist,
-            # können wir den Zustand direkt verwenden und am Ende des Zyklus aktualisieren.
-            last_plans = client_data["state"]
+            finish = asyncio.ensure_future(asyncio.to_thread(self._finish_cycle, futures))
+            try:
+                return await asyncio.shield(finish)
+            except asyncio.CancelledError:
+                # Zustand und Git nicht mittendrin abbrechen
+                await finish
+                raise
+        finally:
+            self._cycle_lock.release()
+            CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
+
+    def _submit_client_cycles(self) -> list:
+        """Startet die Zyklen aller Clients parallel im Client-Pool und gibt die Futures zurück.
+
+        Ein Client, dessen Zyklus aus dem letzten Durchlauf noch läuft, wird nicht erneut gestartet.
+        """
+        futures = []
+        for client_data in self.clients:
+            future = client_data.get("pending")
+            if future is None:
+                # Da `self.clients` eine Liste von Dictionaries mit einem 'state'-Schlüssel ist,
+                # können wir den Zustand direkt verwenden und am Ende des Zyklus aktualisieren.
+                future = self.client_pool.submit(
+                    self._timed_client_cycle,
+                    client_data["client"],
+                    client_data["state"],
+                    client_data["name"],
+                )
+            futures.append(future)
+        return futures
+
+    def _finish_cycle(self, futures: list) -> bool:
+        """Führt die Client-Ergebnisse zusammen, speichert den Zustand und meldet/pusht Updates."""
+        if not self.has_lease():
+            # Lease während des Abrufs verloren: Zustand, Meldungen und Commits gehören
+            # jetzt der übernehmenden Instanz
+            logger.warning(f"Lease für '{self.lease_key}' während des Zyklus verloren, Ergebnis verworfen.")
+            for client_data in self.clients:
+                client_data["pending"] = None
+            CYCLES.inc(result="standby")
+            return False
 
-            current_plans, new_keys = self._process_client_cycle(
-                client_instance, last_plans, client_name
+        # Im Zyklus vorbereitete Plan-Dateien gesammelt (ein fsync-Durchgang) übernehmen,
+        # bevor Zustand, Meldung und Commit auf sie verweisen
+        try:
+            self.plan_store.flush()
+        except OSError as e:
+            record_error("file_sync")
+            logger.error(
+                f"Plan-Dateien konnten nicht übernommen werden, Zyklus wird wiederholt: {e}", exc_info=True
             )
+            self._discard_cycle(futures)
+            CYCLES.inc(result="error")
+            return False
+        self._index_flushed()
+
+        all_current_plans = {}
+        all_new_keys = set()
+        all_diffs = {}
+
+        # Ergebnisse in fester Client-Reihenfolge zusammenführen
+        for client_data, future in zip(self.clients, futures):
+            client_name = client_data["name"]
+
+            if not future.done():
+                # Langsamer Client blockiert die anderen nicht; sein Ergebnis wird im
+                # nächsten Zyklus übernommen.
+                client_data["pending"] = future
+                all_current_plans.update(client_data["state"])
+                logger.warning(
+                    f"{client_name}-Zyklus nach {Config.CLIENT_CYCLE_TIMEOUT}s nicht abgeschlossen, "
+                    "Ergebnis folgt im nächsten Zyklus."
+                )
+                continue
+            client_data["pending"] = None
+
+            try:
+                current_plans, new_keys, diffs = future.result()
+            except Exception as e:
+                # Fehler eines Clients dürfen den anderen nicht beeinflussen
+                logger.error(f"{client_name}-Zyklus fehlgeschlagen: {e}", exc_info=True)
+                all_current_plans.update(client_data["state"])
+                continue
 
             # Füge die Ergebnisse zum Gesamtzustand hinzu (für Discord-Benachrichtigung und Git-Commit)
             all_current_plans.update(current_plans)
             all_new_keys.update(new_keys)
+            all_diffs.update(diffs)
 
             # Aktualisiere den spezifischen Client-Zustand für den nächsten Durchlauf
             # Wichtig: 'state' ist eine Referenz auf self.last_plans_student/teacher
@@ -382,21 +859,73 @@ class SubstitutionBot:
             elif client_name == "Lehrer":
                 self.last_plans_teacher = current_plans
 
+            # Zustand inkrementell auf die Platte schreiben (nur geänderte Einträge)
+            try:
+                self.state_store.save(client_name, current_plans)
+            except Exception as e:
+                logger.error(f"Zustand für {client_name} konnte nicht gespeichert werden: {e}")
+
             logger.debug(
                 f"{client_name}-Zyklus abgeschlossen. Neue/aktualisierte Schlüssel: {len(new_keys)}"
             )
 
         updated = bool(all_new_keys)
+        CYCLES.inc(result="updated" if updated else "unchanged")
 
         if updated:
             logger.info(f"Gesamt-Updates gefunden: {list(all_new_keys)}")
             # Sende Discord-Nachricht basierend auf allen neuen/aktualisierten Plänen
-            self.discord.send_plan_update(all_current_plans, all_new_keys)
-            self.git.push_changes()
+            self.discord.send_plan_update(all_current_plans, all_new_keys, all_diffs)
+            if self.committer is not None:
+                self.committer.add_changes(all_new_keys)
+            else:
+                self.git.push_changes()
 
         if not updated:
             logger.debug("Keine neuen Gesamt-Updates gefunden.")
 
+        self.http.log_stats()
+        return updated
+
+    def _discard_cycle(self, futures: list):
+        """Verwirft die Ergebnisse eines Zyklus, dessen Plan-Dateien nicht auf der Platte
+        gelandet sind: Zustand, Meldungen und Commits bleiben auf dem alten Stand, und der
+        nächste Zyklus lädt und speichert die Pläne erneut."""
+        for client_data, future in zip(self.clients, futures):
+            # Noch laufende Clients speichern erst danach und werden normal übernommen
+            client_data["pending"] = None if future.done() else future
+            client_data["client"].forget_processed()
+        # Validatoren dieses Zyklus gehören zu nicht gespeicherten Inhalten (sonst 304)
+        self.plan_cache.clear()
+
+    def shutdown(self):
+        """Gibt Worker-Pools, Zustandsdatenbank, Suchindex, Git- und Discord-Warteschlange sowie HTTP-Session frei.
+
+        Im Mehrschulbetrieb nur den eigenen Zustand; die gemeinsamen Ressourcen schließt der Runner.
+        """
+        if self._shared is None:
+            self.client_pool.shutdown(wait=False, cancel_futures=True)
+            self.fetch_pool.shutdown(wait=False, cancel_futures=True)
+        # Ein laufendes Zusammenführen (Zustand speichern) erst abschließen lassen
+        if self._cycle_lock.acquire(timeout=Config.CLIENT_CYCLE_TIMEOUT):
+            self._cycle_lock.release()
+        self.state_store.close()
+        if self.search_index is not None:
+            self.search_index.close()
+        if self._shared is not None:
+            return
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.committer is not None:
+            # Offene Änderungen noch committen und einen letzten Push versuchen
+            self.committer.close()
+        if self.leases is not None:
+            # Erst nach dem letzten Push freigeben, dann übernimmt eine andere Instanz sofort
+            self.leases.close()
+        self.discord.close()
+        self.http.close()
+        logger.info("Bot beendet.")
+
     def start(self):
         """Startet den Haupt-Bot-Zyklus."""
         logger.info("Bot gestartet.")
@@ -404,11 +933,14 @@ class SubstitutionBot:
 
         while True:
             # --- 1. Abrufzyklus (Schüler und Lehrer) ---
-            self.run_cycle()
+            cycle_start = time.monotonic()
+            updated = self.run_cycle()
+            cycle_duration = time.monotonic() - cycle_start
 
-            # --- 2. Warte bis zur nächsten vollen Minute ---
+            # --- 2. Warte laut Abrufplan bis zum nächsten Zyklus ---
             try:
-                time_to_wait = 60 - time.localtime().tm_sec
+                time_to_wait = self.next_delay(cycle_duration, updated)
+                logger.debug(f"Nächster Abrufzyklus in {time_to_wait:.0f}s.")
                 time.sleep(time_to_wait)
             except Exception as e:
                 err_msg = f"Fehler beim Warten: {e}"
@@ -0,0 +1,306 @@
+import threading
+import time
+from utils import logger
+
+# Wartezeit zwischen Push-Versuchen (exponentielles Backoff, in Sekunden)
+PUSH_INITIAL_BACKOFF = 15
+# Erste Git-Wartung nach dem Start (Sekunden), danach alle `maintenance_interval`
+MAINTENANCE_STARTUP_DELAY = 600
+# Ohne Lease wartende Archive werden in diesem Abstand erneut geprüft (Sekunden)
+LEASE_RECHECK_INTERVAL = 5
+
+
+class RepoQueue:
+    """Offene Änderungen und Push-Zustand eines Git-Archivs im CommitScheduler."""
+
+    def __init__(self, scheduler, git, collect_paths, next_maintenance, guard=None):
+        self._scheduler = scheduler
+        self.git = git
+        self.collect_paths = collect_paths
+        # Restgültigkeit der Lease in Sekunden (None = keine Leases, immer erlaubt)
+        self.guard = guard
+        self._pending = set()
+        self._first_change = None
+        self._needs_push = False
+        self._push_failures = 0
+        self._next_push = 0.0
+        self._full_commit = True
+        # Dateien eines fehlgeschlagenen Commits, kommen in den nächsten Commit
+        self._retry_paths = set()
+        self._next_maintenance = next_maintenance
+        # Gerade von einem Worker bearbeitet (nie zwei Git-Befehle im selben Repo)
+        self._busy = False
+
+    def add_changes(self, keys):
+        """Meldet geänderte Pläne (Schlüssel); die Dateien liegen bereits im Repo-Ordner."""
+        self._scheduler._add_changes(self, keys)
+
+    def pending(self) -> int:
+        with self._scheduler._cond:
+            return len(self._pending)
+
+    def idle(self) -> bool:
+        """Nichts zu committen oder zu pushen und kein Git-Befehl aktiv."""
+        with self._scheduler._cond:
+            return not (self._pending or self._needs_push or self._busy)
+
+    def discard(self):
+        """Verwirft offene Änderungen und ausstehende Pushes (nach Übernahme einer Lease
+        durch diese Instanz; die Pläne wurden inzwischen von einer anderen committet).
+        Wartet, bis ein laufender Git-Befehl im Archiv beendet ist."""
+        with self._scheduler._cond:
+            while self._busy:
+                self._scheduler._cond.wait()
+            self._pending = set()
+            self._first_change = None
+            self._retry_paths = set()
+            self._needs_push = False
+            self._push_failures = 0
+            self._next_push = 0.0
+
+    def _lease_left(self) -> float | None:
+        return self.guard() if self.guard is not None else None
+
+
+class CommitScheduler:
+    """Sammelt Planänderungen und schreibt sie gebündelt ins Git-Archiv.
+
+    - `add_changes` kehrt sofort zurück; der Abrufzyklus wartet weder auf Commit noch Push.
+    - Ein Commit entsteht, sobald seit der ersten noch nicht committeten Änderung
+      `window` Sekunden vergangen sind oder `max_changes` Änderungen angefallen sind.
+    - Gepusht wird im selben Hintergrund-Thread; fehlgeschlagene Pushes werden mit
+      Backoff (bis `max_backoff`) wiederholt, neue Commits werden dabei mitgenommen.
+    - Mit `collect_paths` (liefert die seit dem letzten Aufruf geschriebenen Dateien)
+      wird nur über diese Dateien committet (git fast-import), sonst über `git add .`.
+      Der erste Commit nach dem Start läuft immer über `git add .`, damit auch Reste
+      eines vorherigen Laufs im Archiv landen. Schlägt ein Commit fehl, werden seine
+      Dateien nach `window` Sekunden zusammen mit neuen Änderungen erneut committet.
+    - Alle `maintenance_interval` Sekunden (0 = nie) läuft die Git-Wartung im selben
+      Thread, damit sie sich nie mit einem Commit überschneidet.
+    - Mehrere Archive (Mehrschulbetrieb) werden mit `add_repo` angemeldet und von
+      `workers` gemeinsamen Threads reihum bedient; pro Archiv läuft nie mehr als ein
+      Git-Befehl gleichzeitig.
+    - Mit `guard` (Restgültigkeit der Lease, siehe leases.py) wird nur committet und
+      gepusht (und gewartet), solange diese Instanz das Archiv hält; ein Push endet
+      spätestens mit der Lease.
+    - `close` committet offene Änderungen sofort und versucht einen letzten Push.
+    """
+
+    def __init__(
+        self,
+        git=None,
+        window=120,
+        max_changes=20,
+        max_backoff=900,
+        push_timeout=120,
+        collect_paths=None,
+        maintenance_interval=0,
+        workers=1,
+        guard=None,
+    ):
+        self.window = window
+        self.max_changes = max_changes
+        self.max_backoff = max_backoff
+        self.push_timeout = push_timeout
+        self.maintenance_interval = maintenance_interval
+
+        self._cond = threading.Condition()
+        self._repos = []
+        self._flush = False
+        self._closed = False
+
+        # Einzelbetrieb: ein Archiv, add_changes/pending direkt am Scheduler
+        self._default = self.add_repo(git, collect_paths, guard) if git is not None else None
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"git-commit-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def add_repo(self, git, collect_paths=None, guard=None) -> RepoQueue:
+        """Meldet ein weiteres Git-Archiv an; Änderungen laufen über die zurückgegebene Queue."""
+        next_maintenance = (
+            time.monotonic() + min(MAINTENANCE_STARTUP_DELAY, self.maintenance_interval)
+            if self.maintenance_interval else None
+        )
+        repo = RepoQueue(self, git, collect_paths, next_maintenance, guard)
+        with self._cond:
+            self._repos.append(repo)
+        return repo
+
+    def add_changes(self, keys):
+        self._default.add_changes(keys)
+
+    def idle(self) -> bool:
+        return self._default.idle()
+
+    def discard(self):
+        self._default.discard()
+
+    def pending(self) -> int:
+        """Offene Änderungen aller Archive."""
+        with self._cond:
+            return sum(len(repo._pending) for repo in self._repos)
+
+    def _add_changes(self, repo, keys):
+        keys = set(keys)
+        if not keys:
+            return
+        with self._cond:
+            if repo._first_change is None:
+                repo._first_change = time.monotonic()
+            repo._pending |= keys
+            self._cond.notify()
+
+    # --- Hintergrund-Threads ---
+
+    def _commit_due(self, repo, now):
+        if not repo._pending:
+            return None
+        if self._flush or len(repo._pending) >= self.max_changes:
+            return now
+        return repo._first_change + self.window
+
+    def _next_action(self, now):
+        """(Aktion, Archiv, Schlüssel) für das erste fällige Archiv, sonst (None, nächste Frist)."""
+        deadlines = []
+        for repo in self._repos:
+            if repo._busy:
+                continue
+            if repo.guard is not None and (repo._pending or repo._needs_push) and repo.guard() <= 0:
+                # Ohne Lease weder committen noch pushen; bei Übernahme verwirft discard()
+                deadlines.append(now + LEASE_RECHECK_INTERVAL)
+                continue
+            commit_at = self._commit_due(repo, now)
+            push_at = repo._next_push if repo._needs_push else None
+            if commit_at is not None and commit_at <= now:
+                keys, repo._pending, repo._first_change = repo._pending, set(), None
+                return ("commit", repo, keys), None
+            if push_at is not None and push_at <= now:
+                return ("push", repo, None), None
+            deadlines += [t for t in (commit_at, push_at) if t is not None]
+
+        if self._closed:
+            return None, None
+        for repo in self._repos:
+            maintenance_at = repo._next_maintenance
+            if repo._busy or maintenance_at is None:
+                continue
+            if maintenance_at <= now and repo.guard is not None and repo.guard() <= 0:
+                # Ohne Lease gehört das Arbeitsverzeichnis ggf. einer anderen Instanz
+                repo._next_maintenance = now + self.maintenance_interval
+                continue
+            if maintenance_at <= now:
+                repo._next_maintenance = now + self.maintenance_interval
+                return ("maintenance", repo, None), None
+            deadlines.append(maintenance_at)
+        return None, min(deadlines) if deadlines else None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    action, deadline = self._next_action(now)
+                    if action is not None:
+                        break
+                    # Beim Schließen endet ein Thread, sobald nichts mehr sofort fällig ist
+                    # und kein anderer Thread noch ein Archiv bearbeitet
+                    if self._closed and not any(repo._busy for repo in self._repos):
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(timeout=deadline - now if deadline is not None else None)
+
+                kind, repo, keys = action
+                repo._busy = True
+                # Reihum: das bearbeitete Archiv stellt sich hinten an
+                self._repos.remove(repo)
+                self._repos.append(repo)
+
+            try:
+                if kind == "commit":
+                    self._commit(repo, keys)
+                elif kind == "push":
+                    self._push(repo)
+                else:
+                    repo.git.run_maintenance()
+            except Exception as e:
+                logger.error(f"Git-Hintergrundaufgabe ({kind}) fehlgeschlagen: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    repo._busy = False
+                    self._cond.notify_all()
+
+    def _commit(self, repo, keys):
+        lease_left = repo._lease_left()
+        if lease_left is not None and lease_left <= 0:
+            # Lease gerade abgelaufen: Änderungen bleiben offen
+            with self._cond:
+                repo._pending |= keys
+                if repo._first_change is None:
+                    repo._first_change = time.monotonic()
+            return
+        message = f"Automated update ({len(keys)} Pläne)"
+        paths = repo.collect_paths() if repo.collect_paths is not None else None
+        if paths is not None:
+            paths |= repo._retry_paths
+            repo._retry_paths = set()
+        if paths is None or repo._full_commit:
+            committed = repo.git.commit_changes(message)
+            if committed is not False:
+                repo._full_commit = False
+        else:
+            committed = repo.git.commit_paths(paths, message)
+        if committed is False:
+            # Die Dateien sind schon aus dem PlanStore abgeholt: merken und mit dem
+            # nächsten Commit erneut versuchen (beim Schließen übernimmt das der nächste Start)
+            with self._cond:
+                repo._retry_paths |= paths or set()
+                if not self._closed:
+                    repo._pending |= keys
+                    if repo._first_change is None:
+                        repo._first_change = time.monotonic()
+            return
+        if committed:
+            with self._cond:
+                repo._needs_push = True
+                # Ein neuer Commit wartet nicht auf das Backoff eines alten Fehlschlags
+                if not repo._push_failures:
+                    repo._next_push = 0.0
+
+    def _push(self, repo):
+        timeout = self.push_timeout
+        lease_left = repo._lease_left()
+        if lease_left is not None:
+            if lease_left <= 0:
+                return
+            timeout = min(timeout, lease_left)
+        ok = repo.git.push(timeout=timeout)
+        with self._cond:
+            if ok:
+                repo._needs_push = False
+                repo._push_failures = 0
+                return
+            repo._push_failures += 1
+            delay = min(PUSH_INITIAL_BACKOFF * 2 ** (repo._push_failures - 1), self.max_backoff)
+            repo._next_push = time.monotonic() + delay
+        logger.warning(
+            f"Git Push fehlgeschlagen ({repo._push_failures}. Versuch), neuer Versuch in {delay}s."
+        )
+
+    def close(self):
+        """Committet offene Änderungen, versucht einen letzten Push und beendet die Threads."""
+        with self._cond:
+            self._flush = True
+            for repo in self._repos:
+                repo._next_push = 0.0
+            self._closed = True
+            self._cond.notify_all()
+        # Die Threads beenden sich erst, wenn nichts mehr sofort fällig ist
+        deadline = time.monotonic() + (self.push_timeout + 30) * max(1, len(self._repos))
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        for repo in self._repos:
+            repo.git.close()
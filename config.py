@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,9 @@ class Config:
     
     DSB_TEACHER_USER = os.getenv("DSB_TEACHER_USER")
     DSB_TEACHER_PASS = os.getenv("DSB_TEACHER_PASS")
+
+    # GetData-Endpunkt (für Tests z.B. auf benchmarks/dsb_simulator.py umstellen)
+    DSB_DATA_URL = os.getenv("DSB_DATA_URL", "https://app.dsbcontrol.de/JsonHandler.ashx/GetData")
     
     GIT_USER = os.getenv("GIT_USER")
     GIT_TOKEN = os.getenv("GIT_TOKEN")
@@ -20,6 +24,93 @@ class Config:
     DISCORD_PING_ROLE_ID = os.getenv("DISCORD_PING_ROLE_ID", "")
     
     TEMP_THRESHOLD = float(os.getenv("TEMP_THRESHOLD", 75))
+
+    # HTTP-Verbindungen (geteilte Session mit Keep-Alive)
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4))
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 4))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+
+    # Parallele Plan-Downloads pro Zyklus (sollte <= HTTP_POOL_MAXSIZE sein)
+    FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 4))
+    # Max. Wartezeit auf einen Client-Zyklus, bevor die übrigen Clients ohne ihn fortfahren
+    CLIENT_CYCLE_TIMEOUT = float(os.getenv("CLIENT_CYCLE_TIMEOUT", 45))
+
+    # Discord-Zustellung im Hintergrund (0 = direkt im Abrufzyklus senden)
+    DISCORD_QUEUE = os.getenv("DISCORD_QUEUE", "1") != "0"
+    # Max. Anzahl offener Discord-Nachrichten im Spool (älteste werden verworfen)
+    DISCORD_SPOOL_MAX = int(os.getenv("DISCORD_SPOOL_MAX", 100))
+    # Gleiche Warnungen (z.B. Hitzewarnung) höchstens alle X Sekunden, Wiederholungen werden gesammelt
+    DISCORD_WARN_INTERVAL = float(os.getenv("DISCORD_WARN_INTERVAL", 600))
+
+    # Git-Commits gebündelt im Hintergrund (0 = wie früher Commit + Push direkt im Abrufzyklus)
+    GIT_COMMIT_BATCHING = os.getenv("GIT_COMMIT_BATCHING", "1") != "0"
+    # Ein Commit spätestens X Sekunden nach der ersten Änderung bzw. ab Y geänderten Plänen
+    GIT_COMMIT_WINDOW = float(os.getenv("GIT_COMMIT_WINDOW", 120))
+    GIT_COMMIT_MAX_CHANGES = int(os.getenv("GIT_COMMIT_MAX_CHANGES", 20))
+    # "fast-import" = nur geschriebene Dateien committen (ohne Index-Scan), "index" = git add .
+    GIT_COMMIT_MODE = os.getenv("GIT_COMMIT_MODE", "fast-import").lower()
+    # Fehlgeschlagene Pushes werden mit Backoff bis zu X Sekunden wiederholt
+    GIT_PUSH_MAX_BACKOFF = float(os.getenv("GIT_PUSH_MAX_BACKOFF", 900))
+    GIT_PUSH_TIMEOUT = float(os.getenv("GIT_PUSH_TIMEOUT", 120))
+    # Erst-Clone: Tiefe (0 = volle Historie) und Partial-Clone-Filter (z.B. "blob:none", leer = aus)
+    GIT_CLONE_DEPTH = int(os.getenv("GIT_CLONE_DEPTH", 0))
+    GIT_CLONE_FILTER = os.getenv("GIT_CLONE_FILTER", "blob:none")
+    # Nur die Pläne der letzten N Monate auschecken (Sparse-Checkout, 0 = alle)
+    GIT_SPARSE_MONTHS = int(os.getenv("GIT_SPARSE_MONTHS", 0))
+    # Git-Wartung (gc, Commit-Graph) im Hintergrund alle X Sekunden (0 = aus)
+    GIT_MAINTENANCE_INTERVAL = float(os.getenv("GIT_MAINTENANCE_INTERVAL", 3600))
+
+    # Mehrschulbetrieb: JSON-Datei mit einem Eintrag pro Schule (leer = Einzelbetrieb über .env)
+    TENANTS_FILE = os.getenv("TENANTS_FILE", "")
+    # So viele Schulen werden gleichzeitig abgerufen (gemeinsame Worker, fair nach Fälligkeit)
+    TENANT_WORKERS = int(os.getenv("TENANT_WORKERS", 2))
+    # Hintergrund-Threads für Commits/Pushes aller Git-Archive
+    GIT_WORKERS = int(os.getenv("GIT_WORKERS", 1))
+
+    # Mehrere Instanzen auf einem Rechner: gemeinsame lokale SQLite-Datei für Leases und
+    # Plan-Zustand (leer = aus; nicht auf NFS/SMB, dort sind die Dateisperren unzuverlässig)
+    LEASE_DB = os.getenv("LEASE_DB", "")
+    # Sekunden, nach denen die Schulen einer ausgefallenen Instanz übernommen werden
+    LEASE_TTL = float(os.getenv("LEASE_TTL", 60))
+    # Eindeutiger Name dieser Instanz; der Standard unterscheidet Prozesse auf demselben Rechner
+    NODE_ID = os.getenv("NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+
+    # Metriken (Prometheus-Text unter /metrics, JSON unter /metrics.json); Port 0 = aus
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+    # Ausführung: "threads" (Hauptschleife + Monitor-Thread) oder "asyncio" (eine Eventloop)
+    EXECUTION_MODE = os.getenv("EXECUTION_MODE", "threads").lower()
+
+    # Abrufplan: "adaptive" (Zeitplan, Zufallsversatz, Backoff) oder "minute" (jede volle Minute)
+    POLL_SCHEDULER = os.getenv("POLL_SCHEDULER", "adaptive")
+    # Zeitfenster "Tage HH:MM-HH:MM=Sekunden", kommagetrennt; der erste passende Eintrag gilt
+    POLL_TIMETABLE = os.getenv(
+        "POLL_TIMETABLE",
+        "Mo-Fr 06:00-08:00=60, Mo-Fr 08:00-16:00=180, Mo-Fr 16:00-22:00=300, So 16:00-22:00=300",
+    )
+    # Intervall außerhalb aller Zeitfenster (nachts, Wochenende), in Sekunden
+    POLL_IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL", 1800))
+    POLL_JITTER = float(os.getenv("POLL_JITTER", 0.1))
+    # Nach so vielen Zyklen ohne Änderung wird das Intervall schrittweise verlängert
+    POLL_BACKOFF_AFTER = int(os.getenv("POLL_BACKOFF_AFTER", 10))
+    POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", 1.5))
+    # Backoff verlängert das Intervall eines Zeitfensters höchstens um diesen Faktor
+    POLL_BACKOFF_MAX_FACTOR = float(os.getenv("POLL_BACKOFF_MAX_FACTOR", 3))
+    POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 3600))
+    # Ferien/Feiertage (werden wie Sonntage behandelt), z.B. "2026-12-21:2027-01-06, 2027-05-01"
+    POLL_HOLIDAYS = os.getenv("POLL_HOLIDAYS", "")
+
+    # Unverändertes DSB-Menü überspringt den Zyklus; spätestens nach so vielen Sekunden
+    # wird trotzdem wieder vollständig verarbeitet
+    MENU_FINGERPRINT_MAX_AGE = float(os.getenv("MENU_FINGERPRINT_MAX_AGE", 1800))
+
+    # Titel/Tabelle per Streaming-Extraktor statt BeautifulSoup-Baum lesen (0 = Fallback auf Soup)
+    STREAMING_EXTRACTOR = os.getenv("STREAMING_EXTRACTOR", "1") != "0"
+
+    # Suchindex der Vertretungszeilen (search_index.py) bei jedem gespeicherten Plan aktualisieren
+    SEARCH_INDEX = os.getenv("SEARCH_INDEX", "1") != "0"
     
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     REPO_DIR = os.path.join(BASE_DIR, "dsb-database")
@@ -27,10 +118,21 @@ class Config:
     
     LOG_DIR = os.path.join(BASE_DIR, "logs")
 
+    # Lokaler Zustand, der Neustarts überdauert (nicht Teil des Plan-Archivs)
+    STATE_DIR = os.path.join(BASE_DIR, "state")
+    HTTP_CACHE_FILE = os.path.join(STATE_DIR, "http_cache.json")
+    PLAN_STATE_DB = os.path.join(STATE_DIR, "plan_state.sqlite3")
+    SEARCH_INDEX_DB = os.path.join(STATE_DIR, "search_index.sqlite3")
+    DISCORD_SPOOL_FILE = os.path.join(STATE_DIR, "discord_spool.json")
+
     LOG_FILE = os.path.join(BASE_DIR, "dsb_bot.log")
 
     @staticmethod
     def validate():
+        # Im Mehrschulbetrieb stehen die Zugangsdaten in der Tenant-Datei (tenants.load_tenants)
+        if os.getenv("TENANTS_FILE"):
+            return
+
         # Standard-Pflichtfelder
         required_base = [
             "DSB_USER", "DSB_PASS", 
@@ -1,78 +1,202 @@
-import requests
+import threading
+from config import Config
 from utils import get_cpu_temperature, logger # Importiere den Logger
+from http_transport import get_transport
+from discord_queue import DiscordOutbox
+from metrics import record_error, track_stage
+
+# Discord erlaubt max. 2000 Zeichen im content-Feld
+MAX_CONTENT_LENGTH = 2000
+# Max. Anzahl unterschiedlicher Zeilen in einer zusammengefassten Warnung
+MAX_WARNING_LINES = 15
+
+_shared_outbox = None
+_shared_lock = threading.Lock()
+
+
+def get_outbox() -> DiscordOutbox:
+    """Liefert die prozessweit geteilte Discord-Warteschlange (ein Sender-Thread, ein Spool)."""
+    global _shared_outbox
+    with _shared_lock:
+        if _shared_outbox is None:
+            _shared_outbox = DiscordOutbox(
+                get_transport(),
+                Config.DISCORD_SPOOL_FILE,
+                DiscordNotifier.render_message,
+                DiscordNotifier.merge_message,
+                max_messages=Config.DISCORD_SPOOL_MAX,
+            )
+        return _shared_outbox
+
 
 class DiscordNotifier:
     # Füge ping_role_id zum Konstruktor hinzu
-    def __init__(self, warn_url, plans_url, ping_role_id): 
+    def __init__(self, warn_url, plans_url, ping_role_id, transport=None, outbox=None, name=""):
+        """`name`: Schule im Mehrschulbetrieb; unterscheidet ihre Webhooks in der geteilten Warteschlange."""
         self.warn_url = warn_url
         self.plans_url = plans_url
         self.ping_role_id = ping_role_id
+        self.http = transport or get_transport()
+        # Zustellung im Hintergrund; ohne Warteschlange wird wie früher direkt gesendet
+        self.outbox = outbox or (get_outbox() if Config.DISCORD_QUEUE else None)
+        # Der Spool speichert nur diese Namen, die URLs (mit Token) bleiben im Speicher
+        prefix = f"{name}/" if name else ""
+        self._webhooks = {
+            "warn": (prefix + "warn", warn_url),
+            "plans": (prefix + "plans", plans_url),
+        }
+        if self.outbox is not None:
+            for webhook, url in self._webhooks.values():
+                self.outbox.register_webhook(webhook, url)
+
+    def send_warning(self, message, coalesce_key=None):
+        """Reiht eine Warnung ein.
+
+        Warnungen mit gleichem `coalesce_key` (Standard: gleicher Text) werden höchstens
+        alle DISCORD_WARN_INTERVAL Sekunden gesendet; Wiederholungen werden bis dahin
+        gesammelt und als eine Zeile mit dem neuesten Text und ihrer Anzahl gemeldet.
+        """
+        logger.warning(f"Discord-Warnung wird gesendet: {message}")
 
-    def send_warning(self, message):
-        logger.warning(f"Discord-Warnung wird gesendet: {message}") 
-        
         if not self.warn_url:
             return
 
-        # Rollen-Ping hinzufügen, wenn eine ID konfiguriert ist
-        content = message
-        if self.ping_role_id:
-            # Discord erwartet die Rolle im Format <@&ID>
-            content = f"<@&{self.ping_role_id}> {message}"
-            
-        try:
-            response = requests.post(self.warn_url, json={"username": "DSB-Monitor", "content": content})
-            if response.status_code not in (204, 200):
-                logger.error(f"Discord Warnung failed with status {response.status_code}: {response.text}")
-            else:
-                logger.info("Discord-Warnung erfolgreich gesendet.")
-        except Exception as e:
-            logger.error(f"Discord Warnung konnte nicht gesendet werden: {e}")
+        group = coalesce_key or message
+        data = {"lines": [[message, 1, group]], "ping_role_id": self.ping_role_id}
+        self._deliver(
+            "warn",
+            "warning",
+            data,
+            key=f"warning:{group}",
+            min_interval=Config.DISCORD_WARN_INTERVAL,
+        )
 
-    def send_plan_update(self, plans, new_keys):
+    def send_plan_update(self, plans, new_keys, diffs=None):
         if not self.plans_url:
             return
 
-        fields = []
+        diffs = diffs or {}
+        entries = []
+        diff_summaries = {}
         for key in plans:
             plan_data = plans[key]
-            title = plan_data['title']
             link_target = plan_data.get('original_url', plan_data['detail'])
+            entries.append([key, plan_data['title'], link_target])
+
+            # Zeilenänderungen gegenüber der Vorversion
+            diff = diffs.get(key)
+            if key in new_keys and diff is not None and not diff.is_new:
+                diff_summaries[key] = diff.summary()
+
+        data = {"plans": entries, "new_keys": sorted(new_keys), "diffs": diff_summaries}
+        # Mehrere noch nicht gesendete Updates werden zu einem zusammengefasst
+        self._deliver("plans", "plan_update", data, key="plan_update")
+
+    def _deliver(self, webhook, kind, data, key=None, min_interval=0):
+        name, url = self._webhooks[webhook]
+        if self.outbox is not None:
+            self.outbox.enqueue(name, kind, data, key=key, min_interval=min_interval)
+            return
 
-            if key in new_keys:
-                title += " 🌟 (neu)"
-            
-            fields.append({
-                "name": title,
-                "value": f"[Vertretungsplan öffnen]({link_target})", # Angepasst, um link_target zu verwenden
-                "inline": False
-            })
-
-        temp = get_cpu_temperature()
-        temp_str = f"{temp:.1f}°C" if temp else "?"
-        
-        # Füge den Rollen-Ping zur Hauptnachricht (content) hinzu, wenn neue Pläne gefunden wurden
-        content_message = "Neue Vertretungspläne verfügbar."
-
-        data = {
-            "username": "DSB-Bot",
-            "avatar_url": "https://www.dsbmobile.de/img/logo_dsbmobile.png",
-            "content": content_message, # Enthält den Ping, falls neue Pläne da sind
-            "embeds": [{
-                "title": "Aktuelle Vertretungspläne",
-                "color": 0x1abc9c,
-                "fields": fields,
-                "footer": {
-                    "text": f"System Temp: {temp_str}",
-                    # "icon_url": "..." 
-                }
-            }]
-        }
         try:
-            response = requests.post(self.plans_url, json=data)
-            if response.status_code == 204:
-                logger.info("Discord Plan-Update erfolgreich gesendet.")
+            with track_stage("discord_send"):
+                response = self.http.post(url, json=self.render_message(kind, data))
+            if response.status_code not in (204, 200):
+                record_error("discord_send")
+                logger.error(f"Discord-Nachricht ({kind}) fehlgeschlagen: {response.status_code}, {response.text}")
             else:
-                logger.error(f"Discord Plan-Update fehlgeschlagen: {response.status_code}, {response.text}")
+                logger.info(f"Discord-Nachricht ({kind}) erfolgreich gesendet.")
         except Exception as e:
-            logger.error(f"Discord Plan-Update konnte nicht gesendet werden: {e}")
\ No newline at end of file
+            logger.error(f"Discord-Nachricht ({kind}) konnte nicht gesendet werden: {e}")
+
+    # --- Zusammenführen und Darstellen (wird von der Warteschlange aufgerufen) ---
+
+    @staticmethod
+    def merge_message(kind, old, new):
+        if kind == "warning":
+            lines = [list(line) for line in old["lines"]]
+            dropped = old.get("dropped", 0)
+            for text, count, group in new["lines"]:
+                for line in lines:
+                    if line[2] == group:
+                        line[0] = text
+                        line[1] += count
+                        break
+                else:
+                    if len(lines) < MAX_WARNING_LINES:
+                        lines.append([text, count, group])
+                    else:
+                        dropped += count
+            return {"lines": lines, "dropped": dropped, "ping_role_id": new.get("ping_role_id")}
+
+        if kind == "plan_update":
+            # Neuester Planstand gilt; "neu"-Markierungen und Diffs bleiben erhalten
+            current = {entry[0] for entry in new["plans"]}
+            new_keys = (set(old["new_keys"]) | set(new["new_keys"])) & current
+            diffs = {key: summary for key, summary in old["diffs"].items() if key in new_keys}
+            diffs.update(new["diffs"])
+            return {"plans": new["plans"], "new_keys": sorted(new_keys), "diffs": diffs}
+
+        return new
+
+    @staticmethod
+    def render_message(kind, data):
+        if kind == "warning":
+            lines = [
+                f"{text} ({count}x)" if count > 1 else text
+                for text, count, _group in data["lines"]
+            ]
+            if data.get("dropped"):
+                lines.append(f"(+{data['dropped']} weitere Warnungen)")
+            content = "\n".join(lines)
+
+            # Rollen-Ping hinzufügen, wenn eine ID konfiguriert ist
+            if data.get("ping_role_id"):
+                # Discord erwartet die Rolle im Format <@&ID>
+                content = f"<@&{data['ping_role_id']}> {content}"
+            return {"username": "DSB-Monitor", "content": content[:MAX_CONTENT_LENGTH]}
+
+        if kind == "plan_update":
+            new_keys = set(data["new_keys"])
+            fields = []
+            for key, title, link_target in data["plans"]:
+                value = f"[Vertretungsplan öffnen]({link_target})" # Angepasst, um link_target zu verwenden
+
+                if key in new_keys:
+                    title += " 🌟 (neu)"
+                    if key in data["diffs"]:
+                        value += f"\n{data['diffs'][key]}"
+
+                fields.append({
+                    "name": title,
+                    "value": value,
+                    "inline": False
+                })
+
+            temp = get_cpu_temperature()
+            temp_str = f"{temp:.1f}°C" if temp else "?"
+
+            # Füge den Rollen-Ping zur Hauptnachricht (content) hinzu, wenn neue Pläne gefunden wurden
+            content_message = "Neue Vertretungspläne verfügbar."
+
+            return {
+                "username": "DSB-Bot",
+                "avatar_url": "https://www.dsbmobile.de/img/logo_dsbmobile.png",
+                "content": content_message, # Enthält den Ping, falls neue Pläne da sind
+                "embeds": [{
+                    "title": "Aktuelle Vertretungspläne",
+                    "color": 0x1abc9c,
+                    "fields": fields,
+                    "footer": {
+                        "text": f"System Temp: {temp_str}",
+                        # "icon_url": "..."
+                    }
+                }]
+            }
+
+        raise ValueError(f"Unbekannte Discord-Nachrichtenart: {kind}")
+
+    def close(self, timeout=5.0):
+        """Versucht offene Nachrichten noch zuzustellen; der Rest bleibt im Spool."""
+        if self.outbox is not None:
+            self.outbox.close(timeout)
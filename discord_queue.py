@@ -0,0 +1,264 @@
+import itertools
+import json
+import os
+import threading
+import time
+from utils import logger
+from metrics import record_error, track_stage
+
+# Wiederholungen bei Netzwerk- und Serverfehlern (exponentielles Backoff, in Sekunden)
+MAX_ATTEMPTS = 8
+MAX_BACKOFF = 300
+
+
+class DiscordOutbox:
+    """Ausgangswarteschlange für Discord-Webhooks mit eigenem Sender-Thread.
+
+    - `enqueue` kehrt sofort zurück; der Abrufzyklus wartet nie auf Discord.
+    - Noch nicht gesendete Nachrichten mit gleichem `key` werden über `merge`
+      zusammengeführt; mit `min_interval` wird ein Schlüssel höchstens so oft gesendet
+      (Folgemeldungen sammeln sich bis dahin in einer Nachricht).
+    - 429-Antworten (`retry_after`) und die Bucket-Header (X-RateLimit-*) sperren den
+      Webhook bis zum angegebenen Zeitpunkt; Netzwerk- und 5xx-Fehler werden mit
+      Backoff wiederholt.
+    - Offene Nachrichten liegen in einem begrenzten Spool auf der Platte und werden
+      nach einem Neustart weiter zugestellt. Der Spool enthält nur den Namen des
+      Webhooks (z.B. "warn"), nie die URL mit ihrem Token; die URLs meldet der
+      Notifier beim Start mit `register_webhook` an.
+
+    Nachrichten werden als (kind, data) gespeichert und erst beim Senden mit
+    `render(kind, data)` in den Webhook-Payload übersetzt.
+    """
+
+    def __init__(self, transport, spool_file, render, merge, max_messages=100):
+        self.http = transport
+        self.spool_file = spool_file
+        self.render = render
+        self.merge = merge
+        self.max_messages = max_messages
+
+        self._cond = threading.Condition()
+        self._messages = self._load_spool()
+        self._ids = itertools.count(max((m["id"] for m in self._messages), default=0) + 1)
+        self._webhooks = {}  # Webhook-Name -> URL (nur im Speicher)
+        self._blocked_until = {}  # Webhook-URL (bzw. "*" global) -> Zeitstempel
+        self._last_sent = {}  # (Webhook-Name, key) -> Zeitstempel
+        self._inflight = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="discord-outbox", daemon=True)
+        self._thread.start()
+
+    # --- Spool ---
+
+    def _load_spool(self):
+        try:
+            with open(self.spool_file, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+            legacy = [m for m in messages if "webhook" not in m]
+            if legacy:
+                # Älteres Format mit Webhook-URL: verwerfen, damit das Token nicht auf der Platte bleibt
+                logger.warning(f"Discord-Spool: {len(legacy)} Nachrichten im alten Format verworfen.")
+                messages = [m for m in messages if "webhook" in m]
+            if messages:
+                logger.info(f"Discord-Spool geladen: {len(messages)} offene Nachrichten.")
+            return messages
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning(f"Discord-Spool konnte nicht gelesen werden, starte leer: {e}")
+            return []
+
+    def _persist(self):
+        try:
+            os.makedirs(os.path.dirname(self.spool_file), exist_ok=True)
+            tmp_file = self.spool_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._messages, f, ensure_ascii=False)
+            os.replace(tmp_file, self.spool_file)
+        except Exception as e:
+            logger.warning(f"Discord-Spool konnte nicht gespeichert werden: {e}")
+
+    # --- Einreihen ---
+
+    def register_webhook(self, name, url):
+        """Ordnet dem Webhook-Namen seine URL zu; ohne URL bleiben seine Nachrichten liegen."""
+        if not url:
+            return
+        with self._cond:
+            self._webhooks[name] = url
+            self._cond.notify()
+
+    def enqueue(self, webhook, kind, data, key=None, min_interval=0):
+        """Reiht eine Nachricht an den mit `register_webhook` angemeldeten Webhook ein."""
+        now = time.time()
+        with self._cond:
+            if key is not None:
+                for message in self._messages:
+                    if message is not self._inflight and message["webhook"] == webhook and message["key"] == key:
+                        message["data"] = self.merge(kind, message["data"], data)
+                        self._persist()
+                        return
+
+            not_before = now
+            last_sent = self._last_sent.get((webhook, key)) if key is not None else None
+            if last_sent is not None and now - last_sent < min_interval:
+                not_before = last_sent + min_interval
+
+            self._messages.append({
+                "id": next(self._ids),
+                "webhook": webhook,
+                "kind": kind,
+                "data": data,
+                "key": key,
+                "attempts": 0,
+                "not_before": not_before,
+            })
+            while len(self._messages) > self.max_messages:
+                dropped = next(m for m in self._messages if m is not self._inflight)
+                self._messages.remove(dropped)
+                logger.warning(f"Discord-Spool voll, älteste Nachricht ({dropped['kind']}) verworfen.")
+            self._persist()
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._messages)
+
+    # --- Senden ---
+
+    def _next_message(self, now):
+        """Nächste sendebereite Nachricht oder (None, Sekunden bis zur nächsten)."""
+        wait_time = None
+        global_block = self._blocked_until.get("*", 0)
+        for message in self._messages:
+            url = self._webhooks.get(message["webhook"])
+            if url is None:
+                # Webhook (noch) nicht angemeldet
+                continue
+            ready_at = max(message["not_before"], self._blocked_until.get(url, 0), global_block)
+            if ready_at <= now:
+                return message, None
+            wait_time = ready_at - now if wait_time is None else min(wait_time, ready_at - now)
+        return None, wait_time
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    message, wait_time = self._next_message(time.time())
+                    if message is not None:
+                        break
+                    self._cond.wait(timeout=wait_time)
+                self._inflight = message
+
+            try:
+                self._send(message)
+            except Exception as e:
+                # Z.B. nicht darstellbare Daten: nicht endlos wiederholen
+                logger.error(f"Discord-Nachricht ({message['kind']}) verworfen: {e}", exc_info=True)
+                with self._cond:
+                    if message in self._messages:
+                        self._messages.remove(message)
+            finally:
+                with self._cond:
+                    self._inflight = None
+                    self._persist()
+
+    def _send(self, message):
+        with self._cond:
+            url = self._webhooks[message["webhook"]]
+        try:
+            with track_stage("discord_send"):
+                response = self.http.post(url, json=self.render(message["kind"], message["data"]))
+        except Exception as e:
+            self._retry_later(message, f"{e}")
+            return
+
+        self._update_bucket(url, response)
+
+        if 200 <= response.status_code < 300:
+            with self._cond:
+                self._messages.remove(message)
+                if message["key"] is not None:
+                    self._last_sent[(message["webhook"], message["key"])] = time.time()
+            logger.info(f"Discord-Nachricht ({message['kind']}) erfolgreich gesendet.")
+        elif response.status_code == 429:
+            record_error("discord_send")
+            retry_after, is_global = self._retry_after(response)
+            with self._cond:
+                self._blocked_until["*" if is_global else url] = time.time() + retry_after
+            logger.warning(f"Discord Rate-Limit erreicht, neuer Versuch in {retry_after:.1f}s.")
+        elif response.status_code >= 500:
+            record_error("discord_send")
+            self._retry_later(message, f"Status {response.status_code}")
+        else:
+            record_error("discord_send")
+            with self._cond:
+                self._messages.remove(message)
+            logger.error(
+                f"Discord-Nachricht ({message['kind']}) abgelehnt: {response.status_code}, {response.text}"
+            )
+
+    def _retry_later(self, message, reason):
+        with self._cond:
+            message["attempts"] += 1
+            if message["attempts"] >= MAX_ATTEMPTS:
+                self._messages.remove(message)
+                logger.error(
+                    f"Discord-Nachricht ({message['kind']}) nach {message['attempts']} Versuchen verworfen: {reason}"
+                )
+                return
+            delay = min(2 ** message["attempts"], MAX_BACKOFF)
+            message["not_before"] = time.time() + delay
+        logger.warning(f"Discord-Versand fehlgeschlagen ({reason}), neuer Versuch in {delay}s.")
+
+    @staticmethod
+    def _retry_after(response):
+        """Wartezeit aus einer 429-Antwort: JSON `retry_after` bzw. Retry-After-Header."""
+        retry_after = None
+        is_global = False
+        try:
+            body = response.json()
+            retry_after = float(body.get("retry_after"))
+            is_global = bool(body.get("global"))
+        except Exception:
+            pass
+        if retry_after is None:
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                retry_after = 5.0
+        is_global = is_global or response.headers.get("X-RateLimit-Global", "").lower() == "true"
+        return max(retry_after, 0.0), is_global
+
+    def _update_bucket(self, url, response):
+        """Leerer Bucket (X-RateLimit-Remaining: 0): Webhook bis zum Reset nicht ansprechen."""
+        headers = response.headers
+        if headers.get("X-RateLimit-Remaining") != "0":
+            return
+        try:
+            reset_after = float(headers.get("X-RateLimit-Reset-After"))
+        except (TypeError, ValueError):
+            return
+        with self._cond:
+            self._blocked_until[url] = max(self._blocked_until.get(url, 0), time.time() + reset_after)
+
+    def close(self, timeout=5.0):
+        """Versucht offene Nachrichten noch kurz zuzustellen und beendet den Sender-Thread.
+
+        Nicht zugestellte Nachrichten bleiben im Spool.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._cond:
+                idle = self._inflight is None and self._next_message(time.time())[0] is None
+                if idle:
+                    break
+            time.sleep(0.05)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=max(0.0, deadline - time.time()) + 1.0)
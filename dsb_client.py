@@ -1,16 +1,52 @@
-import requests
 import json
 import uuid
 import base64
 import gzip
+import hashlib
+import time
 import datetime as dt
+from config import Config
 from utils import logger
+from http_transport import get_transport
+from metrics import BYTES_DOWNLOADED, record_error, track_stage
 
 class DSBClient:
-    def __init__(self, username, password):
+    def __init__(self, username, password, transport=None, data_url=None):
         self.username = username
         self.password = password
-        self.data_url = "https://app.dsbcontrol.de/JsonHandler.ashx/GetData"
+        self.http = transport or get_transport()
+        self.data_url = data_url or Config.DSB_DATA_URL
+
+        # Fingerprints der letzten Antwort, um unveränderte Menüs nicht erneut zu verarbeiten
+        self._payload_hash = None
+        self._last_links = None
+        self._links_hash = None
+        self._processed_links_hash = None
+        self._processed_at = 0.0
+
+    @staticmethod
+    def _fingerprint_links(links) -> str:
+        data = json.dumps(links, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def has_changed(self) -> bool:
+        """Ob sich die Plan-Links seit dem letzten vollständig verarbeiteten Abruf geändert haben.
+
+        Vergleicht nur Fingerprints (kein Netzwerk). Nach MENU_FINGERPRINT_MAX_AGE Sekunden
+        gilt das Menü zur Sicherheit wieder als geändert.
+        """
+        if self._links_hash is None or self._links_hash != self._processed_links_hash:
+            return True
+        return time.monotonic() - self._processed_at > Config.MENU_FINGERPRINT_MAX_AGE
+
+    def mark_processed(self):
+        """Merkt sich die zuletzt abgerufenen Links als vollständig verarbeitet."""
+        self._processed_links_hash = self._links_hash
+        self._processed_at = time.monotonic()
+
+    def forget_processed(self):
+        """Das nächste Menü gilt wieder als geändert (z.B. nach Übernahme durch diese Instanz)."""
+        self._processed_links_hash = None
 
     def fetch_menu_links(self):
         """
@@ -44,17 +80,27 @@ class DSBClient:
             json_req = {"req": {"Data": params_compressed, "DataType": 1}}
             
             # --- POST-ANFRAGE SENDEN ---
-            r = requests.post(self.data_url, json=json_req, timeout=15)
-            r.raise_for_status()
+            with track_stage("dsb_request"):
+                r = self.http.post(self.data_url, json=json_req)
+                r.raise_for_status()
+            BYTES_DOWNLOADED.inc(len(r.content), source="dsb")
             
             # --- ANTWORT VERARBEITEN ---
 
-            resp_compressed = json.loads(r.content)["d"]
-            # Daten Base64-dekodieren und dekomprimieren
-            data = json.loads(gzip.decompress(base64.b64decode(resp_compressed)))
+            # Unveränderte Rohantwort: Dekodieren und Extrahieren überspringen
+            payload_hash = hashlib.sha256(r.content).hexdigest()
+            if payload_hash == self._payload_hash and self._last_links is not None:
+                logger.debug("DSB Antwort unverändert (Fingerprint), Dekodierung übersprungen.")
+                return [dict(link) for link in self._last_links]
+
+            with track_stage("dsb_decode"):
+                resp_compressed = json.loads(r.content)["d"]
+                # Daten Base64-dekodieren und dekomprimieren
+                data = json.loads(gzip.decompress(base64.b64decode(resp_compressed)))
             
             # --- PRÜFUNG DES API-STATUSCODES ---
             if data.get('Resultcode') != 0:
+                record_error("dsb_api")
                 logger.error(f"DSB API Error (Resultcode {data.get('Resultcode')}): {data.get('ResultStatusInfo')}")
                 return []
 
@@ -110,6 +156,10 @@ class DSBClient:
                          })
 
             
+            self._payload_hash = payload_hash
+            self._last_links = [dict(link) for link in links_with_metadata]
+            self._links_hash = self._fingerprint_links(links_with_metadata)
+
             logger.info(f"DSB Links gefunden: {len(links_with_metadata)} gefilterte Vertretungspläne.")
             logger.debug(f"DSB Gefundene Links (mit Metadaten): {links_with_metadata}")
             
@@ -0,0 +1,121 @@
+import itertools
+import os
+import subprocess
+import time
+from utils import logger
+
+
+def _quote_path(path: str) -> str:
+    """Pfad im fast-import-Format (C-Quoting nur, wenn nötig)."""
+    if not any(c in path for c in '"\\\n') and not path.startswith(" "):
+        return path
+    escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+class FastImportPipe:
+    """Langlebiger `git fast-import`-Prozess, der Commits direkt aus Dateiinhalten baut.
+
+    Index und Arbeitsverzeichnis werden dabei nicht durchsucht: Ein Commit kostet nur
+    so viel wie die übergebenen Dateien. Nach jedem Commit sorgt `checkpoint` dafür,
+    dass der Branch aktualisiert ist; `progress` dient als Synchronisationspunkt.
+    """
+
+    def __init__(self, repo_dir, branch="main"):
+        self.repo_dir = repo_dir
+        self.ref = f"refs/heads/{branch}"
+        self._proc = None
+        self._ident = None
+        self._marks = itertools.count(1)
+        self._has_parent = False
+
+    def _git(self, args):
+        return subprocess.run(
+            ["git"] + args, cwd=self.repo_dir, capture_output=True, text=True
+        )
+
+    def _start(self):
+        # Identität wie bei `git commit` (user.name/user.email), ohne Zeitstempel
+        ident = self._git(["var", "GIT_COMMITTER_IDENT"])
+        if ident.returncode == 0 and ident.stdout.strip():
+            self._ident = ident.stdout.strip().rsplit(" ", 2)[0]
+        else:
+            self._ident = "DSB-Bot <dsb-bot@localhost>"
+
+        # Erster Commit dieses Prozesses setzt auf den aktuellen Branch-Stand auf
+        self._has_parent = self._git(["rev-parse", "--verify", "-q", self.ref]).returncode == 0
+
+        self._proc = subprocess.Popen(
+            ["git", "fast-import", "--quiet", "--done"],
+            cwd=self.repo_dir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def commit(self, paths, message) -> str:
+        """Committet die angegebenen Pfade (relativ zum Repo) mit ihrem aktuellen Inhalt.
+
+        Nicht mehr vorhandene Dateien werden gelöscht. Gibt den Fortschritts-Token zurück.
+        """
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+
+        mark = next(self._marks)
+        msg = message.encode("utf-8")
+        now = int(time.time())
+        tz = time.strftime("%z") or "+0000"
+
+        out = bytearray()
+        out += f"commit {self.ref}\nmark :{mark}\n".encode()
+        out += f"committer {self._ident} {now} {tz}\n".encode("utf-8")
+        out += f"data {len(msg)}\n".encode() + msg + b"\n"
+        if self._has_parent and mark == 1:
+            out += f"from {self.ref}^0\n".encode()
+
+        for path in sorted(paths):
+            full_path = os.path.join(self.repo_dir, path)
+            quoted = _quote_path(path).encode("utf-8")
+            try:
+                with open(full_path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                out += b"D " + quoted + b"\n"
+                continue
+            out += b"M 100644 inline " + quoted + b"\n"
+            out += f"data {len(data)}\n".encode() + data + b"\n"
+
+        token = f"commit-{mark}"
+        out += f"\ncheckpoint\n\nprogress {token}\n".encode()
+
+        try:
+            self._proc.stdin.write(bytes(out))
+            self._proc.stdin.flush()
+            self._wait_for(token)
+        except Exception:
+            self.close()
+            raise
+        return token
+
+    def _wait_for(self, token):
+        expected = f"progress {token}".encode()
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"git fast-import beendet (Exit-Code {self._proc.wait()})")
+            if line.rstrip(b"\n") == expected:
+                return
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.stdin.write(b"done\n")
+                proc.stdin.close()
+                proc.wait(timeout=30)
+        except Exception as e:
+            logger.warning(f"git fast-import konnte nicht sauber beendet werden: {e}")
+            proc.kill()
+        # Neue Marken bei einem Neustart des Prozesses
+        self._marks = itertools.count(1)
@@ -0,0 +1,120 @@
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from utils import logger
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter, der pro Request erkennt, ob eine Verbindung neu aufgebaut wurde.
+
+    Jeder neu geöffnete Socket entspricht einem TCP- (und ggf. TLS-) Handshake.
+    Taucht derselbe Socket erneut auf, wurde die Keep-Alive-Verbindung wiederverwendet.
+    """
+
+    def __init__(self, transport, **kwargs):
+        self._transport = transport
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        connection = getattr(response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+        self._transport._record(request.url, sock)
+        return response
+
+
+class HttpTransport:
+    """Gemeinsame HTTP-Schicht für alle Netzwerkzugriffe des Bots.
+
+    Kapselt eine requests.Session mit Connection-Pools pro Host und Keep-Alive,
+    damit DSB-Abfragen, Plan-Downloads und Discord-Webhooks ihre TCP/TLS-Verbindungen
+    zwischen den Zyklen wiederverwenden.
+    """
+
+    def __init__(self, pool_connections, pool_maxsize, connect_timeout, read_timeout):
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = _CountingAdapter(
+            self,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._seen_sockets = weakref.WeakSet()
+        self._host_stats = {}
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Führt einen Request über die gemeinsame Session aus (Standard-Timeout aus der Config)."""
+        if timeout is None:
+            timeout = self.timeout
+        return self.session.request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, url, sock):
+        host = urlsplit(url).netloc
+        with self._lock:
+            stats = self._host_stats.setdefault(host, {"requests": 0, "handshakes": 0})
+            stats["requests"] += 1
+            if sock is None or sock not in self._seen_sockets:
+                stats["handshakes"] += 1
+                if sock is not None:
+                    self._seen_sockets.add(sock)
+
+    def stats(self):
+        """Gibt Requests, Handshakes und wiederverwendete Verbindungen pro Host und gesamt zurück."""
+        with self._lock:
+            per_host = {
+                host: dict(values, reused=values["requests"] - values["handshakes"])
+                for host, values in self._host_stats.items()
+            }
+
+        total_requests = sum(v["requests"] for v in per_host.values())
+        total_handshakes = sum(v["handshakes"] for v in per_host.values())
+        return {
+            "requests": total_requests,
+            "handshakes": total_handshakes,
+            "reused": total_requests - total_handshakes,
+            "hosts": per_host,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.debug(
+            f"HTTP-Verbindungen: {stats['requests']} Requests, "
+            f"{stats['handshakes']} Handshakes, {stats['reused']} wiederverwendet."
+        )
+
+    def close(self):
+        self.session.close()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """Liefert die prozessweit geteilte HttpTransport-Instanz (wird beim ersten Aufruf erstellt)."""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HttpTransport(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+                read_timeout=Config.HTTP_READ_TIMEOUT,
+            )
+        return _shared_transport
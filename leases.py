@@ -0,0 +1,276 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from utils import logger
+
+# Eine Lease ist lokal nur so lange gültig, bis höchstens eine Erneuerung ausgefallen ist;
+# danach bleibt ein Drittel der TTL als Puffer für Uhrabweichungen zwischen den Rechnern.
+RENEWALS_PER_TTL = 3
+# Dateisysteme (Präfixe aus /proc/mounts), auf denen SQLite-Sperren nicht verlässlich sind
+NETWORK_FILESYSTEMS = ("nfs", "cifs", "smb", "fuse.sshfs", "9p")
+
+
+class LeaseStore:
+    """Zeitlich begrenzte Leases mehrerer Bot-Instanzen in einer gemeinsamen SQLite-Datei.
+
+    Jede Instanz (`node_id`) meldet sich regelmäßig (`heartbeat`) und hält Leases auf
+    Schlüssel (Schulen). Eine Lease gehört ihrem Besitzer bis `expires` (Unix-Zeit);
+    danach darf jede andere Instanz sie übernehmen. `epoch` zählt die Besitzerwechsel
+    und trennt so die Amtszeiten.
+
+    Der Ausschluss beruht auf SQLite-Dateisperren und gilt daher nur für Instanzen auf
+    demselben Rechner mit der Datei auf einem lokalen Dateisystem (über NFS/SMB sind
+    die Sperren unzuverlässig).
+    """
+
+    def __init__(self, db_file, node_id, ttl=60):
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_file = db_file
+        self.node_id = node_id
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, timeout=ttl / RENEWALS_PER_TTL, isolation_level=None,
+                                     check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    epoch INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lease_nodes (node TEXT PRIMARY KEY, seen REAL NOT NULL)"
+            )
+
+    def heartbeat(self) -> int:
+        """Meldet diese Instanz als lebendig und gibt die Anzahl lebender Instanzen zurück."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lease_nodes (node, seen) VALUES (?, ?)", (self.node_id, now)
+            )
+            (alive,) = self._conn.execute(
+                "SELECT COUNT(*) FROM lease_nodes WHERE seen > ?", (now - self.ttl,)
+            ).fetchone()
+        return max(1, alive)
+
+    def acquire(self, key) -> tuple[int, bool] | None:
+        """Erwirbt oder erneuert die Lease auf `key`.
+
+        Gibt (epoch, übernommen) zurück, wenn die Lease jetzt dieser Instanz gehört
+        (`übernommen`: vorher hatte eine andere Instanz sie), sonst None.
+        """
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT owner, expires, epoch FROM leases WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    epoch, taken_over = 1, False
+                else:
+                    owner, expires, epoch = row
+                    if owner != self.node_id and expires > now:
+                        self._conn.execute("ROLLBACK")
+                        return None
+                    taken_over = owner != self.node_id
+                    if taken_over:
+                        epoch += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (key, owner, expires, epoch) VALUES (?, ?, ?, ?)",
+                    (key, self.node_id, now + self.ttl, epoch),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Schlägt COMMIT fehl (z. B. I/O-Fehler), hat SQLite die Transaktion
+                # oft schon zurückgerollt – ein weiteres ROLLBACK würde den Fehler verdecken
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return epoch, taken_over
+
+    def release(self, key):
+        """Gibt eine eigene Lease sofort frei (andere Instanzen dürfen sie übernehmen)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE leases SET expires = 0 WHERE key = ? AND owner = ?", (key, self.node_id)
+            )
+
+    def leave(self):
+        """Meldet diese Instanz ab, damit sie nicht mehr bei der Aufteilung mitzählt."""
+        with self._lock:
+            self._conn.execute("DELETE FROM lease_nodes WHERE node = ?", (self.node_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseCoordinator:
+    """Verteilt die Schulen über Leases auf alle laufenden Instanzen.
+
+    - Ein Hintergrund-Thread erneuert alle `ttl / 3` Sekunden die eigenen Leases und
+      übernimmt freie oder abgelaufene, bis diese Instanz ihren Anteil hält
+      (Schulen / lebende Instanzen, aufgerundet). Fällt eine Instanz aus, sind ihre
+      Schulen spätestens eine Lease-Dauer (plus eine Prüfrunde) später übernommen.
+    - Hält eine Instanz mehr als ihren Anteil (z.B. nachdem eine weitere gestartet
+      ist), gibt sie überzählige Schulen ab, sobald `can_release` dies erlaubt
+      (nichts mehr zu committen oder zu pushen).
+    - `remaining(key)` ist die lokale Restgültigkeit (monotone Uhr). Sie endet ein
+      Drittel der TTL vor dem Ablauf in der Datenbank; nur solange sie > 0 ist, wird
+      abgerufen, benachrichtigt, committet und gepusht.
+    """
+
+    def __init__(self, store: LeaseStore):
+        self.store = store
+        self.check_interval = store.ttl / RENEWALS_PER_TTL
+        self._lock = threading.Lock()
+        self._can_release = {}
+        # {Schlüssel: (epoch, übernommen, gültig bis [monoton])}
+        self._held = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, key, can_release=None):
+        """Meldet eine Schule an; `can_release()` entscheidet, ob sie abgegeben werden darf."""
+        with self._lock:
+            self._can_release[key] = can_release or (lambda: True)
+
+    def remaining(self, key) -> float:
+        """Sekunden, die diese Instanz `key` noch sicher hält (0 = nicht gehalten)."""
+        with self._lock:
+            held = self._held.get(key)
+        if held is None:
+            return 0.0
+        return max(0.0, held[2] - time.monotonic())
+
+    def lease(self, key) -> tuple[int, bool] | None:
+        """(epoch, übernommen) der gültigen eigenen Lease auf `key`, sonst None."""
+        with self._lock:
+            held = self._held.get(key)
+        if held is None or held[2] <= time.monotonic():
+            return None
+        return held[0], held[1]
+
+    def _order(self, keys):
+        # Instanzspezifische Reihenfolge: gleichzeitig startende Instanzen greifen
+        # zuerst nach verschiedenen Schulen
+        return sorted(keys, key=lambda k: hashlib.sha1(f"{self.store.node_id}/{k}".encode()).hexdigest())
+
+    def tick(self):
+        """Eine Runde: Heartbeat, eigene Leases erneuern, abgeben bzw. übernehmen."""
+        started = time.monotonic()
+        valid_until = started + self.store.ttl - self.check_interval
+        with self._lock:
+            keys = list(self._can_release)
+            held = dict(self._held)
+
+        alive = self.store.heartbeat()
+        target = math.ceil(len(keys) / alive)
+
+        for key in list(held):
+            result = self.store.acquire(key)
+            if result is None:
+                logger.warning(f"Lease für '{key}' verloren (andere Instanz hat übernommen).")
+                del held[key]
+            else:
+                # Gleiche Epoche: dieselbe Amtszeit, "übernommen" bleibt wie beim Erwerb
+                taken_over = held[key][1] if result[0] == held[key][0] else result[1]
+                held[key] = (result[0], taken_over, valid_until)
+
+        # Überzählige Schulen abgeben; lokal zuerst, damit kein Zyklus mehr startet
+        for key in reversed(self._order(held)):
+            if len(held) <= target:
+                break
+            if self._can_release[key]():
+                del held[key]
+                with self._lock:
+                    self._held.pop(key, None)
+                self.store.release(key)
+                logger.info(f"Lease für '{key}' abgegeben ({alive} Instanzen aktiv).")
+
+        for key in self._order(keys):
+            if len(held) >= target:
+                break
+            if key in held:
+                continue
+            result = self.store.acquire(key)
+            if result is not None:
+                held[key] = (result[0], result[1], valid_until)
+                logger.info(f"Lease für '{key}' erworben (Epoche {result[0]}).")
+
+        with self._lock:
+            self._held = held
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                # Ohne Erneuerung laufen die lokalen Leases von selbst ab
+                logger.error(f"Lease-Runde fehlgeschlagen: {e}", exc_info=True)
+
+    def start(self):
+        """Erste Runde sofort, danach im Hintergrund."""
+        try:
+            self.tick()
+        except Exception as e:
+            logger.error(f"Lease-Runde fehlgeschlagen: {e}", exc_info=True)
+        self._thread = threading.Thread(target=self._run, name="lease-coordinator", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Beendet die Erneuerung und gibt alle eigenen Leases frei."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 5)
+        with self._lock:
+            held, self._held = self._held, {}
+        try:
+            for key in held:
+                self.store.release(key)
+            self.store.leave()
+        except sqlite3.Error as e:
+            logger.warning(f"Leases konnten nicht freigegeben werden: {e}")
+        self.store.close()
+
+
+def _network_filesystem(path) -> str | None:
+    """Typ des Netzwerk-Dateisystems, auf dem `path` liegt (nur Linux), sonst None."""
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return None
+    path = os.path.realpath(os.path.dirname(os.path.abspath(path)))
+    best = ("", "")
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best[0]):
+            best = (mount_point, fs_type)
+    return best[1] if best[1].startswith(NETWORK_FILESYSTEMS) else None
+
+
+def create_lease_coordinator() -> LeaseCoordinator | None:
+    """Koordinator laut Config (LEASE_DB, LEASE_TTL, NODE_ID); None ohne LEASE_DB."""
+    if not Config.LEASE_DB:
+        return None
+    fs_type = _network_filesystem(Config.LEASE_DB)
+    if fs_type:
+        logger.warning(
+            f"LEASE_DB liegt auf einem Netzwerk-Dateisystem ({fs_type}); SQLite-Sperren sind dort "
+            "unzuverlässig, Schulen könnten doppelt abgerufen werden. Eine lokale Datei verwenden."
+        )
+    return LeaseCoordinator(LeaseStore(Config.LEASE_DB, Config.NODE_ID, Config.LEASE_TTL))
@@ -1,25 +1,65 @@
+import asyncio
+import signal
 import threading
 import time
 from config import Config
-from utils import get_cpu_temperature, logger, setup_logging 
+from utils import check_temperature, logger, setup_logging
 from discord_notifier import DiscordNotifier
 from bot_logic import SubstitutionBot
+from async_runner import AsyncBotRunner
+from tenants import load_tenants
+from tenant_runner import TenantRunner
 
 def monitor_system(notifier):
     while True:
-        temp = get_cpu_temperature()
-        if temp:
-            logger.debug(f"Aktuelle Temperatur: {temp:.1f}°C")
-            if temp > Config.TEMP_THRESHOLD:
-                msg = f"Hitzewarnung: {temp:.1f}°C"
-                logger.warning(msg)
-                notifier.send_warning(f"⚠️ {msg}")
-        
+        check_temperature(notifier)
         time.sleep(60)
 
+def stop_on_sigterm():
+    """SIGTERM (systemd/docker stop) wie Strg+C behandeln, damit shutdown() noch läuft."""
+    def handle(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle)
+
+def run_tenants():
+    """Mehrschulbetrieb: alle Schulen aus TENANTS_FILE in einem Prozess."""
+    try:
+        tenants = load_tenants(Config.TENANTS_FILE)
+    except EnvironmentError as e:
+        logger.critical(f"FATAL: Konfigurationsfehler: {e}. Bitte .env und Tenant-Datei überprüfen.")
+        exit(1)
+    if Config.EXECUTION_MODE == "asyncio":
+        logger.warning("EXECUTION_MODE=asyncio wird im Mehrschulbetrieb nicht unterstützt, nutze Threads.")
+
+    # Systemwarnungen (Temperatur) gehen an den Warn-Webhook der ersten Schule
+    first = tenants[0]
+    notifier = DiscordNotifier(
+        first.webhook_warn, first.webhook_plans, first.discord_ping_role_id, name=first.name
+    )
+    logger.info("Starte System Monitor Thread...")
+    threading.Thread(target=monitor_system, args=(notifier,), daemon=True).start()
+
+    stop_on_sigterm()
+    runner = None
+    try:
+        runner = TenantRunner(tenants, Config.TENANT_WORKERS)
+        runner.run()
+    except KeyboardInterrupt:
+        logger.info("Beende Bot durch Benutzer (KeyboardInterrupt)...")
+    except Exception as e:
+        logger.critical(f"FATAL: Bot Start fehlgeschlagen: {e}", exc_info=True)
+        exit(1)
+    finally:
+        if runner is not None:
+            runner.shutdown()
+    exit(0)
+
 if __name__ == "__main__":
     setup_logging() 
     
+    if Config.TENANTS_FILE:
+        run_tenants()
+
     try:
         # Konfiguration validieren, bevor der Notifier initialisiert wird
         Config.validate()
@@ -29,13 +69,31 @@ if __name__ == "__main__":
         # Wir können keine Discord-Warnung senden, wenn die Config fehlschlägt, daher nur Exit
         exit(1)
 
+    if Config.EXECUTION_MODE == "asyncio":
+        # Bot, Systemüberwachung und Shutdown auf einer Eventloop
+        try:
+            bot = SubstitutionBot()
+            asyncio.run(AsyncBotRunner(bot, notifier).run())
+        except Exception as e:
+            logger.critical(f"FATAL: Bot Start fehlgeschlagen: {e}", exc_info=True)
+            exit(1)
+        exit(0)
+
     logger.info("Starte System Monitor Thread...")
     threading.Thread(target=monitor_system, args=(notifier,), daemon=True).start()
 
+    stop_on_sigterm()
+    bot = None
     try:
         bot = SubstitutionBot()
         bot.start()
     except KeyboardInterrupt:
         logger.info("Beende Bot durch Benutzer (KeyboardInterrupt)...")
     except Exception as e:
-        logger.critical(f"FATAL: Bot Start fehlgeschlagen: {e}", exc_info=True)
\ No newline at end of file
+        logger.critical(f"FATAL: Bot Start fehlgeschlagen: {e}", exc_info=True)
+        exit(1)
+    finally:
+        # Gebündelte Commits pushen, Leases abgeben, Warteschlangen schließen
+        if bot is not None:
+            bot.shutdown()
+    exit(0)
\ No newline at end of file
@@ -0,0 +1,295 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import logger
+
+# Obergrenzen der Histogramm-Buckets in Sekunden (von Parsing bis Git-Push)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {"counts": list(value["counts"]), "sum": value["sum"]}
+    return value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = registry._lock
+        self._values = {}
+
+    def _snapshot(self) -> list:
+        """[(Label-Werte, Wert)] – eine Kopie, die ohne Lock ausgewertet werden kann."""
+        with self._lock:
+            return [(key, _copy(value)) for key, value in self._values.items()]
+
+    def _key(self, labels) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: Labels {sorted(labels)} statt {list(self.label_names)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self):
+        for key, value in self._snapshot():
+            yield self.name, key, (), value
+
+    def _as_dict(self, value):
+        return value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Momentanwert; mit `set_function` wird er erst beim Abruf berechnet (ohne Labels)."""
+
+    kind = "gauge"
+
+    def __init__(self, registry, name, help_text, label_names):
+        super().__init__(registry, name, help_text, label_names)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def _snapshot(self) -> list:
+        if self._function is None:
+            return super()._snapshot()
+        try:
+            return [((), self._function())]
+        except Exception as e:
+            logger.debug(f"Metrik {self.name} konnte nicht berechnet werden: {e}")
+            return []
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            state["counts"][index] += 1
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        for key, state in self._snapshot():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                yield self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative
+            yield self.name + "_sum", key, (), state["sum"]
+            yield self.name + "_count", key, (), cumulative
+
+    def _as_dict(self, state):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+            cumulative += count
+            buckets[_format_value(bound)] = cumulative
+        return {"count": cumulative, "sum": state["sum"], "buckets": buckets}
+
+
+class MetricsRegistry:
+    """Sammelt Zähler, Momentanwerte und Histogramme des Bots (threadsicher, nur im Speicher)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, help_text, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help_text, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metrik {name} ist bereits anders registriert.")
+            return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            samples = list(metric._samples())
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, extra, value in samples:
+                labels = _format_labels(metric.label_names, key, extra)
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """Alle Metriken als JSON-fähiges Dictionary: {name: {typ, hilfe, werte: [...]}}."""
+        result = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            values = [
+                {"labels": dict(zip(metric.label_names, key)), "value": metric._as_dict(value)}
+                for key, value in metric._snapshot()
+            ]
+            result[metric.name] = {"type": metric.kind, "help": metric.help, "values": values}
+        return result
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Metriken des Bots ---
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "dsb_stage_duration_seconds", "Dauer einzelner Verarbeitungsschritte", ["stage"]
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "dsb_stage_errors_total", "Fehler pro Verarbeitungsschritt", ["stage"]
+)
+CYCLE_SECONDS = REGISTRY.histogram(
+    "dsb_cycle_duration_seconds", "Dauer eines kompletten Abrufzyklus (alle Clients)"
+)
+CYCLES = REGISTRY.counter(
+    "dsb_cycles_total", "Abrufzyklen nach Ergebnis (updated, unchanged, skipped, standby, error)", ["result"]
+)
+CLIENT_CYCLE_SECONDS = REGISTRY.histogram(
+    "dsb_client_cycle_duration_seconds", "Dauer des Abrufzyklus pro Client", ["client"]
+)
+MENU_UNCHANGED = REGISTRY.counter(
+    "dsb_menu_unchanged_total", "Übersprungene Zyklen wegen unverändertem DSB-Menü", ["client"]
+)
+PLANS_CHANGED = REGISTRY.counter(
+    "dsb_plans_changed_total", "Neue oder geänderte Pläne", ["client"]
+)
+BYTES_DOWNLOADED = REGISTRY.counter(
+    "dsb_downloaded_bytes_total", "Heruntergeladene Bytes (DSB-Menü, Pläne)", ["source"]
+)
+PLAN_DOWNLOADS = REGISTRY.counter(
+    "dsb_plan_downloads_total", "Plan-Downloads nach HTTP-Ergebnis (200, 304, ...)", ["status"]
+)
+DISCORD_PENDING = REGISTRY.gauge(
+    "dsb_discord_pending_messages", "Noch nicht zugestellte Discord-Nachrichten"
+)
+GIT_PENDING = REGISTRY.gauge(
+    "dsb_git_pending_changes", "Geänderte Pläne, die noch auf ihren Commit warten"
+)
+
+
+@contextmanager
+def track_stage(stage):
+    """Misst die Dauer eines Verarbeitungsschritts; eine Exception zählt als Fehler."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_error(stage):
+    """Zählt einen abgefangenen Fehler eines Verarbeitungsschritts."""
+    STAGE_ERRORS.inc(stage=stage)
+
+
+# --- Scrape-Endpunkt ---
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = self.registry.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(self.registry.to_dict(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics-Endpunkt: {format % args}")
+
+
+def start_metrics_server(host, port):
+    """Startet den Scrape-Endpunkt (/metrics, /metrics.json) in einem Hintergrund-Thread.
+
+    Gibt den Server zurück (zum Beenden mit `shutdown()`), oder None bei Port 0 bzw.
+    wenn der Port nicht belegt werden kann.
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics-Endpunkt auf {host}:{port} konnte nicht gestartet werden: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics-Endpunkt gestartet: http://{host}:{server.server_port}/metrics")
+    return server
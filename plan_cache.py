@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from utils import logger
+
+
+class ConditionalCache:
+    """Speichert ETag/Last-Modified pro Plan-URL für bedingte GET-Anfragen.
+
+    Der Cache wird als JSON-Datei abgelegt und übersteht so Neustarts: Ein
+    unveränderter Plan kostet danach nur noch eine 304-Antwort ohne Body.
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            logger.debug(f"HTTP-Cache geladen: {len(entries)} Einträge aus {self.cache_file}")
+            return entries
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"HTTP-Cache konnte nicht gelesen werden, starte leer: {e}")
+            return {}
+
+    def _persist(self):
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_file, self.cache_file)
+
+    def conditional_headers(self, url) -> dict:
+        """Liefert If-None-Match/If-Modified-Since Header für eine bereits bekannte URL."""
+        with self._lock:
+            entry = self._entries.get(url)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, response):
+        """Übernimmt die Validatoren einer erfolgreich verarbeiteten 200-Antwort."""
+        if response.status_code != 200:
+            return
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        entry = {"etag": etag, "last_modified": last_modified}
+        with self._lock:
+            if self._entries.get(url) == entry:
+                return
+            self._entries[url] = entry
+            try:
+                self._persist()
+            except Exception as e:
+                logger.warning(f"HTTP-Cache konnte nicht gespeichert werden: {e}")
+
+    def clear(self):
+        """Verwirft alle Validatoren (nächster Abruf jeder URL ist ein voller Download)."""
+        with self._lock:
+            self._entries = {}
+            try:
+                self._persist()
+            except Exception as e:
+                logger.warning(f"HTTP-Cache konnte nicht gespeichert werden: {e}")
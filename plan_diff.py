@@ -0,0 +1,95 @@
+from collections import Counter
+from typing import List, Optional
+
+from plan_rows import SubstitutionRow, rows_from_dicts
+
+
+def _identity(row: SubstitutionRow) -> tuple:
+    """Welche Stunde eine Zeile betrifft; gleiche Identität + anderer Inhalt = geänderte Zeile."""
+    return (row.klassen, row.stunde, row.lehrer_alt, row.fach_alt)
+
+
+class PlanDiff:
+    """Unterschied zwischen zwei Versionen eines Plans auf Zeilenebene."""
+
+    def __init__(self, added=None, removed=None, changed=None, title_changed=False, is_new=False):
+        self.added: List[SubstitutionRow] = added or []
+        self.removed: List[SubstitutionRow] = removed or []
+        # Paare (alt, neu)
+        self.changed: List[tuple] = changed or []
+        self.title_changed = title_changed
+        # Keine Vorversion mit Zeilen bekannt
+        self.is_new = is_new
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.is_new or self.title_changed or self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        """Kurzbeschreibung für Log und Discord, z.B. '2 neu, 1 geändert, 1 entfallen'."""
+        if self.is_new:
+            return "neuer Plan"
+        parts = []
+        if self.added:
+            parts.append(f"{len(self.added)} neu")
+        if self.changed:
+            parts.append(f"{len(self.changed)} geändert")
+        if self.removed:
+            parts.append(f"{len(self.removed)} entfallen")
+        if self.title_changed:
+            parts.append("Titel geändert")
+        return ", ".join(parts) if parts else "keine Änderungen"
+
+
+def diff_rows(old_rows: Optional[List[SubstitutionRow]], new_rows: List[SubstitutionRow]) -> PlanDiff:
+    """Vergleicht zwei Zeilenlisten (Reihenfolge egal, doppelte Zeilen werden mitgezählt)."""
+    if old_rows is None:
+        return PlanDiff(added=list(new_rows), is_new=True)
+
+    # 1. Identische Zeilen aus beiden Versionen streichen
+    unmatched = Counter(old_rows)
+    unmatched.subtract(new_rows)
+    remaining_old = []
+    for row in old_rows:
+        if unmatched[row] > 0:
+            unmatched[row] -= 1
+            remaining_old.append(row)
+
+    unmatched = Counter(new_rows)
+    unmatched.subtract(old_rows)
+    remaining_new = []
+    for row in new_rows:
+        if unmatched[row] > 0:
+            unmatched[row] -= 1
+            remaining_new.append(row)
+
+    # 2. Übrige Zeilen derselben Stunde gelten als geändert, der Rest als neu/entfallen
+    old_by_identity = {}
+    for row in remaining_old:
+        old_by_identity.setdefault(_identity(row), []).append(row)
+
+    added = []
+    changed = []
+    for row in remaining_new:
+        candidates = old_by_identity.get(_identity(row))
+        if candidates:
+            changed.append((candidates.pop(0), row))
+        else:
+            added.append(row)
+
+    removed = [row for rows in old_by_identity.values() for row in rows]
+    return PlanDiff(added=added, removed=removed, changed=changed)
+
+
+def diff_plan(previous: Optional[dict], plan) -> PlanDiff:
+    """Vergleicht einen ParsedPlan mit dem gespeicherten Zustand seiner Vorversion.
+
+    `previous` ist der Zustandseintrag des Plans (mit 'rows' und 'plan_title');
+    fehlen die Zeilen (z.B. Zustand aus einer älteren Version), gilt der Plan als neu.
+    """
+    if not previous or previous.get("rows") is None:
+        return diff_rows(None, plan.rows)
+
+    diff = diff_rows(rows_from_dicts(previous["rows"]), plan.rows)
+    diff.title_changed = previous.get("plan_title") != plan.title
+    return diff
@@ -0,0 +1,121 @@
+import json
+import re
+from datetime import datetime
+from bs4 import BeautifulSoup
+from config import Config
+from plan_extractor import MonPlanExtractor
+from plan_rows import SubstitutionRow, parse_rows
+from metrics import track_stage
+from utils import logger
+
+# Regex sucht nach DD.MM.YYYY oder D.M.YYYY
+DATE_PATTERN = re.compile(r"(\d{1,2}\.\d{1,2}\.\d{4})")
+
+_UNSET = object()
+
+
+class ParsedPlan:
+    """Ein Plan-Dokument, das höchstens einmal geparst wird.
+
+    Datum, Titel ('mon_title') und die Zeilen der 'mon_list'-Tabelle werden erst
+    beim ersten Zugriff gelesen und danach zwischengespeichert. Standardmäßig
+    geschieht das mit dem ereignisbasierten MonPlanExtractor in einem Durchgang;
+    der Soup-Baum wird nur noch erzeugt, wenn er wirklich gebraucht wird oder der
+    Extraktor fehlschlägt. Ein ParsedPlan wird durch die gesamte Verarbeitungskette
+    (Konvertierung, Filter, Speichern) weitergereicht.
+
+    Wer Titel oder Tabellenzeilen bereits kennt (z.B. der Konverter), kann sie
+    mitgeben; das Dokument wird dann dafür gar nicht mehr gelesen.
+    """
+
+    def __init__(self, html: str, title=_UNSET, table_rows=_UNSET):
+        self.html = html
+        self._soup = None
+        self._title = title
+        self._date = _UNSET
+        self._table_rows = table_rows
+        self._rows = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            with track_stage("parse_soup"):
+                self._soup = BeautifulSoup(self.html, "html.parser")
+        return self._soup
+
+    def _extract(self) -> bool:
+        """Liest Titel und Tabellenzeilen per Streaming-Extraktor. False = Fallback auf Soup."""
+        if not Config.STREAMING_EXTRACTOR:
+            return False
+        try:
+            with track_stage("parse"):
+                extractor = MonPlanExtractor.extract(self.html)
+        except Exception as e:
+            logger.debug(f"Streaming-Extraktor fehlgeschlagen, nutze BeautifulSoup: {e}")
+            return False
+
+        if self._title is _UNSET:
+            self._title = extractor.title
+        if self._table_rows is _UNSET:
+            self._table_rows = extractor.table_rows
+        return True
+
+    @property
+    def title(self) -> str | None:
+        """Text des 'mon_title' Divs (z.B. '24.10.2025 Freitag') oder None."""
+        if self._title is _UNSET and not self._extract():
+            mon_title_div = self.soup.find("div", class_="mon_title")
+            self._title = mon_title_div.text.strip() if mon_title_div else None
+        return self._title
+
+    @property
+    def date(self) -> datetime | None:
+        """Datum aus dem 'mon_title' (Zeitkomponenten auf 0) oder None."""
+        if self._date is _UNSET:
+            self._date = None
+            match = DATE_PATTERN.search(self.title or "")
+            if match:
+                dt_obj = datetime.strptime(match.group(1), "%d.%m.%Y")
+                self._date = dt_obj.replace(hour=0, minute=0, second=0, microsecond=0)
+        return self._date
+
+    @property
+    def table_rows(self) -> list[list[str]]:
+        """Alle Zeilen der 'mon_list'-Tabelle (inkl. Kopfzeile) als Listen von Zelltexten."""
+        if self._table_rows is _UNSET and not self._extract():
+            self._table_rows = []
+            mon_list_table = self.soup.find("table", class_="mon_list")
+            if mon_list_table:
+                container = mon_list_table.find("tbody") or mon_list_table
+                for row in container.find_all("tr", recursive=False):
+                    cells = row.find_all(["td", "th"], recursive=False)
+                    self._table_rows.append([cell.get_text(strip=True) for cell in cells])
+        return self._table_rows
+
+    @property
+    def rows(self) -> list[SubstitutionRow]:
+        """Die Vertretungszeilen als Datensätze (ohne Kopfzeile)."""
+        if self._rows is None:
+            self._rows = parse_rows(self.table_rows)
+        return self._rows
+
+    def to_json(self) -> str:
+        """Maschinenlesbare Fassung des Plans (Titel, Datum, Zeilen) für die JSON-Datei neben dem HTML.
+
+        Eine Zeile pro Vertretung, damit Git-Diffs der Datei lesbar bleiben.
+        """
+        header = {
+            "title": self.title,
+            "date": self.date.strftime("%Y-%m-%d") if self.date else None,
+            "columns": self.table_rows[0] if self.table_rows else [],
+        }
+        lines = [json.dumps(row.to_dict(), ensure_ascii=False) for row in self.rows]
+        head = json.dumps(header, ensure_ascii=False)[:-1]
+        if not lines:
+            return head + ', "rows": []}\n'
+        return head + ', "rows": [\n' + ",\n".join(lines) + "\n]}\n"
+
+    @classmethod
+    def of(cls, plan) -> "ParsedPlan":
+        """Nimmt einen ParsedPlan oder einen HTML-String entgegen."""
+        return plan if isinstance(plan, cls) else cls(plan)
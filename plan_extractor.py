@@ -0,0 +1,276 @@
+import re
+from html.parser import HTMLParser
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+
+# Tags ohne End-Tag; werden wie von BeautifulSoup nicht auf den Element-Stack gelegt
+VOID_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+
+# Tags, in denen BeautifulSoup reine Whitespace-Textknoten nicht zusammenfasst
+PRESERVE_WHITESPACE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+# Numerische Referenz ohne Semikolon, gefolgt von weiterem Text
+_DECIMAL_REFERENCE = re.compile(r"^([0-9]+)(.*)")
+_HEX_REFERENCE = re.compile(r"^([0-9a-f]+)(.*)")
+
+
+class _ExtractionDone(Exception):
+    """Bricht das Parsen ab, sobald Titel und Tabelle vollständig gelesen sind."""
+
+
+def _has_class(attrs, class_name):
+    for name, value in attrs:
+        if name == "class" and value and class_name in value.split():
+            return True
+    return False
+
+
+def _dereference_charref(name):
+    """Numerische Zeichenreferenz wie BeautifulSoup auflösen: (Zeichen, Folgedaten).
+
+    Folgedaten entstehen bei Referenzen ohne Semikolon ("&#65abc"): nur die Ziffern
+    werden aufgelöst, der Rest bleibt Text.
+    """
+    base, pattern = 10, _DECIMAL_REFERENCE
+    if name[:1] in ("x", "X"):
+        name, base, pattern = name[1:], 16, _HEX_REFERENCE
+    extra_data = ""
+    try:
+        number = int(name, base)
+    except ValueError:
+        match = pattern.search(name)
+        if match is None:
+            return "", name
+        number = int(match.group(1), base)
+        extra_data = match.group(2)
+    return _numeric_character(number), extra_data
+
+
+def _numeric_character(number):
+    # HTML5-Regeln: ungültige Codepoints werden U+FFFD, C1-Steuerzeichen als Windows-1252 gelesen
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= number <= 0x9F:
+        try:
+            return bytes([number]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(number)
+
+
+class MonPlanExtractor(HTMLParser):
+    """Ereignisbasierter Extraktor für 'mon_title' und die Zeilen der 'mon_list'-Tabelle.
+
+    Liest das Dokument in einem Durchgang mit dem html.parser der Standardbibliothek,
+    ohne einen Baum aufzubauen. Element-Stack, Zeichenreferenzen und Textknoten werden
+    so behandelt wie vom BeautifulSoup-Treebuilder, damit dieselben Ergebnisse wie die
+    Soup-Variante entstehen (erstes Div 'mon_title', direkte Zeilen/Zellen der ersten
+    Tabelle 'mon_list').
+    """
+
+    # Parsen beenden, sobald Titel und Tabelle gelesen sind
+    stop_early = True
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.title = None
+        self.table_found = False
+
+        self._stack = []
+        self._already_closed = []
+        self._preserve_depth = 0
+        self._text_parts = []
+
+        self._title_index = None
+        self._title_parts = []
+
+        self._table_index = None
+        self._table_done = False
+        self._tbody_index = None
+        self._tbody_seen = False
+        self._direct_rows = []
+        self._tbody_rows = []
+
+        self._row_index = None
+        self._row = None
+        self._cell_index = None
+        self._cell_parts = None
+
+    @classmethod
+    def extract(cls, html_content: str) -> "MonPlanExtractor":
+        parser = cls()
+        try:
+            parser.feed(html_content)
+            parser.close()
+        except _ExtractionDone:
+            pass
+        return parser
+
+    @property
+    def table_rows(self) -> list[list[str]]:
+        """Zeilen wie bei BeautifulSoup: aus dem ersten tbody, sonst direkt aus der Tabelle."""
+        return self._tbody_rows if self._tbody_seen else self._direct_rows
+
+    # --- Element-Stack ---
+
+    def handle_starttag(self, tag, attrs):
+        self._end_text()
+        if tag in VOID_ELEMENTS:
+            # Leeres Element: wird sofort wieder geschlossen, ein späteres </tag> ignoriert
+            self._already_closed.append(tag)
+            return
+        self._push(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/>: Start und Ende in einem, auch für Nicht-Void-Tags
+        self._end_text()
+        if tag not in VOID_ELEMENTS:
+            self._push(tag, attrs)
+            self._end_text()
+            self._pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._already_closed:
+            # Redundantes </br> o.ä. – BeautifulSoup beendet hier nicht einmal den Textknoten
+            self._already_closed.remove(tag)
+            return
+        self._end_text()
+        self._pop_to(tag)
+
+    def _push(self, tag, attrs):
+        parent = len(self._stack) - 1
+        index = len(self._stack)
+        self._stack.append(tag)
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth += 1
+        self._on_push(tag, attrs, index, parent)
+
+    def _pop_to(self, tag):
+        if tag not in self._stack:
+            # Wie BeautifulSoup: End-Tags ohne offenes Element werden ignoriert
+            return
+        index = len(self._stack) - 1 - self._stack[::-1].index(tag)
+        self._pop_from(index)
+
+    def _pop_from(self, index):
+        popped = self._stack[index:]
+        del self._stack[index:]
+        self._preserve_depth -= sum(1 for name in popped if name in PRESERVE_WHITESPACE_TAGS)
+        self._on_pop(popped, index)
+
+    def _on_push(self, tag, attrs, index, parent):
+        if tag == "div" and self.title is None and self._title_index is None:
+            if _has_class(attrs, "mon_title"):
+                self._title_index = index
+            return
+
+        if tag == "table" and not self.table_found:
+            if _has_class(attrs, "mon_list"):
+                self.table_found = True
+                self._table_index = index
+            return
+
+        if self._table_index is None:
+            return
+
+        if tag == "tbody" and not self._tbody_seen:
+            self._tbody_seen = True
+            self._tbody_index = index
+        elif tag == "tr" and parent in (self._table_index, self._tbody_index):
+            self._row_index = index
+            self._row = []
+            target = self._tbody_rows if parent == self._tbody_index else self._direct_rows
+            target.append(self._row)
+        elif tag in ("td", "th") and self._row_index is not None and parent == self._row_index:
+            self._cell_index = index
+            self._cell_parts = []
+
+    def _on_pop(self, popped, index):
+        if self._cell_index is not None and index <= self._cell_index:
+            self._row.append("".join(self._cell_parts))
+            self._cell_index = None
+            self._cell_parts = None
+        if self._row_index is not None and index <= self._row_index:
+            self._row_index = None
+            self._row = None
+        if self._tbody_index is not None and index <= self._tbody_index:
+            self._tbody_index = None
+        if self._table_index is not None and index <= self._table_index:
+            self._table_index = None
+            self._table_done = True
+        if self._title_index is not None and index <= self._title_index:
+            self._title_index = None
+            self.title = "".join(self._title_parts).strip()
+
+        if self.stop_early and self.title is not None and self._table_done:
+            raise _ExtractionDone()
+
+    def close(self):
+        super().close()
+        self._end_text()
+        # Nicht geschlossene Elemente am Dokumentende wie BeautifulSoup schließen
+        if self._stack:
+            self._pop_from(0)
+
+    # --- Text ---
+
+    def handle_data(self, data):
+        self._text_parts.append(data)
+
+    def handle_charref(self, name):
+        dereferenced, extra_data = _dereference_charref(name)
+        if dereferenced is not None:
+            self.handle_data(dereferenced)
+        if extra_data is not None:
+            self.handle_data(extra_data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._special_node("comment", data)
+
+    def handle_decl(self, decl):
+        self._special_node("doctype", decl[len("DOCTYPE "):])
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._special_node("cdata", data[len("CDATA["):])
+        else:
+            self._special_node("declaration", data)
+
+    def handle_pi(self, data):
+        self._special_node("pi", data)
+
+    def _special_node(self, kind, data):
+        """Kommentare, Deklarationen usw. bilden wie bei BeautifulSoup eigene Knoten."""
+        self._end_text()
+        self._text_parts.append(data)
+        self._end_text(kind)
+
+    def _end_text(self, kind="text"):
+        """Schließt den aktuellen Textknoten ab (entspricht BeautifulSoup.endData)."""
+        if not self._text_parts:
+            return
+        text = "".join(self._text_parts)
+        self._text_parts = []
+
+        if not self._preserve_depth and all(char in ASCII_SPACES for char in text):
+            text = "\n" if "\n" in text else " "
+        self._on_text(text, kind)
+
+    def _on_text(self, text, kind):
+        # Nur normaler Text und CDATA zählen bei get_text()
+        if kind not in ("text", "cdata"):
+            return
+        if self._title_index is not None:
+            self._title_parts.append(text)
+        if self._cell_index is not None:
+            # get_text(strip=True) strippt jeden Textknoten einzeln
+            stripped = text.strip()
+            if stripped:
+                self._cell_parts.append(stripped)
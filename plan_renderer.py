@@ -0,0 +1,217 @@
+import re
+from functools import lru_cache
+
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from bs4.element import CData, Comment, Declaration, Doctype, ProcessingInstruction
+from bs4.formatter import HTMLFormatter
+
+from plan_document import ParsedPlan
+from plan_extractor import VOID_ELEMENTS, MonPlanExtractor
+
+# Ausgabe wie str(soup): Formatter "minimal", Attribute alphabetisch sortiert
+_FORMATTER = HTMLFormatter.REGISTRY["minimal"]
+_CDATA_LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+_NONWHITESPACE = re.compile(r"\S+")
+_CDATA_CONTAINING_TAGS = {"script", "style"}
+_SPECIAL_NODES = {
+    "comment": Comment,
+    "doctype": Doctype,
+    "cdata": CData,
+    "declaration": Declaration,
+    "pi": ProcessingInstruction,
+}
+
+TEMPLATE_FOOTER = "\n\n</body>\n</html>"
+
+
+def _escape(text: str) -> str:
+    return _FORMATTER.substitute(text)
+
+
+@lru_cache(maxsize=1024)
+def _render_start_tag(tag, attrs, void):
+    """Start-Tag wie beim Serialisieren durch BeautifulSoup (Pläne wiederholen dieselben Tags ständig)."""
+    attr_dict = {}
+    for key, value in attrs:
+        attr_dict[key] = "" if value is None else value
+
+    list_attributes = _CDATA_LIST_ATTRIBUTES.get("*", set()) | _CDATA_LIST_ATTRIBUTES.get(tag, set())
+    parts = ["<", tag]
+    for key, value in sorted(attr_dict.items()):
+        if key in list_attributes:
+            value = " ".join(_NONWHITESPACE.findall(value))
+        value = _FORMATTER.quoted_attribute_value(_FORMATTER.attribute_value(value))
+        parts.append(f" {key}={value}")
+    parts.append(_FORMATTER.void_element_close_prefix + ">" if void else ">")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=64)
+def _render_meta_tag(raw_tag):
+    return str(BeautifulSoup(raw_tag, "html.parser"))
+
+
+class _SoupCompatibleWriter(MonPlanExtractor):
+    """Schreibt ein Dokument so, wie str(BeautifulSoup(html, 'html.parser')) es ausgeben würde.
+
+    Der Element-Stack des MonPlanExtractor bildet den Baum von BeautifulSoup nach;
+    statt ihn aufzubauen, wird jedes Ereignis direkt in einen Puffer geschrieben.
+    Der Inhalt der ersten 'mon_list'-Tabelle wird dabei wie in
+    _restructure_mon_list_table ersetzt: alte Zeilen (bzw. das alte tbody) fallen weg,
+    das von `render_tbody(table_rows)` gelieferte tbody wird ans Tabellenende gehängt.
+    `render_tbody` gibt (tbody-Markup, neue Tabellenzeilen) zurück.
+    """
+
+    stop_early = False
+
+    def __init__(self, render_tbody):
+        super().__init__()
+        self._render_tbody = render_tbody
+        self.rendered_rows = None
+        self._out = []
+
+        # Offene, ggf. zu entfernende Ausgabebereiche: Stack-Position -> Startindex in _out
+        self._span_starts = {}
+        self._direct_row_spans = []
+        self._tbody_span = None
+
+    def snapshot(self):
+        """Zustand nach einem vollständig gelesenen Dokumentanfang (z.B. Template-Header)."""
+        return self.output(), tuple(self._stack), tuple(self._already_closed), self._preserve_depth
+
+    def restore(self, snapshot):
+        """Setzt den mit snapshot() gesicherten Zustand; danach wird nur der Rest gelesen."""
+        out, stack, already_closed, preserve_depth = snapshot
+        self._out = [out]
+        self._stack = list(stack)
+        self._already_closed = list(already_closed)
+        self._preserve_depth = preserve_depth
+
+    def output(self) -> str:
+        return "".join(self._out)
+
+    # --- Tags ---
+
+    def _start_tag(self, tag, attrs, void):
+        if tag == "meta":
+            # BeautifulSoup ersetzt das charset in Meta-Tags; selten, daher über Soup selbst
+            return _render_meta_tag(self.get_starttag_text())
+        return _render_start_tag(tag, tuple(attrs), void)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            self._end_text()
+            self._out.append(self._start_tag(tag, attrs, void=True))
+        super().handle_starttag(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            self._end_text()
+            self._out.append(self._start_tag(tag, attrs, void=True))
+        super().handle_startendtag(tag, attrs)
+
+    def _on_push(self, tag, attrs, index, parent):
+        start = len(self._out)
+        table_index = self._table_index
+        tbody_seen = self._tbody_seen
+        super()._on_push(tag, attrs, index, parent)
+
+        if table_index is not None:
+            if tag == "tr" and parent == table_index:
+                self._span_starts[index] = start
+            elif tag == "tbody" and not tbody_seen:
+                self._span_starts[index] = start
+
+        self._out.append(self._start_tag(tag, attrs, void=False))
+
+    def _on_pop(self, popped, index):
+        table_index = self._table_index
+        tbody_index = self._tbody_index
+        super()._on_pop(popped, index)
+
+        # Von innen nach außen schließen, wie beim Serialisieren des Baums
+        for position in range(index + len(popped) - 1, index - 1, -1):
+            if position == table_index:
+                self._finish_table()
+            self._out.append(f"</{popped[position - index]}>")
+
+            start = self._span_starts.pop(position, None)
+            if start is not None:
+                span = (start, len(self._out))
+                if position == tbody_index:
+                    self._tbody_span = span
+                else:
+                    self._direct_row_spans.append(span)
+
+    def _finish_table(self):
+        # Altes tbody entfernen; ohne tbody werden die direkten Zeilen entfernt
+        if self._tbody_seen:
+            spans = [self._tbody_span] if self._tbody_span else []
+        else:
+            spans = self._direct_row_spans
+        for start, end in sorted(spans, reverse=True):
+            del self._out[start:end]
+
+        tbody_html, self.rendered_rows = self._render_tbody(self.table_rows)
+        self._out.append(tbody_html)
+
+    # --- Text ---
+
+    def _on_text(self, text, kind):
+        super()._on_text(text, kind)
+        if kind == "text":
+            if self._stack and self._stack[-1] in _CDATA_CONTAINING_TAGS:
+                self._out.append(text)
+            else:
+                self._out.append(_escape(text))
+        else:
+            node_class = _SPECIAL_NODES[kind]
+            self._out.append(node_class.PREFIX + text + node_class.SUFFIX)
+
+
+class PlanTemplate:
+    """Lädt 'plan_style.html' einmalig und rendert Schülerpläne ohne Soup-Baum.
+
+    Der Template-Header wird beim Laden bereits in die Ausgabeform gebracht
+    (vorkompiliert); pro Plan wird nur noch der Body-Inhalt in einem Durchgang
+    geschrieben.
+    """
+
+    def __init__(self, template_path):
+        # Annahme: plan_style.html enthält den HTML-Header bis einschließlich des öffnenden <body>-Tags.
+        with open(template_path, "r", encoding="utf-8") as f:
+            # Entferne eventuelle Whitespaces am Ende, falls der Body-Tag direkt am Ende steht
+            self.header = f.read().strip()
+        self._compiled_header = self._compile_header()
+
+    def _compile_header(self):
+        writer = _SoupCompatibleWriter(render_tbody=None)
+        writer.feed(self.header)
+        if writer.rawdata or writer._text_parts or writer.table_found:
+            # Header endet nicht sauber an einer Tag-Grenze: bei jedem Plan mitparsen
+            return None
+        return writer.snapshot()
+
+    def wrap(self, body_content: str) -> str:
+        """Setzt den Body-Inhalt zwischen Template-Header und abschließende Tags."""
+        return self.header + body_content + TEMPLATE_FOOTER
+
+    def render(self, body_content: str, render_tbody) -> ParsedPlan:
+        """Rendert einen Plan; `render_tbody(table_rows)` liefert das neue tbody als String
+        und die Zeilen der neuen Tabelle (werden dem ParsedPlan mitgegeben).
+
+        Enthält der Plan keine 'mon_list'-Tabelle, wird das Dokument unverändert
+        zurückgegeben (wie bei _restructure_mon_list_table).
+        """
+        writer = _SoupCompatibleWriter(render_tbody)
+        if self._compiled_header:
+            writer.restore(self._compiled_header)
+            writer.feed(body_content + TEMPLATE_FOOTER)
+        else:
+            writer.feed(self.wrap(body_content))
+        writer.close()
+
+        if not writer.table_found:
+            return ParsedPlan(self.wrap(body_content), title=writer.title, table_rows=[])
+        return ParsedPlan(writer.output(), title=writer.title, table_rows=writer.rendered_rows)
@@ -0,0 +1,85 @@
+from typing import Iterable, List
+
+# Spaltenüberschrift im Plan -> Feldname im Datensatz
+HEADER_FIELDS = {
+    "Klasse(n)": "klassen",
+    "Stunde": "stunde",
+    "Vertreter": "vertreter",
+    "(Lehrer)": "lehrer_alt",
+    "Fach": "fach",
+    "Raum": "raum",
+    "(Fach)": "fach_alt",
+    "Art": "art",
+    "Text": "text",
+}
+
+
+class SubstitutionRow:
+    """Eine Vertretungszeile als kompakter Datensatz (feste Felder, keine HTML-Reste).
+
+    Spalten, die keinem bekannten Feld entsprechen, landen in `extra`
+    ({Überschrift: Text}); fehlende Spalten bleiben None.
+    """
+
+    FIELDS = tuple(HEADER_FIELDS.values())
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+        self.extra = values.get("extra")
+
+    @classmethod
+    def from_cells(cls, headers: List[str], cells: List[str]) -> "SubstitutionRow":
+        """Erstellt einen Datensatz aus den Zelltexten einer Tabellenzeile."""
+        row = cls()
+        for header, cell in zip(headers, cells):
+            field = HEADER_FIELDS.get(header)
+            if field is None or getattr(row, field) is not None:
+                # Unbekannte oder doppelte Überschrift
+                if row.extra is None:
+                    row.extra = {}
+                row.extra.setdefault(header, cell)
+            else:
+                setattr(row, field, cell)
+        return row
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SubstitutionRow":
+        return cls(**{key: data.get(key) for key in cls.__slots__})
+
+    def to_dict(self) -> dict:
+        """Nur gesetzte Felder, damit das JSON kompakt bleibt."""
+        data = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def as_tuple(self) -> tuple:
+        extra = tuple(sorted(self.extra.items())) if self.extra else None
+        return tuple(getattr(self, field) for field in self.FIELDS) + (extra,)
+
+    def __eq__(self, other):
+        if not isinstance(other, SubstitutionRow):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return f"SubstitutionRow({self.to_dict()!r})"
+
+
+def parse_rows(table_rows: List[List[str]]) -> List[SubstitutionRow]:
+    """Wandelt die Zeilen der 'mon_list'-Tabelle (erste Zeile = Kopfzeile) in Datensätze um."""
+    if not table_rows:
+        return []
+    headers = table_rows[0]
+    return [SubstitutionRow.from_cells(headers, cells) for cells in table_rows[1:] if cells]
+
+
+def rows_from_dicts(items: Iterable[dict]) -> List[SubstitutionRow]:
+    return [SubstitutionRow.from_dict(item) for item in items]
@@ -0,0 +1,329 @@
+import copy
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+from utils import logger
+from metrics import track_stage
+
+# Unterordner von plans/: Inhalte nach Hash, Versionsliste pro Tag
+OBJECTS_DIR = "objects"
+VERSIONS_DIR = "versions"
+# Noch nicht übernommene Schreibvorgänge (von git über .git/info/exclude ignoriert)
+TMP_SUFFIX = ".tmp"
+
+
+class PlanStore:
+    """Versionierte Ablage der Pläne im plans/ Ordner (inhaltsadressiert, atomar).
+
+    - Jeder Inhalt liegt genau einmal unter objects/YYYY-MM/<sha256>.html (bzw. .json
+      für die Vertretungszeilen) und wird nie überschrieben.
+    - versions/YYYY-MM/YYYY-MM-DD.json listet pro Tag alle Quellen (DSB-Plan bzw.
+      konvertierter Plan) mit ihren Versionen. Mehrere Pläne desselben Tages (z.B.
+      Teil 1/2) überschreiben sich so nicht mehr.
+    - Quellen sind über Uploads hinweg stabil: DSB legt jeden Upload in einem neuen
+      Ordner data/<GUID>/ ab, daher zählen nur Client und Dateiname (`plan_source`)
+      bzw. der Schlüssel des konvertierten Plans.
+    - Lesbare Ansichten: YYYY-MM-DD.html/.json zeigt die zuletzt gespeicherte Version
+      des Tages. Hat ein Tag mehrere Quellen, zeigt YYYY-MM-DD_1.html, _2.html usw.
+      zusätzlich die aktuelle Version jeder Quelle. Ansichten sind Hardlinks auf das
+      Objekt, jeder Inhalt liegt also nur einmal auf der Platte (ohne Hardlinks, z.B.
+      auf FAT, wird kopiert). Ansichten nie in-place ändern.
+    - `save_plan` legt die Dateien nur als .tmp an; `flush` schreibt sie gesammelt auf
+      die Platte (ein fsync-Durchgang) und benennt sie atomar um, die Versionslisten
+      zuletzt. Nach einem Absturz liegt jede Datei entweder alt oder vollständig neu
+      vor, und eine Version steht erst in der Liste, wenn ihre Dateien vorhanden sind.
+    - Ist der Inhalt bereits die aktuelle Version derselben Quelle, wird nichts
+      geschrieben oder committet.
+    """
+
+    def __init__(self, plans_dir):
+        self.plans_dir = plans_dir
+        self._lock = threading.Lock()
+        # {Datum: Versionsliste}, bei Bedarf von der Platte gelesen
+        self._versions = {}
+        # {Zielpfad: Temp-Pfad} der noch nicht übernommenen Dateien
+        self._staged = {}
+        # {Ansicht: Objekt} der noch nicht übernommenen Ansichten
+        self._links = {}
+        # Seit dem letzten Commit geschriebene Dateien (für Commits ohne Index-Scan)
+        self._written = set()
+        # Neue Versionen vor bzw. nach flush() (für den Suchindex)
+        self._saved = []
+        self._flushed = []
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def plan_source(client_name: str, url: str) -> str:
+        """Stabile Quelle eines DSB-Plans: Client und Dateiname ohne den Upload-Ordner."""
+        return f"{client_name}/{posixpath.basename(urlsplit(url).path)}"
+
+    @staticmethod
+    def source_id(source: str) -> str:
+        """Kurz-ID einer Quelle (`plan_source` bzw. Schlüssel des konvertierten Plans) im Archiv."""
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+    def remove_stale_tmp(self):
+        """Entfernt Reste eines abgebrochenen Laufs (die Zieldateien sind unversehrt).
+
+        Nur aufrufen, solange keine andere Instanz in denselben Ordner schreibt.
+        """
+        for root, _, files in os.walk(self.plans_dir):
+            for name in files:
+                if name.endswith(TMP_SUFFIX):
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError as e:
+                        logger.warning(f"Temporäre Plan-Datei konnte nicht entfernt werden: {e}")
+
+    def _versions_path(self, date_str: str) -> str:
+        return os.path.join(self.plans_dir, VERSIONS_DIR, date_str[:7], f"{date_str}.json")
+
+    def _object_path(self, date_str: str, digest: str, ext: str) -> str:
+        return os.path.join(self.plans_dir, OBJECTS_DIR, date_str[:7], f"{digest}.{ext}")
+
+    @staticmethod
+    def _view_name(date_str: str, position: int | None, ext: str) -> str:
+        # position None: Ansicht des Tages (zuletzt gespeicherte Version)
+        suffix = f"_{position + 1}" if position is not None else ""
+        return f"{date_str}{suffix}.{ext}"
+
+    def _link_views(self, date_str: str, position: int | None, version: dict):
+        view = os.path.join(self.plans_dir, self._view_name(date_str, position, "html"))
+        self._links[view] = self._object_path(date_str, version["html"], "html")
+        if version["json"] is not None:
+            view = os.path.join(self.plans_dir, self._view_name(date_str, position, "json"))
+            self._links[view] = self._object_path(date_str, version["json"], "json")
+
+    def _load_versions(self, date_str: str) -> dict:
+        versions = self._versions.get(date_str)
+        if versions is not None:
+            return versions
+        try:
+            with open(self._versions_path(date_str), "r", encoding="utf-8") as f:
+                versions = json.load(f)
+        except FileNotFoundError:
+            versions = {"date": date_str, "sources": []}
+        except Exception as e:
+            logger.warning(f"Versionsliste für {date_str} konnte nicht gelesen werden, starte leer: {e}")
+            versions = {"date": date_str, "sources": []}
+        self._versions[date_str] = versions
+        return versions
+
+    def _stage(self, path: str, data: bytes):
+        """Schreibt `data` nach <path>.tmp; übernommen wird erst in flush()."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + TMP_SUFFIX
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._staged[path] = tmp_path
+
+    def _stage_object(self, date_str: str, data: bytes, ext: str) -> str:
+        digest = self.content_hash(data)
+        path = self._object_path(date_str, digest, ext)
+        # Inhaltsadressiert: eine vorhandene Datei hat bereits genau diesen Inhalt
+        if path not in self._staged and not os.path.exists(path):
+            self._stage(path, data)
+        return digest
+
+    def save_plan(self, date_str: str, source: str, title: str, html: str, rows_json: str | None) -> bool | None:
+        """Legt eine neue Version des Plans `source` für den Tag `date_str` an.
+
+        `source` ist `plan_source` bzw. der Schlüssel des konvertierten Plans. Gibt True
+        zurück, wenn eine neue Version angelegt wurde, und None, wenn der Inhalt bereits
+        die aktuelle Version dieser Quelle ist. Die Dateien werden erst mit `flush`
+        übernommen; schlägt schon das Vorbereiten fehl, bleibt alles beim Alten.
+        """
+        html_data = html.encode("utf-8")
+        html_hash = self.content_hash(html_data)
+        source_id = self.source_id(source)
+
+        with self._lock:
+            current = self._load_versions(date_str)
+            position = next(
+                (i for i, entry in enumerate(current["sources"]) if entry["source"] == source_id), None
+            )
+            if position is not None:
+                versions = current["sources"][position]["versions"]
+                if versions and versions[-1]["html"] == html_hash:
+                    return None
+
+            # Versionsliste erst nach erfolgreichem Vorbereiten übernehmen
+            updated = copy.deepcopy(current)
+            staged_before, links_before = dict(self._staged), dict(self._links)
+            try:
+                with track_stage("file_write"):
+                    self._stage_object(date_str, html_data, "html")
+                    rows_hash = None
+                    if rows_json is not None:
+                        rows_hash = self._stage_object(date_str, rows_json.encode("utf-8"), "json")
+
+                    sources = updated["sources"]
+                    if position is None:
+                        position = len(sources)
+                        sources.append({"source": source_id, "title": title, "versions": []})
+                    entry = sources[position]
+                    entry["title"] = title
+                    version = {
+                        "html": html_hash,
+                        "json": rows_hash,
+                        "saved": datetime.now().isoformat(timespec="seconds"),
+                    }
+                    entry["versions"].append(version)
+
+                    # Lesbare Ansichten auf die neue Version; mit der zweiten Quelle des
+                    # Tages bekommt auch die erste ihre eigene Ansicht
+                    self._link_views(date_str, None, version)
+                    if len(sources) > 1:
+                        self._link_views(date_str, position, version)
+                    if len(sources) == 2 and position == 1 and sources[0]["versions"]:
+                        self._link_views(date_str, 0, sources[0]["versions"][-1])
+                    self._stage(
+                        self._versions_path(date_str),
+                        json.dumps(updated, ensure_ascii=False, indent=1).encode("utf-8"),
+                    )
+            except BaseException:
+                _remove_files(
+                    tmp_path for path, tmp_path in self._staged.items() if path not in staged_before
+                )
+                self._staged, self._links = staged_before, links_before
+                raise
+            self._versions[date_str] = updated
+            self._saved.append({"date": date_str, "source": source_id, "title": title, "version": version})
+            return True
+
+    def view_path(self, date_str: str, source: str) -> str | None:
+        """Pfad der lesbaren Ansicht (YYYY-MM-DD[_n].html) einer Quelle, falls vorhanden."""
+        source_id = self.source_id(source)
+        with self._lock:
+            sources = self._load_versions(date_str)["sources"]
+            for position, entry in enumerate(sources):
+                if entry["source"] == source_id:
+                    if len(sources) == 1:
+                        position = None
+                    return os.path.join(self.plans_dir, self._view_name(date_str, position, "html"))
+        return None
+
+    def flush(self) -> int:
+        """Übernimmt alle vorbereiteten Dateien: ein fsync-Durchgang über alle Dateien,
+        dann atomares Umbenennen (Inhalte, Ansichten, zuletzt die Versionslisten) und ein
+        fsync pro betroffenem Ordner.
+
+        Gibt die Anzahl übernommener Dateien zurück. Bei OSError werden die Versionslisten
+        neu von der Platte gelesen; noch nicht gelistete Versionen speichert der nächste
+        `save_plan` erneut.
+        """
+        with self._lock:
+            staged, self._staged = self._staged, {}
+            links, self._links = self._links, {}
+            saved, self._saved = self._saved, []
+            if not staged and not links:
+                return 0
+            versions_dir = os.path.join(self.plans_dir, VERSIONS_DIR) + os.sep
+            lists = {path: tmp_path for path, tmp_path in staged.items() if path.startswith(versions_dir)}
+            try:
+                with track_stage("file_sync"):
+                    for tmp_path in staged.values():
+                        _fsync_file(tmp_path)
+                    for path, tmp_path in staged.items():
+                        if path not in lists:
+                            os.replace(tmp_path, path)
+                            self._written.add(path)
+                    for view_path, object_path in links.items():
+                        _link_view(view_path, object_path)
+                        self._written.add(view_path)
+                    for path, tmp_path in lists.items():
+                        os.replace(tmp_path, path)
+                        self._written.add(path)
+                    for directory in {os.path.dirname(path) for path in (*staged, *links)}:
+                        _fsync_dir(directory)
+            except OSError:
+                # Versionslisten im Speicher passen nicht mehr zur Platte: neu lesen
+                self._versions = {}
+                _remove_files([*staged.values(), *(path + TMP_SUFFIX for path in links)])
+                raise
+            self._flushed.extend(saved)
+            return len(staged) + len(links)
+
+    def take_flushed(self) -> list:
+        """Gibt die seit dem letzten Aufruf übernommenen Versionen zurück
+        ({"date", "source", "title", "version"}, in Speicherreihenfolge)."""
+        with self._lock:
+            flushed, self._flushed = self._flushed, []
+            return flushed
+
+    def take_written(self) -> set:
+        """Gibt die seit dem letzten Aufruf übernommenen Dateien zurück (absolute Pfade)."""
+        with self._lock:
+            written, self._written = self._written, set()
+            return written
+
+    def reset_index(self):
+        """Vergisst Versionslisten und vorbereitete Dateien, z.B. nachdem git das
+        Arbeitsverzeichnis ersetzt hat; die Listen werden danach neu gelesen."""
+        with self._lock:
+            for tmp_path in self._staged.values():
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            self._staged = {}
+            self._links = {}
+            self._versions = {}
+            self._written = set()
+            self._saved = []
+            self._flushed = []
+
+
+def _fsync_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _link_view(view_path, object_path):
+    """Zeigt die Ansicht per Hardlink auf das Objekt (atomar über <view>.tmp)."""
+    if os.path.exists(view_path) and os.path.samefile(view_path, object_path):
+        return
+    tmp_path = view_path + TMP_SUFFIX
+    _remove_files([tmp_path])
+    try:
+        os.link(object_path, tmp_path)
+    except OSError:
+        # Dateisystem ohne Hardlinks: Kopie
+        shutil.copyfile(object_path, tmp_path)
+        _fsync_file(tmp_path)
+    os.replace(tmp_path, view_path)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Temporäre Plan-Datei konnte nicht entfernt werden: {e}")
+
+
+def _fsync_dir(directory):
+    # Macht Umbenennungen im Ordner dauerhaft (auf Windows nicht möglich/nötig)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,245 @@
+import random
+import re
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from config import Config
+from utils import logger
+
+WEEKDAYS = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+
+# z.B. "Mo-Fr 06:00-08:00=60"
+_WINDOW_PATTERN = re.compile(
+    r"^(?P<days>\*|[A-Za-z]{2}(?:-[A-Za-z]{2})?(?:/[A-Za-z]{2}(?:-[A-Za-z]{2})?)*)\s+"
+    r"(?P<start>\d{1,2}:\d{2})-(?P<end>\d{1,2}:\d{2})\s*=\s*(?P<interval>\d+)$"
+)
+
+# Kürzestes Warten zwischen zwei Zyklen (auch nach einem überlangen Zyklus)
+MIN_DELAY = 5.0
+
+
+def _parse_days(spec: str) -> frozenset:
+    if spec == "*":
+        return frozenset(range(7))
+    days = set()
+    for part in spec.split("/"):
+        names = part.split("-")
+        try:
+            indices = [WEEKDAYS.index(name.capitalize()) for name in names]
+        except ValueError:
+            raise ValueError(f"Unbekannter Wochentag in '{spec}' (erlaubt: {', '.join(WEEKDAYS)})")
+        if len(indices) == 1:
+            days.add(indices[0])
+        else:
+            first, last = indices
+            day = first
+            while True:
+                days.add(day)
+                if day == last:
+                    break
+                day = (day + 1) % 7
+    return frozenset(days)
+
+
+def _parse_minutes(value: str) -> int:
+    hours, minutes = (int(part) for part in value.split(":"))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f"Ungültige Uhrzeit: {value}")
+    return hours * 60 + minutes
+
+
+class PollingWindow:
+    """Zeitfenster mit eigenem Abrufintervall, z.B. werktags 06:00-08:00 jede Minute."""
+
+    def __init__(self, days, start_minute, end_minute, interval):
+        self.days = days
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+        self.interval = interval
+
+    def contains(self, weekday: int, minute: int) -> bool:
+        if self.start_minute <= self.end_minute:
+            return weekday in self.days and self.start_minute <= minute < self.end_minute
+        # Über Mitternacht (z.B. 22:00-06:00): der Morgen gehört zum Vortag
+        if minute >= self.start_minute:
+            return weekday in self.days
+        return minute < self.end_minute and (weekday - 1) % 7 in self.days
+
+
+def parse_timetable(spec: str) -> list:
+    """Liest einen Zeitplan wie 'Mo-Fr 06:00-08:00=60, Sa/So 10:00-18:00=900'.
+
+    Pro Eintrag: Wochentage (Mo..So, Bereiche mit '-', mehrere mit '/', '*' = alle),
+    Uhrzeitfenster und Intervall in Sekunden. Bei Überschneidungen gewinnt der erste Eintrag.
+    """
+    windows = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        match = _WINDOW_PATTERN.match(entry)
+        if not match:
+            raise ValueError(f"Ungültiger Zeitplan-Eintrag: '{entry}'")
+        interval = int(match.group("interval"))
+        if interval <= 0:
+            raise ValueError(f"Intervall muss größer als 0 sein: '{entry}'")
+        windows.append(
+            PollingWindow(
+                _parse_days(match.group("days")),
+                _parse_minutes(match.group("start")),
+                _parse_minutes(match.group("end")),
+                interval,
+            )
+        )
+    return windows
+
+
+def parse_holidays(spec: str) -> list:
+    """Liest Ferien/Feiertage wie '2026-12-21:2027-01-06, 2027-05-01' als (von, bis)-Paare."""
+    ranges = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        first, _, last = entry.partition(":")
+        try:
+            start = date.fromisoformat(first.strip())
+            end = date.fromisoformat(last.strip()) if last else start
+        except ValueError:
+            raise ValueError(f"Ungültiger Ferien-Eintrag: '{entry}' (Format JJJJ-MM-TT[:JJJJ-MM-TT])")
+        ranges.append((start, end))
+    return ranges
+
+
+class Scheduler(ABC):
+    """Bestimmt, wie lange bis zum nächsten Abrufzyklus gewartet wird."""
+
+    @abstractmethod
+    def next_delay(self, now: datetime, cycle_duration: float, changed: bool) -> float:
+        """Wartezeit in Sekunden nach einem Zyklus, gezählt ab dessen Ende."""
+
+
+class FixedMinuteScheduler(Scheduler):
+    """Bisheriges Verhalten: Abruf zu jeder vollen Minute."""
+
+    def next_delay(self, now, cycle_duration, changed):
+        return 60 - now.second - now.microsecond / 1_000_000
+
+
+class AdaptiveScheduler(Scheduler):
+    """Abrufintervall nach Zeitplan, mit Zufallsversatz und Backoff bei ruhigen Phasen.
+
+    - Das Intervall kommt aus dem ersten passenden Zeitfenster, sonst gilt `idle_interval`.
+      Ferien/Feiertage werden wie Sonntage behandelt.
+    - Nach `backoff_after` Zyklen ohne Änderung wächst das Intervall pro Zyklus um
+      `backoff_factor`, höchstens auf das `backoff_max_factor`-fache bzw. `max_interval`;
+      eine Änderung oder ein Wechsel des Zeitfensters setzt es zurück.
+    - Der Abstand wird zufällig um ±`jitter` (Anteil) verschoben, damit nicht alle
+      Clients zur gleichen Sekunde abrufen.
+    - Beginnt vor dem nächsten Abruf ein dichteres Zeitfenster, wird zu dessen Beginn abgerufen.
+    - Das Intervall zählt von Zyklusbeginn zu Zyklusbeginn; dauert ein Zyklus länger,
+      wird das gemeldet und nach einer kurzen Pause weitergemacht.
+    """
+
+    def __init__(
+        self,
+        windows,
+        idle_interval,
+        jitter=0.1,
+        backoff_after=5,
+        backoff_factor=2.0,
+        backoff_max_factor=4.0,
+        max_interval=3600,
+        holidays=(),
+        rng=None,
+    ):
+        self.windows = list(windows)
+        self.idle_interval = idle_interval
+        self.jitter = jitter
+        self.backoff_after = backoff_after
+        self.backoff_factor = backoff_factor
+        self.backoff_max_factor = backoff_max_factor
+        self.max_interval = max_interval
+        self.holidays = list(holidays)
+        self._rng = rng or random.Random()
+        self.unchanged_cycles = 0
+        self.overruns = 0
+        self._last_base_interval = None
+
+    def _weekday(self, moment: datetime) -> int:
+        day = moment.date()
+        if any(start <= day <= end for start, end in self.holidays):
+            return 6  # wie Sonntag
+        return moment.weekday()
+
+    def base_interval(self, moment: datetime) -> float:
+        """Intervall laut Zeitplan (ohne Backoff und Zufallsversatz)."""
+        minute = moment.hour * 60 + moment.minute
+        weekday = self._weekday(moment)
+        for window in self.windows:
+            if window.contains(weekday, minute):
+                return window.interval
+        return self.idle_interval
+
+    def _next_denser_start(self, now: datetime, horizon: float) -> float | None:
+        """Sekunden bis zum Beginn eines Zeitfensters mit kürzerem Intervall (innerhalb `horizon`)."""
+        current = self.base_interval(now)
+        # Minutengenau vorausschauen; Zeitfenster beginnen immer zu vollen Minuten
+        start = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        moment = start
+        end = now + timedelta(seconds=horizon)
+        while moment < end:
+            if self.base_interval(moment) < current:
+                return (moment - now).total_seconds()
+            moment += timedelta(minutes=1)
+        return None
+
+    def _interval(self, now: datetime) -> float:
+        interval = self.base_interval(now)
+        excess = self.unchanged_cycles - self.backoff_after
+        if excess >= 0:
+            factor = min(self.backoff_factor ** (excess + 1), self.backoff_max_factor)
+            interval = max(interval, min(interval * factor, self.max_interval))
+        return interval
+
+    def next_delay(self, now, cycle_duration, changed):
+        base_interval = self.base_interval(now)
+        if changed or base_interval != self._last_base_interval:
+            self.unchanged_cycles = 0
+        else:
+            self.unchanged_cycles += 1
+        self._last_base_interval = base_interval
+
+        interval = self._interval(now)
+        if cycle_duration > interval:
+            self.overruns += 1
+            logger.warning(
+                f"Abrufzyklus dauerte {cycle_duration:.1f}s und damit länger als das Intervall "
+                f"({interval:.0f}s). Nächster Zyklus nach kurzer Pause."
+            )
+            return MIN_DELAY
+
+        delay = interval * (1 + self._rng.uniform(-self.jitter, self.jitter)) - cycle_duration
+
+        denser = self._next_denser_start(now, delay)
+        if denser is not None:
+            # Kleiner Versatz, damit nicht exakt zur vollen Minute abgerufen wird
+            delay = denser + self._rng.uniform(0, min(30.0, self.jitter * interval))
+
+        return max(MIN_DELAY, delay)
+
+
+def create_scheduler(timetable=None, holidays=None) -> Scheduler:
+    """Erstellt den in der Konfiguration gewählten Scheduler (POLL_SCHEDULER).
+
+    `timetable`/`holidays` ersetzen POLL_TIMETABLE/POLL_HOLIDAYS (z.B. pro Schule).
+    """
+    mode = Config.POLL_SCHEDULER.lower()
+    if mode == "minute":
+        return FixedMinuteScheduler()
+    if mode != "adaptive":
+        raise ValueError(f"Unbekannter POLL_SCHEDULER '{Config.POLL_SCHEDULER}' (adaptive oder minute)")
+
+    return AdaptiveScheduler(
+        parse_timetable(timetable or Config.POLL_TIMETABLE),
+        idle_interval=Config.POLL_IDLE_INTERVAL,
+        jitter=Config.POLL_JITTER,
+        backoff_after=Config.POLL_BACKOFF_AFTER,
+        backoff_factor=Config.POLL_BACKOFF_FACTOR,
+        backoff_max_factor=Config.POLL_BACKOFF_MAX_FACTOR,
+        max_interval=Config.POLL_MAX_INTERVAL,
+        holidays=parse_holidays(Config.POLL_HOLIDAYS if holidays is None else holidays),
+    )
@@ -0,0 +1,379 @@
+"""Suchindex über das Plan-Archiv (SQLite, Volltext per FTS5).
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python search_index.py backfill [--tenant NAME]
+    python search_index.py suche --klasse 7b --von 2026-09-01 --bis 2027-01-31
+    python search_index.py suche --lehrer Müller --art Entfall [--json]
+
+Der Bot aktualisiert den Index nach jedem übernommenen Plan (SEARCH_INDEX=1).
+`backfill` baut ihn einmalig aus dem vorhandenen Archiv auf; spätere Aufrufe lesen
+nur Tage nach, deren Pläne sich seitdem geändert haben.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from config import Config
+from utils import logger
+from metrics import track_stage
+from plan_document import ParsedPlan
+from plan_rows import SubstitutionRow, rows_from_dicts
+from plan_store import OBJECTS_DIR, VERSIONS_DIR, PlanStore
+
+# Durchsuchbare Spalten (Reihenfolge wie SubstitutionRow.FIELDS)
+COLUMNS = SubstitutionRow.FIELDS
+# Ansichten aus der Zeit vor dem Versionsindex (YYYY-MM-DD.html, YYYY-MM-DD_2.html, ...)
+_VIEW_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:_\d+)?\.html$")
+_LEGACY_PREFIX = "legacy:"
+
+
+class PlanSearchIndex:
+    """Vertretungszeilen aller Pläne, durchsuchbar nach Datum, Klasse, Stunde, Lehrer,
+    Fach, Raum und Art.
+
+    Pro Tag und Quelle (siehe PlanStore) ist die aktuelle Version indiziert; eine
+    neue Version ersetzt die Zeilen der alten. Ohne FTS5 im SQLite des Systems wird
+    mit LIKE gesucht (langsamer, Teilwort-Treffer).
+    """
+
+    def __init__(self, db_file):
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_plans (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT,
+                    html_hash TEXT,
+                    UNIQUE (date, source)
+                )
+                """
+            )
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS plan_rows (
+                    id INTEGER PRIMARY KEY,
+                    plan_id INTEGER NOT NULL REFERENCES indexed_plans(id) ON DELETE CASCADE,
+                    date TEXT NOT NULL,
+                    {", ".join(f"{column} TEXT" for column in COLUMNS)}
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS plan_rows_date ON plan_rows (date)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS plan_rows_plan ON plan_rows (plan_id)")
+        self.fts = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        columns = ", ".join(COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in COLUMNS)
+        try:
+            with self._conn:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'plan_rows_fts'"
+                ).fetchone()
+                self._conn.execute(
+                    f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS plan_rows_fts USING fts5(
+                        {columns}, content='plan_rows', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                    """
+                )
+                self._conn.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS plan_rows_ai AFTER INSERT ON plan_rows BEGIN
+                        INSERT INTO plan_rows_fts (rowid, {columns}) VALUES (new.id, {new_values});
+                    END
+                    """
+                )
+                self._conn.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS plan_rows_ad AFTER DELETE ON plan_rows BEGIN
+                        INSERT INTO plan_rows_fts (plan_rows_fts, rowid, {columns})
+                        VALUES ('delete', old.id, {old_values});
+                    END
+                    """
+                )
+                if not exists:
+                    # Zeilen aus einer Zeit ohne FTS5 nachtragen
+                    self._conn.execute("INSERT INTO plan_rows_fts (plan_rows_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite ohne FTS5 ({e}), Suche nutzt LIKE.")
+            return False
+
+    # --- Aktualisieren ---
+
+    def indexed_hash(self, date_str: str, source: str) -> str | None:
+        """Inhalts-Hash der indizierten Version von (Tag, Quelle) oder None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html_hash FROM indexed_plans WHERE date = ? AND source = ?", (date_str, source)
+            ).fetchone()
+        return row[0] if row else None
+
+    def index_plan(self, date_str: str, source: str, title: str, rows, html_hash: str | None = None):
+        """Ersetzt die Zeilen von (Tag, Quelle) durch `rows` (SubstitutionRow).
+
+        `source` ist die Kurz-ID aus PlanStore.source_id (über Uploads hinweg stabil, eine
+        neue Version ersetzt also die Zeilen der alten). Eine echte Quelle ersetzt dabei
+        die Einträge alter Ansichten desselben Tages (aus dem Backfill).
+        """
+        with self._lock, self._conn:
+            if not source.startswith(_LEGACY_PREFIX):
+                self._conn.execute(
+                    "DELETE FROM indexed_plans WHERE date = ? AND source LIKE ?",
+                    (date_str, _LEGACY_PREFIX + "%"),
+                )
+            self._conn.execute(
+                "DELETE FROM indexed_plans WHERE date = ? AND source = ?", (date_str, source)
+            )
+            plan_id = self._conn.execute(
+                "INSERT INTO indexed_plans (date, source, title, html_hash) VALUES (?, ?, ?, ?)",
+                (date_str, source, title, html_hash),
+            ).lastrowid
+            self._conn.executemany(
+                f"INSERT INTO plan_rows (plan_id, date, {', '.join(COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in COLUMNS)})",
+                [(plan_id, date_str) + tuple(getattr(row, column) for column in COLUMNS) for row in rows],
+            )
+
+    def index_version(self, plans_dir, date_str: str, source: str, title: str, version: dict) -> bool:
+        """Indiziert eine übernommene Version aus dem Archiv (Eintrag der Versionsliste).
+
+        Gibt False zurück, wenn ihre Dateien nicht gelesen werden konnten.
+        """
+        rows = _load_object_rows(plans_dir, date_str, version)
+        if rows is None:
+            return False
+        self.index_plan(date_str, source, title, rows, version["html"])
+        return True
+
+    def backfill(self, plans_dir) -> int:
+        """Indiziert das vorhandene Archiv; bereits aktuelle Tage werden übersprungen.
+
+        Gibt die Anzahl neu indizierter Pläne zurück.
+        """
+        count = 0
+        versioned_dates = set()
+        with track_stage("search_backfill"):
+            for versions_file in sorted(glob.glob(os.path.join(plans_dir, VERSIONS_DIR, "*", "*.json"))):
+                try:
+                    with open(versions_file, "r", encoding="utf-8") as f:
+                        versions = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Versionsliste {versions_file} übersprungen: {e}")
+                    continue
+                date_str = versions["date"]
+                versioned_dates.add(date_str)
+                for entry in versions["sources"]:
+                    if not entry["versions"]:
+                        continue
+                    current = entry["versions"][-1]
+                    if self.indexed_hash(date_str, entry["source"]) == current["html"]:
+                        continue
+                    if self.index_version(plans_dir, date_str, entry["source"], entry.get("title"), current):
+                        count += 1
+
+            # Ansichten ohne Versionsliste (Archiv aus der Zeit davor)
+            for name in sorted(os.listdir(plans_dir)) if os.path.isdir(plans_dir) else []:
+                match = _VIEW_PATTERN.match(name)
+                if not match or match.group(1) in versioned_dates:
+                    continue
+                date_str = match.group(1)
+                path = os.path.join(plans_dir, name)
+                with open(path, "rb") as f:
+                    data = f.read()
+                html_hash = PlanStore.content_hash(data)
+                source = _LEGACY_PREFIX + name
+                if self.indexed_hash(date_str, source) == html_hash:
+                    continue
+                plan = ParsedPlan(data.decode("utf-8", errors="replace"))
+                self.index_plan(date_str, source, plan.title, plan.rows, html_hash)
+                count += 1
+        return count
+
+    # --- Suchen ---
+
+    def search(
+        self,
+        klasse=None,
+        lehrer=None,
+        stunde=None,
+        fach=None,
+        raum=None,
+        art=None,
+        text=None,
+        date_from=None,
+        date_to=None,
+        limit=500,
+    ) -> list:
+        """Vertretungszeilen, die alle angegebenen Kriterien erfüllen, nach Datum und Stunde.
+
+        `lehrer` sucht in Vertreter und (Lehrer), `fach` in Fach und (Fach), `text` in
+        allen Spalten; Datumsgrenzen im Format YYYY-MM-DD (jeweils einschließlich).
+        Gleiche Zeilen aus mehreren Plänen eines Tages erscheinen nur einmal.
+        """
+        criteria = [
+            (("klassen",), klasse),
+            (("vertreter", "lehrer_alt"), lehrer),
+            (("stunde",), stunde),
+            (("fach", "fach_alt"), fach),
+            (("raum",), raum),
+            (("art",), art),
+            (COLUMNS, text),
+        ]
+        criteria = [(columns, value) for columns, value in criteria if value]
+
+        where = []
+        params = []
+        if criteria and self.fts:
+            where.append("r.id IN (SELECT rowid FROM plan_rows_fts WHERE plan_rows_fts MATCH ?)")
+            params.append(" AND ".join(
+                "{" + " ".join(columns) + "} : " + _fts_phrase(value) for columns, value in criteria
+            ))
+        else:
+            for columns, value in criteria:
+                where.append("(" + " OR ".join(f"r.{column} LIKE ?" for column in columns) + ")")
+                params += [f"%{value}%"] * len(columns)
+        if date_from:
+            where.append("r.date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("r.date <= ?")
+            params.append(date_to)
+
+        fields = ", ".join(f"r.{column}" for column in COLUMNS)
+        sql = (
+            f"SELECT r.date, {fields}, MIN(p.title) FROM plan_rows r "
+            "JOIN indexed_plans p ON p.id = r.plan_id "
+            + (f"WHERE {' AND '.join(where)} " if where else "")
+            + f"GROUP BY r.date, {fields} ORDER BY r.date, CAST(r.stunde AS INTEGER), r.stunde LIMIT ?"
+        )
+        params.append(limit)
+        with track_stage("search_query"), self._lock:
+            result = self._conn.execute(sql, params).fetchall()
+
+        rows = []
+        for values in result:
+            row = {"date": values[0], "title": values[-1]}
+            row.update({column: value for column, value in zip(COLUMNS, values[1:-1]) if value is not None})
+            rows.append(row)
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _fts_phrase(value: str) -> str:
+    # Als Phrase quoten: Sonderzeichen ("-", ":", "*") sind dann keine FTS-Operatoren
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _load_object_rows(plans_dir, date_str, version) -> list | None:
+    """Zeilen einer Version: aus dem JSON-Objekt, sonst aus dem HTML-Objekt geparst."""
+    month_dir = os.path.join(plans_dir, OBJECTS_DIR, date_str[:7])
+    try:
+        if version.get("json"):
+            with open(os.path.join(month_dir, f"{version['json']}.json"), "r", encoding="utf-8") as f:
+                return rows_from_dicts(json.load(f)["rows"])
+        with open(os.path.join(month_dir, f"{version['html']}.html"), "r", encoding="utf-8") as f:
+            return ParsedPlan(f.read()).rows
+    except FileNotFoundError:
+        # Z.B. außerhalb der Sparse-Checkout-Monate
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Plan vom {date_str} konnte nicht indiziert werden: {e}")
+        return None
+
+
+def _print_rows(rows):
+    for row in rows:
+        print("  ".join([
+            row["date"],
+            (row.get("stunde") or "").ljust(5),
+            (row.get("klassen") or "").ljust(12),
+            (row.get("vertreter") or "").ljust(10),
+            (row.get("fach") or "").ljust(6),
+            (row.get("raum") or "").ljust(6),
+            (row.get("art") or "").ljust(12),
+            row.get("text") or "",
+        ]).rstrip())
+    print(f"{len(rows)} Treffer")
+
+
+def _resolve_tenant(name):
+    from tenants import Tenant, load_tenants
+
+    if not name:
+        return Tenant.from_config()
+    if not Config.TENANTS_FILE:
+        raise SystemExit("--tenant braucht TENANTS_FILE in der .env.")
+    for tenant in load_tenants(Config.TENANTS_FILE):
+        if tenant.name == name:
+            return tenant
+    raise SystemExit(f"Unbekannte Schule: {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenant", help="Schule aus TENANTS_FILE (Standard: Einzelbetrieb)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="Index aus dem vorhandenen Archiv aufbauen/ergänzen")
+    search = commands.add_parser("suche", help="Vertretungen suchen")
+    search.add_argument("--klasse")
+    search.add_argument("--lehrer", help="Vertreter oder vertretene Lehrkraft")
+    search.add_argument("--stunde")
+    search.add_argument("--fach")
+    search.add_argument("--raum")
+    search.add_argument("--art", help="z.B. Entfall, Vertretung, Raum-Vtr.")
+    search.add_argument("--text", help="Volltext über alle Spalten")
+    search.add_argument("--von", help="Ab Datum (YYYY-MM-DD)")
+    search.add_argument("--bis", help="Bis Datum (YYYY-MM-DD)")
+    search.add_argument("--limit", type=int, default=500)
+    search.add_argument("--json", action="store_true", help="Treffer als JSON ausgeben")
+    args = parser.parse_args()
+
+    tenant = _resolve_tenant(args.tenant)
+    index = PlanSearchIndex(tenant.search_index_db)
+    try:
+        if args.command == "backfill":
+            count = index.backfill(tenant.plans_dir)
+            print(f"{count} Pläne indiziert ({tenant.search_index_db}).")
+            return
+        rows = index.search(
+            klasse=args.klasse,
+            lehrer=args.lehrer,
+            stunde=args.stunde,
+            fach=args.fach,
+            raum=args.raum,
+            art=args.art,
+            text=args.text,
+            date_from=args.von,
+            date_to=args.bis,
+            limit=args.limit,
+        )
+        if args.json:
+            json.dump(rows, sys.stdout, ensure_ascii=False, indent=1)
+            print()
+        else:
+            _print_rows(rows)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from utils import logger
+
+
+class PlanStateStore:
+    """Persistenter Zustand der zuletzt gesehenen Pläne pro Client (SQLite).
+
+    Ersetzt den reinen In-Memory-Zustand, damit der erste Zyklus nach einem
+    Neustart nicht alle Pläne als neu behandelt. Nach jedem Zyklus werden nur
+    die geänderten bzw. entfernten Einträge geschrieben.
+
+    Mit `namespace` teilen sich mehrere Schulen bzw. Instanzen eine Datei (z.B. die
+    gemeinsame LEASE_DB); `wal=False` behält dann das Rollback-Journal der Lease-Datei bei.
+    """
+
+    def __init__(self, db_file, namespace="", wal=True):
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        if wal:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plan_state (
+                client TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (client, key)
+            )
+            """
+        )
+        self._conn.commit()
+        # Zuletzt geschriebene Hashes pro Client, um nur Änderungen zu schreiben
+        self._known_hashes = {}
+
+    def _client(self, client_name: str) -> str:
+        return f"{self.namespace}/{client_name}" if self.namespace else client_name
+
+    @staticmethod
+    def _hash(data_json: str) -> str:
+        return hashlib.sha256(data_json.encode("utf-8")).hexdigest()
+
+    def load(self, client_name: str) -> dict:
+        """Lädt den gespeicherten Zustand eines Clients als {key: plan_data}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, data, hash FROM plan_state WHERE client = ?", (self._client(client_name),)
+            ).fetchall()
+
+        plans = {}
+        hashes = {}
+        for key, data_json, digest in rows:
+            plans[key] = json.loads(data_json)
+            hashes[key] = digest
+        self._known_hashes[client_name] = hashes
+
+        logger.info(f"Gespeicherter Zustand für {client_name}: {len(plans)} Pläne geladen.")
+        return plans
+
+    def save(self, client_name: str, plans: dict):
+        """Gleicht den gespeicherten Zustand inkrementell mit `plans` ab."""
+        known = self._known_hashes.setdefault(client_name, {})
+
+        upserts = []
+        new_hashes = {}
+        for key, data in plans.items():
+            data_json = json.dumps(data, ensure_ascii=False, sort_keys=True)
+            digest = self._hash(data_json)
+            new_hashes[key] = digest
+            if known.get(key) != digest:
+                upserts.append((self._client(client_name), key, data_json, digest))
+
+        removed = [(self._client(client_name), key) for key in known if key not in plans]
+
+        if not upserts and not removed:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO plan_state (client, key, data, hash) VALUES (?, ?, ?, ?)",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM plan_state WHERE client = ? AND key = ?", removed
+            )
+        self._known_hashes[client_name] = new_hashes
+
+        logger.debug(
+            f"Zustand für {client_name} gespeichert: {len(upserts)} geändert, {len(removed)} entfernt."
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,11 +1,46 @@
 from config import Config
+import os
 import re
+import threading
 from typing import List
-from bs4 import BeautifulSoup
+from bs4.formatter import HTMLFormatter
 from utils import logger
-
-def ConvertTeacherToStudent(teacher_html: str) -> List[str]:
-    """Konvertiert einen Lehrerplan (HTML-String) in eine Liste von Schülerplänen (HTML-Strings).
+from plan_document import ParsedPlan
+from plan_renderer import PlanTemplate
+
+TEMPLATE_FILE = os.path.join(Config.BASE_DIR, 'plan_style.html')
+
+NEW_HEADERS = ["Klasse(n)", "Stunde", "Vertreter", "(Lehrer)", "Fach", "Raum", "(Fach)", "Art", "Text"]
+SPECIAL_CLASSES = {"E1", "E2", "Q1", "Q2", "Q3", "Q4", "AG"}  # AG jetzt ans Ende
+ALLOWED_ART = {
+    "Vertretung",
+    "Entfall",
+    "Lehrertausch",
+    "Verlegung",
+    "Unterricht geändert",
+    "Sondereins.",
+    "Raum-Vtr.",
+    "Tausch"
+}
+COLUMN_MAPPING = [2, 1, 0, 5, 3, 4, 3, 7, 8]  # Mapping der Spalten
+ENTFALL_MASKED_COLUMNS = {2, 4, 5}  # neue Spalten 2,4,5
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def _get_template() -> PlanTemplate:
+    """Lädt und kompiliert 'plan_style.html' einmalig (relativ zum Projektordner, nicht zum CWD)."""
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = PlanTemplate(TEMPLATE_FILE)
+            logger.debug(f"Plan-Vorlage geladen: {TEMPLATE_FILE}")
+        return _template
+
+
+def ConvertTeacherToStudent(teacher_html: str) -> List[ParsedPlan]:
+    """Konvertiert einen Lehrerplan (HTML-String) in eine Liste von Schülerplänen.
     
     Lieste den Inhalt von 'plan_style.html', extrahiert den Inhalt aller 
     <body>-Tags aus dem Eingabestring und fügt ihn mit dem Header und dem abschließenden 
@@ -15,29 +50,22 @@ def ConvertTeacherToStudent(teacher_html: str) -> List[str]:
         teacher_html: Der komplette HTML-String des Lehrerplans.
 
     Returns:
-        Eine Liste von HTML-Strings, wobei jeder String ein vollständiger Schülerplan ist.
+        Eine Liste von ParsedPlan-Objekten (je ein vollständiger Schülerplan), deren
+        Titel und Datum bereits beim Umbau der Tabelle mitgeparst wurden.
     """
     
-    # 1. Lese den Inhalt von 'plan_style.html' (muss im selben Verzeichnis liegen)
-    file_path = 'plan_style.html'
-    template_header = ""
-    
+    # 1. Vorlage 'plan_style.html' (einmalig geladen und vorkompiliert)
     try:
-        # Annahme: plan_style.html enthält den HTML-Header bis einschließlich des öffnenden <body>-Tags.
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Entferne eventuelle Whitespaces am Ende, falls der Body-Tag direkt am Ende steht
-            template_header = f.read().strip() 
+        template = _get_template()
     except FileNotFoundError:
         # Wichtiger Hinweis: Ohne diese Datei kann die Konvertierung nicht funktionieren.
-        print(f"Fehler: Die Vorlagendatei '{file_path}' wurde nicht gefunden.")
+        logger.error(f"Fehler: Die Vorlagendatei '{TEMPLATE_FILE}' wurde nicht gefunden.")
         return []
     except Exception as e:
-        print(f"Fehler beim Lesen der Datei '{file_path}': {e}")
+        logger.error(f"Fehler beim Lesen der Datei '{TEMPLATE_FILE}': {e}")
         return []
 
-    # 2. Definiere den abschließenden Tag
-    # Wir fügen </body> hinzu, um wohlgeformtes HTML zu gewährleisten, da der Header mit <body> endet.
-    template_footer = '\n\n</body>\n</html>'
+    # 2. Der abschließende Teil ('</body></html>') wird von der Vorlage angehängt.
     
     # 3. Regulärer Ausdruck zur Extraktion des Inhalts zwischen <body> und </body> (nicht-gierig)
     # re.DOTALL ist notwendig, damit '.' über Zeilenumbrüche hinweg matched.
@@ -46,47 +74,123 @@ def ConvertTeacherToStudent(teacher_html: str) -> List[str]:
     # Finde alle Übereinstimmungen und extrahiere den Inhalt
     body_contents = body_content_pattern.findall(teacher_html)
     
-    # 4. Erstelle die neuen HTML-Strings
-    student_plans: List[str] = []
-    
-    for content in body_contents:
-        # Aufbau: template_header (enthält <body>) + extrahierter_Inhalt + template_footer (enthält </body></html>)
-        # Die trim-Operation stellt sicher, dass unnötige Whitespaces um den Inhalt entfernt werden.
-        new_plan = template_header + content.strip() + template_footer
-        student_plans.append(new_plan)
-        
-    #return student_plans
-    
-    transformed_plans = [_restructure_mon_list_table(plan) for plan in student_plans]
-    return transformed_plans
+    # 4. Erstelle die neuen Pläne
+    # Aufbau: Vorlagen-Header (enthält <body>) + extrahierter_Inhalt + '</body></html>'
+    # Die trim-Operation stellt sicher, dass unnötige Whitespaces um den Inhalt entfernt werden.
+    return [_render_student_plan(template, content.strip()) for content in body_contents]
 
 
 
+class _UnconvertibleRows(Exception):
+    """Die Tabellenzeilen lassen sich nicht umbauen (z.B. nicht vergleichbare Sortierschlüssel)."""
 
 
-import re
-from bs4 import BeautifulSoup
-
-def _restructure_mon_list_table(html_string: str) -> str:
-    NEW_HEADERS = ["Klasse(n)", "Stunde", "Vertreter", "(Lehrer)", "Fach", "Raum", "(Fach)", "Art", "Text"]
-    SPECIAL_CLASSES = {"E1", "E2", "Q1", "Q2", "Q3", "Q4", "AG"}  # AG jetzt ans Ende
-    ALLOWED_ART = {
-        "Vertretung",
-        "Entfall",
-        "Lehrertausch",
-        "Verlegung",
-        "Unterricht geändert",
-        "Sondereins.",
-        "Raum-Vtr.",
-        "Tausch"
-    }
+def _render_student_plan(template: PlanTemplate, body_content: str) -> ParsedPlan:
+    """Rendert einen Schülerplan direkt als String (gleiche Ausgabe wie der Soup-Umbau).
 
+    Fällt bei Fehlern auf _restructure_mon_list_table zurück.
+    """
     try:
-        soup = BeautifulSoup(html_string, 'html.parser')
+        return template.render(body_content, _render_student_tbody)
+    except _UnconvertibleRows:
+        # Wie beim Soup-Umbau: Zeilen nicht konvertierbar, Plan bleibt unverändert
+        return ParsedPlan(template.wrap(body_content))
+    except Exception as e:
+        logger.debug(f"Direktes Rendern fehlgeschlagen, nutze BeautifulSoup: {e}")
+        return _restructure_mon_list_table(ParsedPlan(template.wrap(body_content)))
+
+
+def _klassen_key(row):
+    """Sortierschlüssel nach Original-Klasse (Spalte 2)."""
+    klasse = row[2].replace("(", "").replace(")", "").strip()
+    if not klasse or klasse == "":
+        return (float('inf'), float('inf'), klasse)  # leere Klasse ans Ende
+    if klasse in SPECIAL_CLASSES:
+        return (float('inf'), klasse, klasse)  # Sonderklassen ans Ende
+    match = re.match(r"(\d+)?([a-zA-Z]*)", klasse)
+    if match:
+        num_part = int(match.group(1)) if match.group(1) else 0
+        letter_part = match.group(2)
+        return (num_part, letter_part, klasse)
+    return (float('inf'), klasse, klasse)
+
+
+def _build_student_rows(table_data: List[List[str]]) -> List[List[str]]:
+    """Filtert, sortiert und mappt die Zeilen des Lehrerplans auf die Schülerspalten."""
+    # Filter: nur erlaubte Art
+    data_rows = table_data[1:]  # Header ausschließen
+    data_rows = [
+        row for row in data_rows
+        if len(row) >= 8 and row[7] in ALLOWED_ART
+    ]
+    # Zeilen müssen genügend Spalten für Mapping haben
+    data_rows = [row for row in data_rows if len(row) >= max(COLUMN_MAPPING)+1]
+
+    data_rows.sort(key=_klassen_key)
+
+    student_rows = []
+    for row_data in data_rows:
+        student_row = []
+        for col_idx, i in enumerate(COLUMN_MAPPING):
+            # Bei Art "Entfall" bestimmte Spalten auf "---" setzen
+            if row_data[7] == "Entfall" and col_idx in ENTFALL_MASKED_COLUMNS:
+                student_row.append("---")
+            else:
+                student_row.append(row_data[i])
+        student_rows.append(student_row)
+    return student_rows
+
+
+_escape = HTMLFormatter.REGISTRY["minimal"].substitute
+
+# Vorgefertigte Kopfzeile; entspricht der Ausgabe von soup.new_tag(...) nach str(soup)
+_HEADER_ROW_HTML = '<tr class="list">' + ''.join(
+    f'<th align="center" class="list"><b>{_escape(header_text)}</b></th>' if header_text == "Klasse(n)"
+    else f'<th align="center" class="list">{_escape(header_text)}</th>'
+    for header_text in NEW_HEADERS
+) + '</tr>'
+
+
+def _render_student_tbody(table_data: List[List[str]]) -> tuple[str, List[List[str]]]:
+    """Schreibt das neue tbody aus den Zeilen des Lehrerplans direkt in einen String-Puffer.
+
+    Gibt zusätzlich die Zeilen der neuen Tabelle (inkl. Kopfzeile) zurück.
+    """
+    try:
+        student_rows = _build_student_rows(table_data)
+    except Exception as e:
+        raise _UnconvertibleRows(e) from e
+
+    parts = ['<tbody>', _HEADER_ROW_HTML]
+    for idx, student_row in enumerate(student_rows):
+        tr_class = "list odd" if idx % 2 == 0 else "list even"
+        parts.append(f'<tr class="{tr_class}">')
+        # Fett für Klasse(n) (erste Spalte nach Mapping)
+        parts.append(f'<td align="center" class="list"><b>{_escape(student_row[0])}</b></td>')
+        for cell_text in student_row[1:]:
+            parts.append(f'<td align="center" class="list">{_escape(cell_text)}</td>')
+        parts.append('</tr>')
+    parts.append('</tbody>')
+    return ''.join(parts), [list(NEW_HEADERS)] + student_rows
+
+
+def _restructure_mon_list_table(plan: ParsedPlan) -> ParsedPlan:
+    """Baut die 'mon_list'-Tabelle eines Plans in das Schülerformat um.
+
+    Nutzt den Soup-Baum des übergebenen ParsedPlan (kein erneutes Parsen) und gibt
+    einen neuen ParsedPlan zurück, der Titel und Datum des Originals übernimmt.
+    Rückfallweg für _render_student_plan.
+    """
+    try:
+        # Titel und Tabellenzeilen vor dem Umbau auslesen (ein Parse-Vorgang für alles)
+        title = plan.title
+        table_data = plan.table_rows
+
+        soup = plan.soup
         mon_list_table = soup.find('table', class_='mon_list')
 
         if not mon_list_table:
-            return html_string
+            return plan
 
         # Füge tbody hinzu, falls nicht vorhanden
         old_tbody = mon_list_table.find('tbody')
@@ -96,39 +200,6 @@ def _restructure_mon_list_table(html_string: str) -> str:
                 old_tbody.append(tr.extract())
             mon_list_table.append(old_tbody)
 
-        # Tabelle in Array von Arrays extrahieren
-        all_rows = old_tbody.find_all('tr', recursive=False)
-        table_data = []
-        for row in all_rows:
-            cells = row.find_all(['td', 'th'], recursive=False)
-            row_data = [cell.get_text(strip=True) for cell in cells]
-            table_data.append(row_data)
-
-        # Filter: nur erlaubte Art
-        data_rows = table_data[1:]  # Header ausschließen
-        data_rows = [
-            row for row in data_rows
-            if len(row) >= 8 and row[7] in ALLOWED_ART
-        ]
-        # Zeilen müssen genügend Spalten für Mapping haben
-        data_rows = [row for row in data_rows if len(row) >= max([2,1,0,5,3,4,3,7,8])+1]
-
-        # Sortieren nach Original-Klasse (Spalte 2)
-        def klassen_key(row):
-            klasse = row[2].replace("(", "").replace(")", "").strip()
-            if not klasse or klasse == "":
-                return (float('inf'), float('inf'), klasse)  # leere Klasse ans Ende
-            if klasse in {"E1","E2","Q1","Q2","Q3","Q4","AG"}:
-                return (float('inf'), klasse, klasse)  # Sonderklassen ans Ende
-            match = re.match(r"(\d+)?([a-zA-Z]*)", klasse)
-            if match:
-                num_part = int(match.group(1)) if match.group(1) else 0
-                letter_part = match.group(2)
-                return (num_part, letter_part, klasse)
-            return (float('inf'), klasse, klasse)
-
-        data_rows.sort(key=klassen_key)
-
         # Neuen Table Body aufbauen
         new_tbody = soup.new_tag('tbody')
 
@@ -146,19 +217,13 @@ def _restructure_mon_list_table(html_string: str) -> str:
         new_tbody.append(new_header_row)
 
         # Datenzeilen aufbauen
-        COLUMN_MAPPING = [2, 1, 0, 5, 3, 4, 3, 7, 8]  # Mapping der Spalten
-        for idx, row_data in enumerate(data_rows):
+        student_rows = _build_student_rows(table_data)
+        for idx, student_row in enumerate(student_rows):
             tr_class = "list odd" if idx % 2 == 0 else "list even"
             new_row = soup.new_tag('tr', **{'class': tr_class})
-            for col_idx, i in enumerate(COLUMN_MAPPING):
+            for col_idx, cell_text in enumerate(student_row):
                 td = soup.new_tag('td', **{'class': 'list', 'align': 'center'})
 
-                # Bei Art "Entfall" bestimmte Spalten auf "---" setzen
-                if row_data[7] == "Entfall" and col_idx in [2,4,5]:  # neue Spalten 2,4,5
-                    cell_text = "---"
-                else:
-                    cell_text = row_data[i]
-
                 # Fett für Klasse(n) (erste Spalte nach Mapping)
                 if col_idx == 0:
                     b_tag = soup.new_tag('b')
@@ -172,7 +237,7 @@ def _restructure_mon_list_table(html_string: str) -> str:
 
         old_tbody.decompose()
         mon_list_table.append(new_tbody)
-        return str(soup)
+        return ParsedPlan(str(soup), title=title, table_rows=[list(NEW_HEADERS)] + student_rows)
 
     except Exception as e:
-        return html_string
+        return ParsedPlan(plan.html)
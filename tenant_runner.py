@@ -0,0 +1,158 @@
+import heapq
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils import logger
+from bot_logic import SubstitutionBot
+from commit_scheduler import CommitScheduler
+from discord_notifier import get_outbox
+from http_transport import get_transport
+from leases import create_lease_coordinator
+from metrics import DISCORD_PENDING, GIT_PENDING, start_metrics_server
+
+
+class SharedResources:
+    """Was sich alle Schulen eines Prozesses teilen: HTTP-Session, Worker-Pools, Git-Worker."""
+
+    def __init__(self, tenant_workers):
+        self.http = get_transport()
+        self.fetch_pool = ThreadPoolExecutor(
+            max_workers=Config.FETCH_WORKERS, thread_name_prefix="plan-fetch"
+        )
+        # Jeder laufende Schul-Zyklus belegt bis zu zwei Client-Worker (Schüler + Lehrer)
+        self.client_pool = ThreadPoolExecutor(
+            max_workers=2 * tenant_workers, thread_name_prefix="dsb-client"
+        )
+        self.committer = None
+        if Config.GIT_COMMIT_BATCHING:
+            self.committer = CommitScheduler(
+                window=Config.GIT_COMMIT_WINDOW,
+                max_changes=Config.GIT_COMMIT_MAX_CHANGES,
+                max_backoff=Config.GIT_PUSH_MAX_BACKOFF,
+                push_timeout=Config.GIT_PUSH_TIMEOUT,
+                maintenance_interval=Config.GIT_MAINTENANCE_INTERVAL,
+                workers=Config.GIT_WORKERS,
+            )
+        self.outbox = get_outbox() if Config.DISCORD_QUEUE else None
+        # Mehrere Instanzen: eine Lease pro Schule (None ohne LEASE_DB)
+        self.leases = create_lease_coordinator()
+
+    def shutdown_pools(self):
+        self.client_pool.shutdown(wait=False, cancel_futures=True)
+        self.fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        if self.committer is not None:
+            # Offene Änderungen aller Archive noch committen und einen letzten Push versuchen
+            self.committer.close()
+        if self.leases is not None:
+            self.leases.close()
+        if self.outbox is not None:
+            self.outbox.close()
+        self.http.close()
+
+
+class TenantRunner:
+    """Betreibt mehrere Schulen (Tenants) in einem Prozess.
+
+    - Jede Schule hat ihren eigenen Abrufplan (inkl. Backoff) und Zustand; die Zyklen
+      laufen in `workers` gemeinsamen Threads.
+    - Fällige Schulen werden nach Fälligkeit bedient (früheste zuerst). Eine Schule ist
+      erst nach dem Ende ihres Zyklus wieder eingeplant, kann also nie mehrere Worker
+      belegen oder andere verdrängen; bei Überlast rotieren alle Schulen reihum.
+    - Der Ausfall einer Schule (Start oder Zyklus) betrifft die anderen nicht.
+    """
+
+    def __init__(self, tenants, workers=2):
+        self.workers = max(1, workers)
+        self.shared = SharedResources(self.workers)
+        self.bots = []
+        for tenant in tenants:
+            try:
+                self.bots.append(SubstitutionBot(tenant, self.shared))
+                logger.info(f"Schule '{tenant.name}' initialisiert.")
+            except Exception as e:
+                logger.critical(f"Schule '{tenant.name}' konnte nicht gestartet werden: {e}", exc_info=True)
+        if not self.bots:
+            raise RuntimeError("Keine Schule konnte gestartet werden.")
+
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tenant")
+
+        if self.shared.committer is not None:
+            GIT_PENDING.set_function(self.shared.committer.pending)
+        if self.shared.outbox is not None:
+            DISCORD_PENDING.set_function(self.shared.outbox.pending)
+        self.metrics_server = start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
+        if self.shared.leases is not None:
+            self.shared.leases.start()
+
+    @staticmethod
+    def _run_tenant_cycle(bot: SubstitutionBot) -> tuple[bool, float]:
+        """Ein Zyklus einer Schule; gibt (aktualisiert, Dauer) zurück und wirft nie."""
+        start = time.monotonic()
+        try:
+            updated = bot.run_cycle()
+        except Exception as e:
+            err_msg = f"Fehler im Abrufzyklus von '{bot.tenant.name}': {e}"
+            logger.error(err_msg, exc_info=True)
+            bot.discord.send_warning(f" [CRASH] {err_msg}")
+            updated = False
+        return updated, time.monotonic() - start
+
+    def _next_delay(self, bot: SubstitutionBot, updated: bool, duration: float) -> float:
+        try:
+            return bot.next_delay(duration, updated)
+        except Exception as e:
+            logger.error(f"Abrufplan von '{bot.tenant.name}' fehlgeschlagen: {e}", exc_info=True)
+            return 60.0
+
+    def run(self):
+        """Hauptschleife: startet fällige Schul-Zyklen, sobald ein Worker frei ist."""
+        logger.info(f"Mehrschulbetrieb gestartet: {len(self.bots)} Schulen, {self.workers} Worker.")
+        for bot in self.bots:
+            bot.discord.send_warning("🤖 Bot wurde neu gestartet.")
+
+        now = time.monotonic()
+        # (fällig um, Index, Bot); der Index entscheidet bei gleicher Fälligkeit
+        due = [(now, index, bot) for index, bot in enumerate(self.bots)]
+        heapq.heapify(due)
+        finished = queue.Queue()
+        running = 0
+
+        while True:
+            now = time.monotonic()
+            while due and running < self.workers and due[0][0] <= now:
+                _, index, bot = heapq.heappop(due)
+                future = self.pool.submit(self._run_tenant_cycle, bot)
+                future.add_done_callback(
+                    lambda f, index=index, bot=bot: finished.put((index, bot, f))
+                )
+                running += 1
+
+            timeout = None
+            if due and running < self.workers:
+                timeout = max(0.0, due[0][0] - now)
+            try:
+                index, bot, future = finished.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            running -= 1
+
+            if future.cancelled():
+                continue
+            updated, duration = future.result()
+            delay = self._next_delay(bot, updated, duration)
+            logger.debug(f"Nächster Abrufzyklus von '{bot.tenant.name}' in {delay:.0f}s.")
+            heapq.heappush(due, (time.monotonic() + delay, index, bot))
+
+    def shutdown(self):
+        """Beendet alle Schulen und danach die gemeinsamen Ressourcen."""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.shared.shutdown_pools()
+        for bot in self.bots:
+            bot.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        self.shared.close()
+        logger.info("Bot beendet.")
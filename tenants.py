@@ -0,0 +1,151 @@
+import json
+import os
+import re
+from config import Config
+
+# Tenant-Namen landen in Pfaden und Metrik-Labels
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_REQUIRED_FIELDS = ["name", "dsb_user", "dsb_pass", "git_user", "git_token", "git_repo"]
+_OPTIONAL_FIELDS = [
+    "dsb_teacher_user",
+    "dsb_teacher_pass",
+    "webhook_warn",
+    "webhook_plans",
+    "discord_ping_role_id",
+    "repo_dir",
+    "state_dir",
+    "poll_timetable",
+    "poll_holidays",
+]
+
+
+class Tenant:
+    """Eine Schule: DSB-Accounts, Git-Archiv, Discord-Webhooks und lokaler Zustand.
+
+    Im Einzelbetrieb entsteht genau ein Tenant ohne Namen aus der .env
+    (`from_config`), im Mehrschulbetrieb einer pro Eintrag der TENANTS_FILE.
+    """
+
+    def __init__(
+        self,
+        name,
+        dsb_user,
+        dsb_pass,
+        git_user,
+        git_token,
+        git_repo,
+        dsb_teacher_user=None,
+        dsb_teacher_pass=None,
+        webhook_warn=None,
+        webhook_plans=None,
+        discord_ping_role_id="",
+        repo_dir=None,
+        state_dir=None,
+        poll_timetable=None,
+        poll_holidays=None,
+    ):
+        self.name = name
+        self.dsb_user = dsb_user
+        self.dsb_pass = dsb_pass
+        self.dsb_teacher_user = dsb_teacher_user
+        self.dsb_teacher_pass = dsb_teacher_pass
+        self.git_user = git_user
+        self.git_token = git_token
+        self.git_repo = git_repo
+        self.webhook_warn = webhook_warn
+        self.webhook_plans = webhook_plans
+        self.discord_ping_role_id = discord_ping_role_id or ""
+        # Abrufplan der Schule (None = POLL_TIMETABLE/POLL_HOLIDAYS aus der .env)
+        self.poll_timetable = poll_timetable
+        self.poll_holidays = poll_holidays
+
+        self.repo_dir = repo_dir or os.path.join(Config.BASE_DIR, "tenants", name, "dsb-database")
+        self.plans_dir = os.path.join(self.repo_dir, "plans")
+        self.state_dir = state_dir or os.path.join(Config.STATE_DIR, name)
+        self.http_cache_file = os.path.join(self.state_dir, "http_cache.json")
+        self.plan_state_db = os.path.join(self.state_dir, "plan_state.sqlite3")
+        self.search_index_db = os.path.join(self.state_dir, "search_index.sqlite3")
+
+    @classmethod
+    def from_config(cls) -> "Tenant":
+        """Der bisherige Einzelbetrieb: Zugangsdaten und Pfade aus Config."""
+        tenant = cls(
+            "",
+            Config.DSB_USER,
+            Config.DSB_PASS,
+            Config.GIT_USER,
+            Config.GIT_TOKEN,
+            Config.GIT_REPO,
+            dsb_teacher_user=Config.DSB_TEACHER_USER,
+            dsb_teacher_pass=Config.DSB_TEACHER_PASS,
+            webhook_warn=Config.WEBHOOK_WARN,
+            webhook_plans=Config.WEBHOOK_PLANS,
+            discord_ping_role_id=Config.DISCORD_PING_ROLE_ID,
+            repo_dir=Config.REPO_DIR,
+            state_dir=Config.STATE_DIR,
+        )
+        tenant.plans_dir = Config.PLANS_DIR
+        tenant.http_cache_file = Config.HTTP_CACHE_FILE
+        tenant.plan_state_db = Config.PLAN_STATE_DB
+        tenant.search_index_db = Config.SEARCH_INDEX_DB
+        return tenant
+
+    def label(self, client_name: str) -> str:
+        """Client-Bezeichnung für Metriken ("schule-a/Schüler", im Einzelbetrieb nur "Schüler")."""
+        return f"{self.name}/{client_name}" if self.name else client_name
+
+
+def _expand(value):
+    # Geheimnisse können als $VARIABLE aus der Umgebung (.env) kommen
+    return os.path.expandvars(value) if isinstance(value, str) else value
+
+
+def load_tenants(path) -> list:
+    """Liest die Tenant-Datei (JSON: {"tenants": [{...}, ...]}) und prüft alle Einträge.
+
+    Wirft EnvironmentError mit allen gefundenen Problemen.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise EnvironmentError(f"Tenant-Datei {path} konnte nicht gelesen werden: {e}")
+
+    entries = data.get("tenants") if isinstance(data, dict) else None
+    if not entries:
+        raise EnvironmentError(f"Tenant-Datei {path} enthält keine Einträge unter 'tenants'.")
+
+    tenants = []
+    errors = []
+    names = set()
+    for index, entry in enumerate(entries):
+        entry = {key: _expand(value) for key, value in entry.items()}
+        label = entry.get("name") or f"#{index + 1}"
+
+        unknown = set(entry) - set(_REQUIRED_FIELDS) - set(_OPTIONAL_FIELDS)
+        missing = [key for key in _REQUIRED_FIELDS if not entry.get(key)]
+        if unknown:
+            errors.append(f"{label}: unbekannte Felder {', '.join(sorted(unknown))}")
+        if missing:
+            errors.append(f"{label}: fehlende Felder {', '.join(missing)}")
+        if bool(entry.get("dsb_teacher_user")) != bool(entry.get("dsb_teacher_pass")):
+            errors.append(f"{label}: dsb_teacher_user und dsb_teacher_pass nur gemeinsam setzen")
+        name = entry.get("name")
+        if name and not _NAME_PATTERN.match(name):
+            errors.append(f"{label}: Name darf nur Buchstaben, Ziffern, '-' und '_' enthalten")
+        elif name in names:
+            errors.append(f"{label}: Name ist doppelt vergeben")
+        names.add(name)
+
+        if not (unknown or missing):
+            tenants.append(Tenant(**entry))
+
+    for field in ("repo_dir", "state_dir"):
+        paths = [os.path.abspath(getattr(tenant, field)) for tenant in tenants]
+        if len(set(paths)) != len(paths):
+            errors.append(f"Mehrere Tenants teilen sich ein {field}")
+
+    if errors:
+        raise EnvironmentError(f"Ungültige Tenant-Datei {path}: " + "; ".join(errors))
+    return tenants
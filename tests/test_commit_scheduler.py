@@ -0,0 +1,93 @@
+"""Tests für CommitScheduler (Wiederholung fehlgeschlagener Commits).
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commit_scheduler import CommitScheduler
+
+WINDOW = 0.05
+
+
+class _FakeGit:
+    """Git-Ersatz: die ersten `failures` Commits schlagen fehl, Pushes gelingen."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.full_commits = 0
+        self.commits = []
+        self.started = threading.Event()
+        self.failed = threading.Event()
+        self.committed = threading.Event()
+
+    def commit_changes(self, message):
+        self.full_commits += 1
+        self.started.set()
+        return None
+
+    def commit_paths(self, paths, message):
+        if self.failures:
+            self.failures -= 1
+            self.failed.set()
+            return False
+        self.commits.append(set(paths))
+        self.committed.set()
+        return True
+
+    def push(self, timeout=None):
+        return True
+
+    def close(self):
+        pass
+
+
+class _Paths:
+    """Wie PlanStore.take_written: gibt die seit dem letzten Aufruf geschriebenen Dateien ab."""
+
+    def __init__(self):
+        self.written = set()
+
+    def take(self):
+        written, self.written = self.written, set()
+        return written
+
+
+class CommitSchedulerTest(unittest.TestCase):
+    def scheduler(self, git, paths):
+        scheduler = CommitScheduler(git, window=WINDOW, collect_paths=paths.take)
+        self.addCleanup(scheduler.close)
+        # Der erste Commit nach dem Start läuft über git add .
+        paths.written = {"start.html"}
+        scheduler.add_changes({"start"})
+        self.assertTrue(git.started.wait(5))
+        return scheduler
+
+    def test_failed_commit_is_retried_with_its_paths(self):
+        git, paths = _FakeGit(failures=1), _Paths()
+        scheduler = self.scheduler(git, paths)
+        paths.written = {"a.html"}
+        scheduler.add_changes({"a"})
+        self.assertTrue(git.committed.wait(5))
+        self.assertEqual(git.commits, [{"a.html"}])
+
+    def test_failed_paths_join_the_next_batch(self):
+        git, paths = _FakeGit(failures=1), _Paths()
+        scheduler = self.scheduler(git, paths)
+        paths.written = {"a.html"}
+        scheduler.add_changes({"a"})
+        self.assertTrue(git.failed.wait(5))
+        paths.written = {"b.html"}
+        scheduler.add_changes({"b"})
+        self.assertTrue(git.committed.wait(5))
+        self.assertEqual(git.commits, [{"a.html", "b.html"}])
+        self.assertEqual(git.full_commits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests für den Spool der DiscordOutbox (keine Webhook-URLs auf der Platte).
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_queue import DiscordOutbox
+
+SECRET_URL = "https://discord.example/api/webhooks/1/geheimes-token"
+
+
+class _Response:
+    status_code = 204
+    headers = {}
+    text = ""
+
+
+class _Transport:
+    def __init__(self):
+        self.posts = []
+        self.sent = threading.Event()
+
+    def post(self, url, json=None):
+        self.posts.append((url, json))
+        self.sent.set()
+        return _Response()
+
+
+class DiscordOutboxSpoolTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spool_file = os.path.join(tmp.name, "discord_spool.json")
+
+    def outbox(self, transport):
+        outbox = DiscordOutbox(transport, self.spool_file, lambda kind, data: data, lambda kind, old, new: new)
+        self.addCleanup(outbox.close, 0)
+        return outbox
+
+    def test_spool_stores_webhook_name_and_resumes_after_restart(self):
+        # Ohne angemeldete URL bleibt die Nachricht im Spool
+        first = self.outbox(_Transport())
+        first.enqueue("schule-a/warn", "warning", {"text": "heiß"})
+        first.close(0)
+        with open(self.spool_file, "r", encoding="utf-8") as f:
+            spool = f.read()
+        self.assertIn("schule-a/warn", spool)
+        self.assertNotIn("geheimes-token", spool)
+
+        transport = _Transport()
+        second = self.outbox(transport)
+        self.assertEqual(second.pending(), 1)
+        second.register_webhook("schule-a/warn", SECRET_URL)
+        self.assertTrue(transport.sent.wait(5))
+        self.assertEqual(transport.posts, [(SECRET_URL, {"text": "heiß"})])
+
+    def test_legacy_spool_with_urls_is_dropped(self):
+        with open(self.spool_file, "w", encoding="utf-8") as f:
+            f.write('[{"id": 1, "url": "' + SECRET_URL + '", "kind": "warning", "data": {}, '
+                    '"key": null, "attempts": 0, "not_before": 0}]')
+        outbox = self.outbox(_Transport())
+        self.assertEqual(outbox.pending(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
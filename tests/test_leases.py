@@ -0,0 +1,218 @@
+"""Tests für LeaseStore (Epoche, Übernahme, Ablauf) und LeaseCoordinator.tick (Anteil, Abgabe).
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leases
+from leases import LeaseCoordinator, LeaseStore
+
+TTL = 30
+
+
+class _Clock:
+    """Ersetzt das time-Modul in leases: Wand- und monotone Zeit laufen nur per advance()."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class _FailingCommit:
+    """Verbindung, deren COMMIT wie bei einem I/O-Fehler scheitert und die Transaktion verwirft."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            self.conn.execute("ROLLBACK")
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.conn.execute(sql, *args)
+
+
+class _LeaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch.object(leases, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_file = os.path.join(tmp.name, "leases.sqlite3")
+
+    def store(self, node_id):
+        store = LeaseStore(self.db_file, node_id, ttl=TTL)
+        self.addCleanup(store.close)
+        return store
+
+    def coordinator(self, node_id, keys, can_release=None):
+        coordinator = LeaseCoordinator(self.store(node_id))
+        for key in keys:
+            coordinator.register(key, can_release)
+        return coordinator
+
+
+class LeaseStoreTest(_LeaseTestCase):
+    def test_first_acquire_starts_epoch_one(self):
+        self.assertEqual(self.store("a").acquire("schule"), (1, False))
+
+    def test_renewal_keeps_epoch_and_extends_expiry(self):
+        a, b = self.store("a"), self.store("b")
+        a.acquire("schule")
+        self.clock.advance(TTL - 1)
+        self.assertEqual(a.acquire("schule"), (1, False))
+        # Ohne die Erneuerung wäre die Lease jetzt abgelaufen
+        self.clock.advance(2)
+        self.assertIsNone(b.acquire("schule"))
+
+    def test_valid_lease_is_not_taken_over(self):
+        a, b = self.store("a"), self.store("b")
+        a.acquire("schule")
+        self.clock.advance(TTL - 1)
+        self.assertIsNone(b.acquire("schule"))
+
+    def test_expired_lease_is_taken_over_with_new_epoch(self):
+        a, b = self.store("a"), self.store("b")
+        a.acquire("schule")
+        self.clock.advance(TTL + 1)
+        self.assertEqual(b.acquire("schule"), (2, True))
+        # Die alte Besitzerin kommt erst nach erneutem Ablauf zurück
+        self.assertIsNone(a.acquire("schule"))
+        self.clock.advance(TTL + 1)
+        self.assertEqual(a.acquire("schule"), (3, True))
+
+    def test_release_allows_immediate_takeover(self):
+        a, b = self.store("a"), self.store("b")
+        a.acquire("schule")
+        a.release("schule")
+        self.assertEqual(b.acquire("schule"), (2, True))
+
+    def test_release_of_foreign_lease_has_no_effect(self):
+        a, b = self.store("a"), self.store("b")
+        a.acquire("schule")
+        b.release("schule")
+        self.assertIsNone(b.acquire("schule"))
+
+    def test_failed_commit_keeps_original_error(self):
+        a = self.store("a")
+        a._conn = _FailingCommit(a._conn)
+        with self.assertRaisesRegex(sqlite3.OperationalError, "disk I/O error"):
+            a.acquire("schule")
+        a._conn = a._conn.conn
+        self.assertEqual(a.acquire("schule"), (1, False))
+
+    def test_heartbeat_counts_only_live_nodes(self):
+        a, b = self.store("a"), self.store("b")
+        self.assertEqual(a.heartbeat(), 1)
+        self.assertEqual(b.heartbeat(), 2)
+        self.clock.advance(TTL + 1)
+        self.assertEqual(a.heartbeat(), 1)
+        b.heartbeat()
+        b.leave()
+        self.assertEqual(a.heartbeat(), 1)
+
+
+class LeaseCoordinatorTest(_LeaseTestCase):
+    KEYS = ["schule-a", "schule-b", "schule-c", "schule-d"]
+
+    def held(self, coordinator):
+        return {key for key in self.KEYS if coordinator.lease(key) is not None}
+
+    def test_single_node_takes_all_keys(self):
+        a = self.coordinator("a", self.KEYS)
+        a.tick()
+        self.assertEqual(self.held(a), set(self.KEYS))
+        self.assertEqual(a.lease("schule-a"), (1, False))
+
+    def test_local_validity_ends_before_database_expiry(self):
+        a = self.coordinator("a", self.KEYS)
+        a.tick()
+        self.assertEqual(a.remaining("schule-a"), TTL - a.check_interval)
+        self.clock.advance(TTL - a.check_interval)
+        self.assertEqual(a.remaining("schule-a"), 0)
+        self.assertIsNone(a.lease("schule-a"))
+
+    def test_second_node_gets_fair_share_after_release(self):
+        a = self.coordinator("a", self.KEYS)
+        b = self.coordinator("b", self.KEYS)
+        a.tick()
+        # b zählt schon mit, bekommt aber erst, was a abgegeben hat
+        b.tick()
+        self.assertEqual(self.held(b), set())
+        a.tick()
+        self.assertEqual(len(self.held(a)), 2)
+        b.tick()
+        self.assertEqual(len(self.held(b)), 2)
+        self.assertEqual(self.held(a) | self.held(b), set(self.KEYS))
+        self.assertFalse(self.held(a) & self.held(b))
+
+    def test_surplus_is_kept_while_release_is_not_allowed(self):
+        a = self.coordinator("a", self.KEYS, can_release=lambda: False)
+        b = self.coordinator("b", self.KEYS)
+        a.tick()
+        b.tick()
+        a.tick()
+        self.assertEqual(self.held(a), set(self.KEYS))
+        b.tick()
+        self.assertEqual(self.held(b), set())
+
+    def test_keys_of_dead_node_are_taken_over(self):
+        a = self.coordinator("a", self.KEYS)
+        b = self.coordinator("b", self.KEYS)
+        a.tick()
+        b.tick()
+        a.tick()
+        b.tick()
+        taken_from_a = self.held(a)
+        # a fällt aus: keine Erneuerung mehr
+        self.clock.advance(TTL + 1)
+        b.tick()
+        self.assertEqual(self.held(b), set(self.KEYS))
+        for key in taken_from_a:
+            self.assertEqual(b.lease(key), (2, True))
+
+    def test_takeover_flag_stays_for_the_whole_term(self):
+        a = self.coordinator("a", ["schule-a"])
+        b = self.coordinator("b", ["schule-a"])
+        a.tick()
+        self.clock.advance(TTL + 1)
+        b.tick()
+        self.clock.advance(b.check_interval)
+        b.tick()
+        self.assertEqual(b.lease("schule-a"), (2, True))
+
+    def test_lost_lease_is_dropped_on_renewal(self):
+        a = self.coordinator("a", ["schule-a"])
+        b = self.coordinator("b", ["schule-a"])
+        a.tick()
+        # a hängt länger als die TTL, b übernimmt in der Zwischenzeit
+        self.clock.advance(TTL + 1)
+        b.tick()
+        a.tick()
+        self.assertIsNone(a.lease("schule-a"))
+        self.assertEqual(b.lease("schule-a"), (2, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Tests für PlanStore (stabile Quellen, Ansichten, flush) und den Suchindex darauf.
+
+Aufruf (aus dem Bot-Verzeichnis):
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plan_rows import SubstitutionRow
+from plan_store import PlanStore
+from search_index import PlanSearchIndex
+
+DATE = "2026-10-19"
+UPLOAD_A = "https://dsb.example/data/aaaa0000-0000-0000-0000-000000000000/subst_001.htm"
+UPLOAD_B = "https://dsb.example/data/bbbb0000-0000-0000-0000-000000000000/subst_001.htm"
+
+
+def _rows_json(*rows) -> str:
+    return json.dumps({"rows": [SubstitutionRow(**row).to_dict() for row in rows]})
+
+
+class _StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.plans_dir = os.path.join(tmp.name, "plans")
+        self.store = PlanStore(self.plans_dir)
+
+    def read_view(self, name) -> str:
+        with open(os.path.join(self.plans_dir, name), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class PlanStoreTest(_StoreTestCase):
+    def test_source_is_stable_across_uploads(self):
+        self.assertEqual(
+            PlanStore.plan_source("Schüler", UPLOAD_A), PlanStore.plan_source("Schüler", UPLOAD_B)
+        )
+        self.assertNotEqual(
+            PlanStore.plan_source("Schüler", UPLOAD_A), PlanStore.plan_source("Lehrer", UPLOAD_A)
+        )
+
+    def test_reupload_with_same_content_is_not_saved(self):
+        self.assertTrue(self.store.save_plan(DATE, PlanStore.plan_source("Schüler", UPLOAD_A), "t", "<p>v1</p>", None))
+        self.store.flush()
+        self.assertIsNone(self.store.save_plan(DATE, PlanStore.plan_source("Schüler", UPLOAD_B), "t", "<p>v1</p>", None))
+
+    def test_day_view_shows_newest_version(self):
+        self.store.save_plan(DATE, PlanStore.plan_source("Schüler", UPLOAD_A), "t", "<p>v1</p>", None)
+        self.store.flush()
+        self.store.save_plan(DATE, PlanStore.plan_source("Schüler", UPLOAD_B), "t", "<p>v2</p>", None)
+        self.store.flush()
+        self.assertEqual(self.read_view(f"{DATE}.html"), "<p>v2</p>")
+        self.assertFalse(os.path.exists(os.path.join(self.plans_dir, f"{DATE}_2.html")))
+
+    def test_second_source_gets_views_for_both(self):
+        self.store.save_plan(DATE, "Schüler/subst_001.htm", "Teil 1", "<p>teil1</p>", None)
+        self.store.save_plan(DATE, "Schüler/subst_002.htm", "Teil 2", "<p>teil2</p>", None)
+        self.store.flush()
+        self.assertEqual(self.read_view(f"{DATE}.html"), "<p>teil2</p>")
+        self.assertEqual(self.read_view(f"{DATE}_1.html"), "<p>teil1</p>")
+        self.assertEqual(self.read_view(f"{DATE}_2.html"), "<p>teil2</p>")
+        self.assertEqual(
+            self.store.view_path(DATE, "Schüler/subst_001.htm"), os.path.join(self.plans_dir, f"{DATE}_1.html")
+        )
+
+    def test_failed_flush_reports_no_versions(self):
+        self.store.save_plan(DATE, "Schüler/subst_001.htm", "t", "<p>v1</p>", None)
+        with mock.patch("plan_store.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.store.flush()
+        self.assertEqual(self.store.take_flushed(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.plans_dir, f"{DATE}.html")))
+        # Der nächste Zyklus speichert dieselbe Version erneut
+        self.assertTrue(self.store.save_plan(DATE, "Schüler/subst_001.htm", "t", "<p>v1</p>", None))
+        self.store.flush()
+        self.assertEqual([saved["source"] for saved in self.store.take_flushed()],
+                         [PlanStore.source_id("Schüler/subst_001.htm")])
+
+
+class SearchIndexTest(_StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = PlanSearchIndex(os.path.join(os.path.dirname(self.plans_dir), "search.sqlite3"))
+        self.addCleanup(self.index.close)
+
+    def save_and_index(self, url, html, art):
+        source = PlanStore.plan_source("Schüler", url)
+        self.store.save_plan(DATE, source, "t", html, _rows_json({"klassen": "7b", "stunde": "3", "art": art}))
+        self.store.flush()
+        for saved in self.store.take_flushed():
+            self.index.index_version(self.plans_dir, saved["date"], saved["source"], saved["title"], saved["version"])
+
+    def test_reupload_replaces_rows_of_earlier_upload(self):
+        self.save_and_index(UPLOAD_A, "<p>v1</p>", "Entfall")
+        self.save_and_index(UPLOAD_B, "<p>v2</p>", "Vertretung")
+        self.assertEqual([row["art"] for row in self.index.search(klasse="7b")], ["Vertretung"])
+
+
+if __name__ == "__main__":
+    unittest.main()
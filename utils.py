@@ -45,4 +45,16 @@ def get_cpu_temperature():
         temp = float(res.replace("temp=", "").replace("'C\n", ""))
         return temp
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+
+def check_temperature(notifier):
+    """Prüft die CPU-Temperatur und sendet bei Überschreitung des Grenzwerts eine Warnung."""
+    temp = get_cpu_temperature()
+    if temp:
+        logger.debug(f"Aktuelle Temperatur: {temp:.1f}°C")
+        if temp > Config.TEMP_THRESHOLD:
+            msg = f"Hitzewarnung: {temp:.1f}°C"
+            logger.warning(msg)
+            # Wiederholte Hitzewarnungen werden gesammelt statt jede Minute gesendet
+            notifier.send_warning(f"⚠️ {msg}", coalesce_key="temperature")